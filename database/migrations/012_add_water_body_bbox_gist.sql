@@ -0,0 +1,17 @@
+-- Migration 012: GiST indexes on water body bounding boxes
+-- The (lat_min, lat_max) / (lon_min, lon_max) B-tree pairs can only narrow
+-- one axis at a time, so bbox containment and overlap lookups degrade to
+-- sequential scans as the GVR/OSM tables grow. Index the bbox as a native
+-- box so `&&` queries get an R-tree access path. Queries must use exactly
+-- the same box(point(lon_min, lat_min), point(lon_max, lat_max)) expression.
+
+CREATE INDEX IF NOT EXISTS idx_ru_water_bodies_bbox_gist
+    ON ru_water_bodies
+    USING GIST (box(point(lon_min, lat_min), point(lon_max, lat_max)));
+
+CREATE INDEX IF NOT EXISTS idx_wbp_bbox_gist
+    ON water_body_polygons
+    USING GIST (box(point(lon_min, lat_min), point(lon_max, lat_max)));
+
+ANALYZE ru_water_bodies;
+ANALYZE water_body_polygons;
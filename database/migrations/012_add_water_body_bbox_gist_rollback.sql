@@ -0,0 +1,4 @@
+-- Rollback 012: drop bbox GiST indexes
+
+DROP INDEX IF EXISTS idx_ru_water_bodies_bbox_gist;
+DROP INDEX IF EXISTS idx_wbp_bbox_gist;
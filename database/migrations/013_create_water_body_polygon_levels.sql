@@ -0,0 +1,14 @@
+-- Migration 013: Simplification pyramid for water_body_polygons
+-- Each polygon is stored pre-simplified at several Douglas-Peucker
+-- tolerances so low-zoom views do not ship full-density OSM rings.
+-- Level 0 is the original geometry in water_body_polygons.coordinates.
+
+CREATE TABLE IF NOT EXISTS water_body_polygon_levels (
+    polygon_id INTEGER NOT NULL REFERENCES water_body_polygons(id) ON DELETE CASCADE,
+    level SMALLINT NOT NULL,
+    tolerance FLOAT NOT NULL,
+    coordinates JSONB NOT NULL,
+    point_count INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (polygon_id, level)
+);
@@ -0,0 +1,3 @@
+-- Rollback 013: drop the simplification pyramid
+
+DROP TABLE IF EXISTS water_body_polygon_levels;
@@ -0,0 +1,13 @@
+-- Migration 014: Packed binary polygon coordinates
+-- coordinates_bin holds rings as delta-encoded int32 fixed-point degrees
+-- (see app/services/coord_codec.py in depth-service), which decode with a
+-- single NumPy cumsum instead of json.loads over nested float lists.
+-- The JSONB columns stay readable for rows not yet packed; run
+--   python -m app.seed.pack_polygon_coordinates
+-- in depth-service to convert existing rows.
+
+ALTER TABLE water_body_polygons ADD COLUMN IF NOT EXISTS coordinates_bin BYTEA;
+ALTER TABLE water_body_polygons ALTER COLUMN coordinates DROP NOT NULL;
+
+ALTER TABLE water_body_polygon_levels ADD COLUMN IF NOT EXISTS coordinates_bin BYTEA;
+ALTER TABLE water_body_polygon_levels ALTER COLUMN coordinates DROP NOT NULL;
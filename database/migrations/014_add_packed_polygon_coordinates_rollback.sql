@@ -0,0 +1,13 @@
+-- Rollback 014: packed polygon coordinates
+-- Rows written only in packed form must be unpacked back to JSONB first
+-- (or re-imported), otherwise SET NOT NULL fails and nothing is dropped.
+
+BEGIN;
+
+ALTER TABLE water_body_polygons ALTER COLUMN coordinates SET NOT NULL;
+ALTER TABLE water_body_polygon_levels ALTER COLUMN coordinates SET NOT NULL;
+
+ALTER TABLE water_body_polygon_levels DROP COLUMN IF EXISTS coordinates_bin;
+ALTER TABLE water_body_polygons DROP COLUMN IF EXISTS coordinates_bin;
+
+COMMIT;
@@ -1,12 +1,18 @@
 from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import Response, StreamingResponse
 
+from app.core.config import settings
 from app.core.logging_config import get_logger
-from app.services.depth_areas import get_depth_areas
+from app.services.bbox_cache import cached_bbox_response
+from app.services.depth_areas import get_depth_areas, iter_depth_areas
+from app.services.depth_colors import ramp_version
+from app.services.geojson_writer import aiter_feature_collection, encode_feature_collection
 
 router = APIRouter(prefix="/depth", tags=["depth-areas"])
 logger = get_logger(__name__)
 
 _VALID_SCHEMES = {"navionics", "contrast", "sport"}
+_EMPTY_COLLECTION = '{"type":"FeatureCollection","features":[]}'
 
 
 @router.get("/areas")
@@ -16,6 +22,7 @@ async def get_areas(
     maxLat: float = Query(..., ge=-90, le=90, description="Maximum latitude"),
     maxLon: float = Query(..., ge=-180, le=180, description="Maximum longitude"),
     scheme: str = Query("navionics", description="Color scheme: navionics, contrast, sport"),
+    stream: bool = Query(False, description="Stream features as they are read, with a higher feature cap"),
 ):
     if scheme not in _VALID_SCHEMES:
         raise HTTPException(status_code=400, detail=f"Invalid scheme. Must be one of: {_VALID_SCHEMES}")
@@ -29,15 +36,40 @@ async def get_areas(
         maxLat=maxLat,
         maxLon=maxLon,
         scheme=scheme,
+        stream=stream,
     )
 
-    result = await get_depth_areas(minLat, minLon, maxLat, maxLon, scheme)
+    if stream:
+        features = iter_depth_areas(
+            minLat, minLon, maxLat, maxLon, scheme,
+            limit=settings.DEPTH_AREAS_STREAM_MAX_FEATURES,
+        )
+        return StreamingResponse(aiter_feature_collection(features), media_type="application/json")
+
+    async def build(min_lat, min_lon, max_lat, max_lon, pixels, tiles):
+        # The snapped range can be up to 3x3 tiles: simplify for its drawn
+        # size and give each tile the cap an unsnapped viewport would get,
+        # so large bodies outside the viewport don't crowd out small ones.
+        result = await get_depth_areas(
+            min_lat, min_lon, max_lat, max_lon, scheme,
+            limit=settings.DEPTH_AREAS_MAX_FEATURES * tiles,
+            pixels=pixels,
+        )
+        return encode_feature_collection(result).decode("utf-8"), not result["features"]
+
+    try:
+        body = await cached_bbox_response(
+            "areas", f"{scheme}.{ramp_version(scheme)}", minLat, minLon, maxLat, maxLon, build
+        )
+    except Exception:
+        # Already logged by depth_areas; answer empty without caching it.
+        body = _EMPTY_COLLECTION
 
     logger.info(
         "request_completed",
         service="depth-service",
         action="get_areas",
-        features=len(result.get("features", [])),
+        bytes=len(body),
     )
 
-    return result
+    return Response(content=body, media_type="application/json")
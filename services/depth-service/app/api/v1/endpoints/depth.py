@@ -1,28 +1,15 @@
 from fastapi import APIRouter, Query
 
 from app.core.logging_config import get_logger
-from app.services.depth_resolver import resolve_depth
+from app.schemas.depth import DepthPointsRequest
+from app.services.depth_resolver import resolve_depth, resolve_depth_batch
 from app.services.fish_matcher import match_fish_by_depth, get_depth_category, get_season
 
 router = APIRouter(prefix="/depth", tags=["depth"])
 logger = get_logger(__name__)
 
 
-@router.get("/point")
-async def get_depth_at_point(
-    lat: float = Query(..., ge=-90, le=90, description="Latitude"),
-    lon: float = Query(..., ge=-180, le=180, description="Longitude"),
-):
-    logger.info(
-        "request_started",
-        service="depth-service",
-        action="get_depth_at_point",
-        lat=lat,
-        lon=lon,
-    )
-
-    result = await resolve_depth(lat, lon)
-
+def _build_response(lat: float, lon: float, result: dict, season: str | None = None) -> dict:
     depth = result.get("depth")
     has_data = result.get("has_data", False)
     category = None
@@ -30,9 +17,9 @@ async def get_depth_at_point(
 
     if has_data and depth is not None:
         category = get_depth_category(depth)
-        fish_match = match_fish_by_depth(depth)
+        fish_match = match_fish_by_depth(depth, season)
 
-    response = {
+    return {
         "depth": depth,
         "depth_display": result.get("depth_display"),
         "category": category,
@@ -41,13 +28,32 @@ async def get_depth_at_point(
         "has_data": has_data,
         "lat": lat,
         "lon": lon,
-        "season": get_season(),
+        "season": season or get_season(),
         "fish_match": fish_match,
         "water_body_name": result.get("water_body_name"),
         "water_body_type": result.get("water_body_type"),
         "depth_type": result.get("depth_type"),
     }
 
+
+@router.get("/point")
+async def get_depth_at_point(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude"),
+):
+    logger.info(
+        "request_started",
+        service="depth-service",
+        action="get_depth_at_point",
+        lat=lat,
+        lon=lon,
+    )
+
+    result = await resolve_depth(lat, lon)
+    response = _build_response(lat, lon, result)
+    fish_match = response["fish_match"]
+    has_data = response["has_data"]
+
     logger.info(
         "request_completed",
         service="depth-service",
@@ -62,3 +68,31 @@ async def get_depth_at_point(
     )
 
     return response
+
+
+@router.post("/points")
+async def get_depth_at_points(body: DepthPointsRequest):
+    logger.info(
+        "request_started",
+        service="depth-service",
+        action="get_depth_at_points",
+        points=len(body.points),
+    )
+
+    points = [(p.lat, p.lon) for p in body.points]
+    results = await resolve_depth_batch(points)
+    season = get_season()
+    responses = [
+        _build_response(lat, lon, result, season)
+        for (lat, lon), result in zip(points, results)
+    ]
+
+    logger.info(
+        "request_completed",
+        service="depth-service",
+        action="get_depth_at_points",
+        points=len(responses),
+        with_data=sum(1 for r in responses if r["has_data"]),
+    )
+
+    return {"results": responses}
@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Query
+from fastapi.responses import Response
 
 from app.core.logging_config import get_logger
+from app.services.bbox_cache import cached_bbox_response
 from app.services.depth_labels import get_depth_labels
+from app.services.geojson_writer import encode_feature_collection
 
 router = APIRouter(prefix="/depth", tags=["depth-labels"])
 logger = get_logger(__name__)
 
+_EMPTY_COLLECTION = '{"type":"FeatureCollection","features":[]}'
+
 
 @router.get("/labels")
 async def get_labels(
@@ -26,13 +31,23 @@ async def get_labels(
         zoom=zoom,
     )
 
-    result = await get_depth_labels(minLat, minLon, maxLat, maxLon, zoom)
+    async def build(min_lat, min_lon, max_lat, max_lon, pixels, tiles):
+        result = await get_depth_labels(min_lat, min_lon, max_lat, max_lon, zoom)
+        return encode_feature_collection(result).decode("utf-8"), not result["features"]
+
+    try:
+        body = await cached_bbox_response(
+            "labels", f"z{zoom}", minLat, minLon, maxLat, maxLon, build
+        )
+    except Exception:
+        # Already logged by depth_labels; answer empty without caching it.
+        body = _EMPTY_COLLECTION
 
     logger.info(
         "request_completed",
         service="depth-service",
         action="get_labels",
-        features=len(result.get("features", [])),
+        bytes=len(body),
     )
 
-    return result
+    return Response(content=body, media_type="application/json")
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Path, Query, HTTPException
+from fastapi import APIRouter, Header, Path, Query, HTTPException
 from fastapi.responses import Response
 
+from app.core.config import settings
 from app.core.logging_config import get_logger
-from app.services.depth_reader import fetch_tile
+from app.services.depth_reader import fetch_tile, lookup_tile_etag
+from app.services.tile_store import tile_etag
 
 router = APIRouter(prefix="/depth/tiles", tags=["depth-tiles"])
 logger = get_logger(__name__)
@@ -14,6 +16,22 @@ _TRANSPARENT_PNG = bytes.fromhex(
     "890000000d49444154789c63600100000005000156fed98a0000000049454e44ae426082"
 )
 
+_TRANSPARENT_PNG_ETAG = tile_etag(_TRANSPARENT_PNG)
+
+# The placeholder stands in for an upstream failure, so clients retry soon.
+_PLACEHOLDER_MAX_AGE = 60
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (c.strip() for c in if_none_match.split(","))
+    return any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def _cache_headers(etag: str, max_age: int) -> dict:
+    return {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+
 
 @router.get("/{z}/{x}/{y}.png")
 async def get_tile(
@@ -21,6 +39,7 @@ async def get_tile(
     x: int = Path(..., ge=0),
     y: int = Path(..., ge=0),
     scheme: str = Query("navionics", description="Color scheme"),
+    if_none_match: str | None = Header(None),
 ):
     if scheme not in _VALID_SCHEMES:
         raise HTTPException(status_code=400, detail=f"Invalid scheme. Must be one of: {_VALID_SCHEMES}")
@@ -35,10 +54,29 @@ async def get_tile(
         scheme=scheme,
     )
 
-    tile_data = await fetch_tile(z, x, y, scheme=scheme)
+    if if_none_match:
+        etag = await lookup_tile_etag(z, x, y, scheme=scheme)
+        if etag is not None and _etag_matches(if_none_match, etag):
+            logger.info(
+                "request_not_modified",
+                service="depth-service",
+                action="get_tile",
+                z=z,
+                x=x,
+                y=y,
+            )
+            return Response(status_code=304, headers=_cache_headers(etag, settings.TILE_HTTP_MAX_AGE))
+
+    tile = await fetch_tile(z, x, y, scheme=scheme)
 
-    if tile_data is None:
-        return Response(content=_TRANSPARENT_PNG, media_type="image/png")
+    if tile is None:
+        return Response(
+            content=_TRANSPARENT_PNG,
+            media_type="image/png",
+            headers=_cache_headers(_TRANSPARENT_PNG_ETAG, _PLACEHOLDER_MAX_AGE),
+        )
+
+    tile_data, etag = tile
 
     logger.info(
         "request_completed",
@@ -50,4 +88,8 @@ async def get_tile(
         size=len(tile_data),
     )
 
-    return Response(content=tile_data, media_type="image/png")
+    return Response(
+        content=tile_data,
+        media_type="image/png",
+        headers=_cache_headers(etag, settings.TILE_HTTP_MAX_AGE),
+    )
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Header, HTTPException, Path, Query
+from fastapi.responses import Response
+
+from app.api.v1.endpoints.tiles import _PLACEHOLDER_MAX_AGE, _cache_headers, _etag_matches
+from app.core.config import settings
+from app.core.logging_config import get_logger
+from app.services.depth_reader import lookup_tile_etag
+from app.services.tile_store import tile_etag
+from app.services.vector_tiles import fetch_vector_tile, vector_layer
+
+router = APIRouter(prefix="/depth/vt", tags=["depth-vector-tiles"])
+logger = get_logger(__name__)
+
+_VALID_SCHEMES = {"navionics", "contrast", "sport"}
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+_EMPTY_TILE_ETAG = tile_etag(b"")
+
+
+@router.get("/{z}/{x}/{y}.mvt")
+async def get_vector_tile(
+    z: int = Path(..., ge=0, le=18),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    scheme: str = Query("navionics", description="Color scheme for the color property"),
+    if_none_match: str | None = Header(None),
+):
+    if scheme not in _VALID_SCHEMES:
+        raise HTTPException(status_code=400, detail=f"Invalid scheme. Must be one of: {_VALID_SCHEMES}")
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    logger.info(
+        "request_started",
+        service="depth-service",
+        action="get_vector_tile",
+        z=z,
+        x=x,
+        y=y,
+        scheme=scheme,
+    )
+
+    if if_none_match:
+        etag = await lookup_tile_etag(z, x, y, scheme=vector_layer(scheme))
+        if etag is not None and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=_cache_headers(etag, settings.TILE_HTTP_MAX_AGE))
+
+    tile = await fetch_vector_tile(z, x, y, scheme=scheme)
+
+    if tile is None:
+        return Response(
+            content=b"",
+            media_type=MVT_MEDIA_TYPE,
+            headers=_cache_headers(_EMPTY_TILE_ETAG, _PLACEHOLDER_MAX_AGE),
+        )
+    tile_data, etag = tile
+
+    logger.info(
+        "request_completed",
+        service="depth-service",
+        action="get_vector_tile",
+        z=z,
+        x=x,
+        y=y,
+        size=len(tile_data),
+    )
+
+    return Response(
+        content=tile_data,
+        media_type=MVT_MEDIA_TYPE,
+        headers=_cache_headers(etag, settings.TILE_HTTP_MAX_AGE),
+    )
@@ -0,0 +1,291 @@
+"""Per-upstream circuit breaker with an adaptive token bucket.
+
+Each remote upstream (Overpass, GEBCO) gets one UpstreamGuard. Calls ask
+``allow()`` first and report the outcome afterwards:
+
+- closed: requests pass while the token bucket has tokens;
+- open: after BREAKER_FAILURE_THRESHOLD consecutive failures every call
+  fails fast until the open period ends;
+- half-open: one probe request goes through; success closes the breaker,
+  failure opens it again.
+
+The bucket rate halves on every 429 and creeps back up on success
+(AIMD); a Retry-After on the 429 also holds the bucket empty for that
+long, without opening the breaker. Transitions and rate cuts are published to Redis and picked up
+by the other workers on their next sync, so one worker tripping the
+breaker stops all of them from hammering the upstream.
+"""
+
+import json
+import time
+from typing import Callable
+
+from app.core.config import settings
+from app.core.http_clients import GEBCO, OVERPASS
+from app.core.logging_config import get_logger
+from app.core.redis_client import get_redis
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Multiplicative decrease on 429, additive increase (per success) back up.
+_RATE_DECREASE = 0.5
+_RATE_INCREASE_FRACTION = 0.05
+
+
+class UpstreamGuard:
+    def __init__(
+        self,
+        name: str,
+        rate_per_sec: float,
+        burst: int,
+        failure_threshold: int | None = None,
+        open_sec: float | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.name = name
+        self.max_rate = rate_per_sec
+        self.rate = rate_per_sec
+        self.burst = burst
+        self.failure_threshold = failure_threshold or settings.BREAKER_FAILURE_THRESHOLD
+        self.open_sec = open_sec if open_sec is not None else settings.BREAKER_OPEN_SEC
+        self._clock = clock
+
+        self.state = CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self._tokens = float(burst)
+        self._refilled_at = clock()
+        # Set by a 429 with Retry-After: no tokens are handed out before it.
+        self._retry_until = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._last_sync = 0.0
+        self._applied_version = 0.0
+
+    @property
+    def _state_key(self) -> str:
+        return f"upstream:{self.name}:state"
+
+    async def allow(self) -> bool:
+        """True if a request may go out now; False means fail fast."""
+        await self._sync()
+        now = self._clock()
+
+        if self.state == OPEN:
+            if now < self.open_until:
+                return False
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == HALF_OPEN:
+            # A probe whose caller was cancelled never reports back; let another try.
+            probing = self._probe_in_flight and now - self._probe_started < self.open_sec
+            if probing or not await self._claim_probe():
+                return False
+            self._probe_in_flight = True
+            self._probe_started = now
+            return True
+
+        return self._take_token(now)
+
+    async def record_success(self) -> None:
+        self.failures = 0
+        self.rate = min(self.max_rate, self.rate + self.max_rate * _RATE_INCREASE_FRACTION)
+        if self.state != CLOSED:
+            self.state = CLOSED
+            self._probe_in_flight = False
+            logger.info(
+                "upstream_breaker_closed",
+                service="depth-service",
+                action="upstream_breaker",
+                upstream=self.name,
+            )
+            await self._publish()
+
+    async def record_failure(self, rate_limited: bool = False, retry_after: float | None = None) -> None:
+        if rate_limited:
+            self.rate = max(settings.BREAKER_MIN_RATE_PER_SEC, self.rate * _RATE_DECREASE)
+            self._tokens = 0.0
+            if retry_after:
+                self._hold_until(self._clock() + retry_after)
+
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            await self._open(max(self.open_sec, self._retry_until - self._clock()))
+        elif rate_limited:
+            await self._publish()
+
+    def token_wait(self) -> float | None:
+        """Seconds until the bucket has a token; None if the breaker, not the bucket, is denying."""
+        if self.state != CLOSED:
+            return None
+        now = self._clock()
+        retry_wait = self._retry_until - now
+        missing = 1.0 - self._tokens
+        if missing <= 0.0:
+            return max(0.0, retry_wait)
+        return max(retry_wait, missing / self.rate - (now - self._refilled_at))
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "open_for_sec": max(0.0, round(self.open_until - self._clock(), 1)) if self.state == OPEN else 0.0,
+            "rate_per_sec": round(self.rate, 3),
+            "tokens": round(self._tokens, 2),
+        }
+
+    def _hold_until(self, until: float) -> None:
+        if until > self._retry_until:
+            self._retry_until = until
+            # The bucket starts refilling once the hold ends.
+            self._refilled_at = max(self._refilled_at, until)
+
+    def _take_token(self, now: float) -> bool:
+        if now < self._retry_until:
+            return False
+        self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    async def _open(self, duration: float) -> None:
+        self.state = OPEN
+        self.open_until = self._clock() + duration
+        self._probe_in_flight = False
+        logger.warning(
+            "upstream_breaker_opened",
+            service="depth-service",
+            action="upstream_breaker",
+            upstream=self.name,
+            failures=self.failures,
+            open_sec=duration,
+            rate_per_sec=round(self.rate, 3),
+        )
+        await self._publish()
+
+    async def _claim_probe(self) -> bool:
+        """Only one worker probes a half-open upstream at a time."""
+        r = await get_redis()
+        if r is None:
+            return True
+        try:
+            claimed = await r.set(
+                f"upstream:{self.name}:probe", "1", nx=True, ex=max(1, int(self.open_sec))
+            )
+            return bool(claimed)
+        except Exception:
+            return True
+
+    async def _publish(self) -> None:
+        r = await get_redis()
+        if r is None:
+            return
+        version = self._clock()
+        self._applied_version = version
+        payload = {
+            "state": CLOSED if self.state == CLOSED else OPEN,
+            "open_until": self.open_until,
+            "rate": self.rate,
+            "retry_until": self._retry_until,
+            "version": version,
+        }
+        try:
+            await r.set(self._state_key, json.dumps(payload), ex=settings.BREAKER_STATE_TTL_SEC)
+            if self.state == CLOSED:
+                await r.delete(f"upstream:{self.name}:probe")
+        except Exception as e:
+            logger.warning(
+                "upstream_breaker_publish_error",
+                service="depth-service",
+                action="upstream_breaker",
+                upstream=self.name,
+                error=str(e),
+            )
+
+    async def _sync(self) -> None:
+        now = self._clock()
+        if now - self._last_sync < settings.BREAKER_SYNC_SEC:
+            return
+        self._last_sync = now
+        r = await get_redis()
+        if r is None:
+            return
+        try:
+            raw = await r.get(self._state_key)
+        except Exception:
+            return
+        if not raw:
+            return
+        try:
+            shared = json.loads(raw)
+            version = float(shared["version"])
+            state = shared["state"]
+            open_until = float(shared.get("open_until", 0.0))
+            rate = float(shared.get("rate", self.rate))
+            retry_until = float(shared.get("retry_until", 0.0))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            # Corrupt or foreign value: keep running on the local state.
+            logger.warning(
+                "upstream_breaker_state_invalid",
+                service="depth-service",
+                action="upstream_breaker",
+                upstream=self.name,
+                error=str(e),
+            )
+            return
+        if version <= self._applied_version:
+            return
+
+        self._applied_version = version
+        self.rate = min(self.max_rate, rate)
+        self._hold_until(retry_until)
+        if state == OPEN and open_until > now:
+            self.state = OPEN
+            self.open_until = open_until
+        elif state == CLOSED and self.state != CLOSED:
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Retry-After in seconds; the HTTP-date form is ignored."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+_guards: dict[str, UpstreamGuard] = {}
+
+
+def _rate_limits(name: str) -> tuple[float, int]:
+    if name == OVERPASS:
+        return settings.OVERPASS_RATE_PER_SEC, settings.OVERPASS_RATE_BURST
+    return settings.GEBCO_RATE_PER_SEC, settings.GEBCO_RATE_BURST
+
+
+def get_upstream_guard(name: str) -> UpstreamGuard:
+    guard = _guards.get(name)
+    if guard is None:
+        rate, burst = _rate_limits(name)
+        guard = UpstreamGuard(name, rate_per_sec=rate, burst=burst)
+        _guards[name] = guard
+    return guard
+
+
+def reset_upstream_guards() -> None:
+    _guards.clear()
+
+
+def breaker_stats() -> dict:
+    return {name: get_upstream_guard(name).snapshot() for name in (GEBCO, OVERPASS)}
@@ -0,0 +1,126 @@
+import importlib.util
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+from app.core.metrics import UPSTREAM_REQUEST_SECONDS
+
+logger = get_logger(__name__)
+
+GEBCO = "gebco"
+OVERPASS = "overpass"
+
+_clients: dict[str, httpx.AsyncClient] = {}
+_transports: dict[str, "_TimedTransport"] = {}
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def _timeout(upstream: str) -> httpx.Timeout:
+    if upstream == OVERPASS:
+        return httpx.Timeout(settings.OVERPASS_TIMEOUT + 5, connect=5.0)
+    return httpx.Timeout(settings.GEBCO_HTTP_TIMEOUT, connect=5.0)
+
+
+class _TimedTransport(httpx.AsyncBaseTransport):
+    """Records latency (to response headers) and status of every upstream request,
+    and counts requests in flight for /health."""
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self._transport = transport
+        self.in_flight = 0
+        self.requests = 0
+
+    def connection_counts(self) -> tuple[int, int] | None:
+        """(open, idle) connections of the wrapped pool; None if httpx no longer exposes them."""
+        try:
+            connections = list(self._transport._pool.connections)
+            return len(connections), sum(1 for c in connections if c.is_idle())
+        except Exception:
+            return None
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        status = "error"
+        self.in_flight += 1
+        self.requests += 1
+        try:
+            response = await self._transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        except httpx.TimeoutException:
+            status = "timeout"
+            raise
+        finally:
+            self.in_flight -= 1
+            UPSTREAM_REQUEST_SECONDS.labels(upstream=self.upstream, status=status).observe(
+                time.perf_counter() - started
+            )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _build_client(upstream: str) -> httpx.AsyncClient:
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SEC,
+        ),
+        http2=_http2_available(),
+    )
+    timed = _TimedTransport(upstream, transport)
+    _transports[upstream] = timed
+    return httpx.AsyncClient(timeout=_timeout(upstream), transport=timed)
+
+
+def get_http_client(upstream: str) -> httpx.AsyncClient:
+    """Pooled client for one upstream; created on first use outside the app lifespan."""
+    client = _clients.get(upstream)
+    if client is None or client.is_closed:
+        client = _build_client(upstream)
+        _clients[upstream] = client
+    return client
+
+
+async def init_http_clients() -> None:
+    for upstream in (GEBCO, OVERPASS):
+        get_http_client(upstream)
+    logger.info(
+        "http_clients_ready",
+        service="depth-service",
+        action="http_clients_init",
+        upstreams=sorted(_clients),
+        http2=_http2_available(),
+    )
+
+
+async def close_http_clients() -> None:
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
+    _transports.clear()
+
+
+def pool_stats() -> dict:
+    """Per-upstream request counters; connection counts read "unknown" if unavailable."""
+    stats = {}
+    for upstream, transport in _transports.items():
+        counts = transport.connection_counts()
+        connections, idle = counts if counts is not None else ("unknown", "unknown")
+        stats[upstream] = {
+            "in_flight": transport.in_flight,
+            # Beyond max_connections, requests queue for a free connection.
+            "waiting": max(0, transport.in_flight - settings.HTTP_MAX_CONNECTIONS),
+            "requests": transport.requests,
+            "connections": connections,
+            "idle": idle,
+            "max_connections": settings.HTTP_MAX_CONNECTIONS,
+        }
+    return stats
@@ -0,0 +1,77 @@
+"""Prometheus metrics for the depth-service hot paths, served on /metrics.
+
+The service runs as a single uvicorn process, so the default in-process
+registry is enough. Pool workers don't report anything themselves;
+recolor time is measured in the parent around the pool call.
+"""
+
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Memory-cache tile hits are sub-millisecond; the default buckets start at 5 ms.
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DEPTH_RESOLVE_SECONDS = Histogram(
+    "depth_resolve_seconds",
+    "Time to resolve a depth point, by the source that answered (cache, osm, gvr, gebco_2024, none)",
+    ["source"],
+    buckets=_FAST_BUCKETS,
+)
+
+TILE_FETCH_SECONDS = Histogram(
+    "depth_tile_fetch_seconds",
+    "Time to serve a raster tile, by where it came from (memory, disk, upstream, unavailable)",
+    ["outcome"],
+    buckets=_FAST_BUCKETS,
+)
+
+TILE_RECOLOR_SECONDS = Histogram(
+    "depth_tile_recolor_seconds",
+    "Time to recolor a raw tile, including the wait for a pool worker",
+    ["scheme"],
+    buckets=_FAST_BUCKETS,
+)
+
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "depth_upstream_request_seconds",
+    "Upstream HTTP time to response headers, by upstream and status (code, timeout or error)",
+    ["upstream", "status"],
+)
+
+REDIS_CACHE_REQUESTS = Counter(
+    "depth_redis_cache_requests_total",
+    "Redis cache lookups by keyspace and result (hit, miss, error)",
+    ["keyspace", "result"],
+)
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    """Observe the block's duration; labels may be filled in inside the block."""
+    started = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - started)
+
+
+def cache_keyspace(key: str) -> str:
+    """``depth:gebco:1:2`` -> ``gebco``; point keys ``depth:60.1:30.2`` -> ``depth``."""
+    prefix, _, rest = key.partition(":")
+    second = rest.split(":", 1)[0]
+    return second if second.isalpha() else prefix
+
+
+def count_cache_lookup(key: str, hit: bool) -> None:
+    REDIS_CACHE_REQUESTS.labels(keyspace=cache_keyspace(key), result="hit" if hit else "miss").inc()
+
+
+def count_cache_error(keys: list[str]) -> None:
+    for key in keys:
+        REDIS_CACHE_REQUESTS.labels(keyspace=cache_keyspace(key), result="error").inc()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
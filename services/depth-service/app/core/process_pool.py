@@ -0,0 +1,117 @@
+"""Process pool for CPU-bound image work (PNG/TIFF decode, recolor, encode).
+
+PIL and the numpy LUT passes hold the GIL long enough to stall the event
+loop when run inline or in a thread, so they go to worker processes
+started in the app lifespan. At most PROCESS_POOL_QUEUE_PER_WORKER jobs
+per worker are running or queued; a caller that cannot get a slot within
+PROCESS_POOL_WAIT_SEC gets ProcessPoolBusy, which the app answers with
+503 instead of letting the queue grow without bound.
+
+Outside the lifespan (tests, one-off scripts) run_cpu falls back to a
+thread.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_executor: ProcessPoolExecutor | None = None
+_slots: asyncio.Semaphore | None = None
+_max_pending = 0
+# Jobs submitted and not finished yet, and callers still waiting for a slot.
+_pending = 0
+_waiting = 0
+
+
+class ProcessPoolBusy(Exception):
+    pass
+
+
+def _worker_count() -> int:
+    return settings.PROCESS_POOL_WORKERS or os.cpu_count() or 1
+
+
+async def init_process_pool() -> None:
+    global _executor, _slots, _max_pending
+    if _executor is not None:
+        return
+    workers = _worker_count()
+    # spawn, not fork: the parent already holds an event loop, DB and Redis
+    # connections that must not be shared with the children.
+    _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    _max_pending = workers * settings.PROCESS_POOL_QUEUE_PER_WORKER
+    _slots = asyncio.Semaphore(_max_pending)
+    logger.info(
+        "process_pool_ready",
+        service="depth-service",
+        action="process_pool_init",
+        workers=workers,
+        max_pending=_max_pending,
+    )
+
+
+async def close_process_pool() -> None:
+    global _executor, _slots
+    if _executor is None:
+        return
+    executor, _executor, _slots = _executor, None, None
+    await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+
+async def run_cpu(fn: Callable[..., Any], *args) -> Any:
+    """Run ``fn(*args)`` in the pool; ``fn`` and its arguments must be picklable."""
+    global _pending, _waiting
+    executor, slots = _executor, _slots
+    if executor is None or slots is None:
+        return await asyncio.to_thread(fn, *args)
+
+    _waiting += 1
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=settings.PROCESS_POOL_WAIT_SEC)
+    except asyncio.TimeoutError:
+        logger.warning(
+            "process_pool_busy",
+            service="depth-service",
+            action="process_pool",
+            job=getattr(fn, "__name__", str(fn)),
+            max_pending=_max_pending,
+        )
+        raise ProcessPoolBusy(f"process pool saturated ({_max_pending} jobs pending)")
+    finally:
+        _waiting -= 1
+
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    _pending += 1
+    # Freed when the job really finishes, not when a cancelled caller gives up
+    # on it, so abandoned jobs still count against the bound.
+    loop = asyncio.get_running_loop()
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(_release, slots))
+    return await asyncio.wrap_future(future)
+
+
+def _release(slots: asyncio.Semaphore) -> None:
+    global _pending
+    _pending -= 1
+    slots.release()
+
+
+def process_pool_stats() -> dict:
+    if _executor is None or _slots is None:
+        return {"workers": 0, "pending": 0, "waiting": 0, "max_pending": 0}
+    return {
+        "workers": _worker_count(),
+        "pending": _pending,
+        "waiting": _waiting,
+        "max_pending": _max_pending,
+    }
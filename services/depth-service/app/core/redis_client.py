@@ -4,6 +4,7 @@ import redis.asyncio as aioredis
 
 from app.core.config import settings
 from app.core.logging_config import get_logger
+from app.core.metrics import count_cache_error, count_cache_lookup
 
 logger = get_logger(__name__)
 
@@ -44,9 +45,11 @@ async def cache_get(key: str) -> dict | None:
         return None
     try:
         raw = await r.get(key)
+        count_cache_lookup(key, bool(raw))
         if raw:
             return json.loads(raw)
     except Exception as e:
+        count_cache_error([key])
         logger.warning(
             "redis_cache_get_error",
             service="depth-service",
@@ -56,6 +59,28 @@ async def cache_get(key: str) -> dict | None:
     return None
 
 
+async def cache_get_many(keys: list[str]) -> list[dict | None]:
+    if not keys:
+        return []
+    r = await get_redis()
+    if r is None:
+        return [None] * len(keys)
+    try:
+        raws = await r.mget(keys)
+        for key, raw in zip(keys, raws):
+            count_cache_lookup(key, bool(raw))
+        return [json.loads(raw) if raw else None for raw in raws]
+    except Exception as e:
+        count_cache_error(keys)
+        logger.warning(
+            "redis_cache_get_many_error",
+            service="depth-service",
+            action="redis_cache_get_many",
+            error=str(e),
+        )
+    return [None] * len(keys)
+
+
 async def cache_set(key: str, value: dict, ttl: int | None = None) -> None:
     r = await get_redis()
     if r is None:
@@ -72,6 +97,78 @@ async def cache_set(key: str, value: dict, ttl: int | None = None) -> None:
         )
 
 
+async def cache_set_many(items: list[tuple[str, dict]], ttl: int | None = None) -> None:
+    if not items:
+        return
+    r = await get_redis()
+    if r is None:
+        return
+    try:
+        effective_ttl = ttl or settings.DEPTH_CACHE_TTL
+        async with r.pipeline(transaction=False) as pipe:
+            for key, value in items:
+                pipe.set(key, json.dumps(value), ex=effective_ttl)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(
+            "redis_cache_set_many_error",
+            service="depth-service",
+            action="redis_cache_set_many",
+            error=str(e),
+        )
+
+
+async def cache_get_raw(key: str) -> str | None:
+    r = await get_redis()
+    if r is None:
+        return None
+    try:
+        raw = await r.get(key)
+        count_cache_lookup(key, raw is not None)
+        return raw
+    except Exception as e:
+        count_cache_error([key])
+        logger.warning(
+            "redis_cache_get_error",
+            service="depth-service",
+            action="redis_cache_get_raw",
+            error=str(e),
+        )
+    return None
+
+
+async def cache_set_raw(key: str, value: str, ttl: int | None = None) -> None:
+    r = await get_redis()
+    if r is None:
+        return
+    try:
+        effective_ttl = ttl or settings.DEPTH_CACHE_TTL
+        await r.set(key, value, ex=effective_ttl)
+    except Exception as e:
+        logger.warning(
+            "redis_cache_set_error",
+            service="depth-service",
+            action="redis_cache_set_raw",
+            error=str(e),
+        )
+
+
+async def cache_incr(key: str) -> int | None:
+    r = await get_redis()
+    if r is None:
+        return None
+    try:
+        return await r.incr(key)
+    except Exception as e:
+        logger.warning(
+            "redis_cache_incr_error",
+            service="depth-service",
+            action="redis_cache_incr",
+            error=str(e),
+        )
+    return None
+
+
 async def close_redis() -> None:
     global _redis
     if _redis is not None:
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import secrets
+import time
+from typing import Any, Awaitable, Callable
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+from app.core.redis_client import get_redis
+
+logger = get_logger(__name__)
+
+_POLL_INTERVAL_SEC = 0.05
+
+# Delete the lock only if it still holds our token: once the TTL expires
+# another worker may have taken it over.
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution.
+
+    Callers in this process await a shared task. With SINGLE_FLIGHT_REDIS
+    enabled, workers also coordinate through a Redis lock: the lock holder
+    does the work while the others wait for it to be released and then
+    read the result through ``recheck`` (e.g. the cache the leader just
+    filled). Without ``recheck`` the leader publishes a JSON copy of its
+    result for the lock lifetime instead.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        recheck: Callable[..., Awaitable[Any]] | None = None,
+    ):
+        self.name = name
+        self.recheck = recheck
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, fn, args, kwargs))
+            task.add_done_callback(_consume_exception)
+            self._inflight[key] = task
+        else:
+            logger.debug(
+                "single_flight_joined",
+                service="depth-service",
+                action="single_flight",
+                flight=self.name,
+                key=key,
+            )
+        return await asyncio.shield(task)
+
+    async def _run(self, key: str, fn, args, kwargs) -> Any:
+        try:
+            if settings.SINGLE_FLIGHT_REDIS:
+                return await self._run_distributed(key, fn, args, kwargs)
+            return await fn(*args, **kwargs)
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _run_distributed(self, key: str, fn, args, kwargs) -> Any:
+        r = await get_redis()
+        if r is None:
+            return await fn(*args, **kwargs)
+
+        lock_key = f"singleflight:{self.name}:{key}"
+        result_key = f"{lock_key}:result"
+        ttl = settings.SINGLE_FLIGHT_LOCK_TTL_SEC
+        token = secrets.token_hex(16)
+        try:
+            acquired = await r.set(lock_key, token, nx=True, ex=ttl)
+        except Exception as e:
+            logger.warning(
+                "single_flight_lock_error",
+                service="depth-service",
+                action="single_flight",
+                flight=self.name,
+                error=str(e),
+            )
+            return await fn(*args, **kwargs)
+
+        if acquired:
+            try:
+                result = await fn(*args, **kwargs)
+                if self.recheck is None and result is not None:
+                    try:
+                        await r.set(result_key, json.dumps(result), ex=ttl)
+                    except RedisError as e:
+                        self._log_redis_error("publish", e)
+                return result
+            finally:
+                try:
+                    await r.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+                except RedisError as e:
+                    self._log_redis_error("release", e)
+
+        try:
+            deadline = time.monotonic() + ttl
+            while time.monotonic() < deadline and await r.exists(lock_key):
+                await asyncio.sleep(_POLL_INTERVAL_SEC)
+            raw = None if self.recheck is not None else await r.get(result_key)
+        except RedisError as e:
+            self._log_redis_error("wait", e)
+            return await fn(*args, **kwargs)
+
+        if self.recheck is not None:
+            result = await self.recheck(*args, **kwargs)
+        else:
+            result = json.loads(raw) if raw else None
+        if result is not None:
+            return result
+        return await fn(*args, **kwargs)
+
+    def _log_redis_error(self, step: str, error: Exception) -> None:
+        logger.warning(
+            "single_flight_redis_error",
+            service="depth-service",
+            action="single_flight",
+            flight=self.name,
+            step=step,
+            error=str(error),
+        )
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    # Every waiter may have been cancelled; don't let asyncio log the error.
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,28 @@
+"""Per-request record of upstream failures.
+
+Source lookups swallow their errors and return None, the same as "nothing
+found". They also note the failure here, so a caller inside
+``track_upstream_errors()`` can tell "no data" apart from "could not ask".
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+_failures: ContextVar[set[str] | None] = ContextVar("upstream_failures", default=None)
+
+
+def record_upstream_error(source: str) -> None:
+    failures = _failures.get()
+    if failures is not None:
+        failures.add(source)
+
+
+@contextmanager
+def track_upstream_errors() -> Iterator[set[str]]:
+    failures: set[str] = set()
+    token = _failures.set(failures)
+    try:
+        yield failures
+    finally:
+        _failures.reset(token)
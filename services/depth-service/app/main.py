@@ -1,11 +1,18 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 
 from app.api.v1 import router as v1_router
+from app.core.circuit_breaker import breaker_stats
 from app.core.config import settings
+from app.core.http_clients import close_http_clients, init_http_clients, pool_stats
 from app.core.logging_config import get_logger
+from app.core.metrics import render_metrics
+from app.core.process_pool import ProcessPoolBusy, close_process_pool, init_process_pool, process_pool_stats
+from app.services.polygon_index import get_polygon_index, refresh_polygon_index
+from app.services.tile_memory_cache import tile_memory_cache
 
 logger = get_logger(__name__)
 
@@ -16,12 +23,20 @@ _seed_task = None
 async def lifespan(app: FastAPI):
     global _seed_task
     logger.info("startup_event", service="depth-service", action="startup")
+    await init_http_clients()
+    await init_process_pool()
+    await refresh_polygon_index()
     if settings.POLYGON_SEED_ON_STARTUP:
         import asyncio
-        from app.services.osm_polygon_importer import seed_polygons_if_empty
+        from app.services.osm_polygon_importer import seed_missing_polygons
 
-        _seed_task = asyncio.create_task(seed_polygons_if_empty())
+        _seed_task = asyncio.create_task(seed_missing_polygons())
     yield
+    from app.services.tile_store import close_tile_store
+
+    close_tile_store()
+    await close_process_pool()
+    await close_http_clients()
     logger.info("shutdown_event", service="depth-service", action="shutdown")
 
 
@@ -43,6 +58,15 @@ app.add_middleware(
 app.include_router(v1_router, prefix="/api/v1")
 
 
+@app.exception_handler(ProcessPoolBusy)
+async def process_pool_busy_handler(request: Request, exc: ProcessPoolBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
 @app.get("/health")
 async def health_check():
     logger.info("health_check", service="depth-service", action="health_check")
@@ -51,4 +75,15 @@ async def health_check():
         "service": "depth-service",
         "version": "2.0.0",
         "data_source": "GEBCO + OSM + GVR",
+        "tile_cache": tile_memory_cache.stats(),
+        "upstream_pools": pool_stats(),
+        "upstream_breakers": breaker_stats(),
+        "process_pool": process_pool_stats(),
+        "polygon_index": len(get_polygon_index() or ()),
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
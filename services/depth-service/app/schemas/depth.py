@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+
+
+class DepthPoint(BaseModel):
+    lat: float = Field(..., ge=-90, le=90, description="Latitude")
+    lon: float = Field(..., ge=-180, le=180, description="Longitude")
+
+
+class DepthPointsRequest(BaseModel):
+    points: list[DepthPoint] = Field(
+        ..., min_length=1, max_length=settings.DEPTH_BATCH_MAX_POINTS
+    )
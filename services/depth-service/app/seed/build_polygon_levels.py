@@ -0,0 +1,56 @@
+"""(Re)build the simplification pyramid for polygons already in the database.
+
+The importer fills water_body_polygon_levels for new polygons; run this
+once after migration 013, or after changing SIMPLIFY_LEVELS:
+
+    python -m app.seed.build_polygon_levels
+"""
+
+import asyncio
+
+from sqlalchemy import text
+
+from app.core.database import async_session, engine
+from app.core.logging_config import get_logger
+from app.services.coord_codec import rings_from_row
+from app.services.osm_polygon_importer import store_polygon_levels
+from app.services.polygon_simplify import SIMPLIFY_LEVELS
+
+logger = get_logger(__name__)
+
+
+async def build_levels():
+    logger.info(
+        "polygon_levels_start",
+        service="depth-service",
+        action="build_polygon_levels",
+        levels=len(SIMPLIFY_LEVELS),
+    )
+
+    async with async_session() as session:
+        result = await session.execute(
+            text(
+                "SELECT id, coordinates_bin, coordinates FROM water_body_polygons ORDER BY id"
+            )
+        )
+        rows = result.fetchall()
+
+        for row in rows:
+            await store_polygon_levels(session, row.id, rings_from_row(row).rings())
+        await session.execute(
+            text("DELETE FROM water_body_polygon_levels WHERE level > :max_level"),
+            {"max_level": len(SIMPLIFY_LEVELS)},
+        )
+        await session.commit()
+
+    logger.info(
+        "polygon_levels_completed",
+        service="depth-service",
+        action="build_polygon_levels",
+        polygons=len(rows),
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(build_levels())
@@ -0,0 +1,106 @@
+"""Convert a (possibly compressed) GEBCO GeoTIFF into a memory-mappable grid.
+
+    python -m app.seed.convert_gebco_raster gebco.tif /data/gebco.npy
+
+Writes ``<target>.npy`` plus a ``<target>.json`` sidecar with the affine
+transform and nodata value; point GEBCO_GEOTIFF_PATH at the ``.npy`` file.
+
+The global grid is several GB once decoded, so it is never held in RAM:
+each compressed strip or tile is decoded on its own and written straight
+into the ``.npy`` through a memory map, one row of blocks at a time.
+"""
+
+import argparse
+import json
+import struct
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, TiffImagePlugin
+
+from app.core.logging_config import get_logger
+from app.services.raster_engine import geotiff_nodata, geotiff_transform, open_tiff_band
+
+logger = get_logger(__name__)
+
+_TAG_WIDTH = 256
+_TAG_HEIGHT = 257
+_TAG_ROWS_PER_STRIP = 278
+_TAG_STRIP_OFFSETS = 273
+_TAG_STRIP_BYTE_COUNTS = 279
+# Tags that describe how a single block is encoded; copied into each
+# one-block TIFF handed to the decoder.
+_CODING_TAGS = (258, 259, 262, 277, 284, 317, 339)
+
+
+def _decode_block(raw: bytes, ifd, prefix: bytes, width: int, height: int) -> np.ndarray:
+    """Decode one strip or tile by wrapping it in a minimal single-strip TIFF."""
+    block_ifd = TiffImagePlugin.ImageFileDirectory_v2(prefix=prefix)
+    for tag in _CODING_TAGS:
+        if tag in ifd:
+            block_ifd[tag] = ifd[tag]
+            block_ifd.tagtype[tag] = ifd.tagtype[tag]
+    for tag, value in ((_TAG_WIDTH, width), (_TAG_HEIGHT, height), (_TAG_ROWS_PER_STRIP, height)):
+        block_ifd[tag] = value
+        block_ifd.tagtype[tag] = 4
+    # tobytes() rebases StripOffsets to just past the IFD, where the data goes.
+    block_ifd[_TAG_STRIP_OFFSETS] = (0,)
+    block_ifd.tagtype[_TAG_STRIP_OFFSETS] = 4
+    block_ifd[_TAG_STRIP_BYTE_COUNTS] = (len(raw),)
+    block_ifd.tagtype[_TAG_STRIP_BYTE_COUNTS] = 4
+
+    order = "<" if prefix == b"II" else ">"
+    buf = BytesIO(prefix + struct.pack(f"{order}HI", 42, 8) + block_ifd.tobytes(8) + raw)
+    with Image.open(buf) as img:
+        return np.asarray(img)
+
+
+def convert_geotiff(source: Path, target: Path) -> Path:
+    band = open_tiff_band(source)
+    ifd = band.ifd
+    prefix = b"II" if band.byteorder == "<" else b"MM"
+
+    target = target.with_suffix(".npy")
+    grid = np.lib.format.open_memmap(
+        target, mode="w+", dtype=band.dtype.newbyteorder("="), shape=band.shape
+    )
+    for top in range(0, band.height, band.block_h):
+        # Strips stop at the last image row; tiles are always full size.
+        rows = min(band.block_h, band.height - top)
+        block_rows = band.block_h if band.tiled else rows
+        for left in range(0, band.width, band.block_w):
+            raw = band.block_bytes(band.block_index(top, left))
+            decoded = _decode_block(raw, ifd, prefix, band.block_w, block_rows)
+            cols = min(band.block_w, band.width - left)
+            grid[top:top + rows, left:left + cols] = decoded[:rows, :cols]
+        grid.flush()
+    shape, dtype = list(grid.shape), str(grid.dtype)
+    del grid
+
+    target.with_suffix(".json").write_text(
+        json.dumps({"transform": geotiff_transform(ifd), "nodata": geotiff_nodata(ifd)})
+    )
+
+    logger.info(
+        "raster_converted",
+        service="depth-service",
+        action="raster_convert",
+        source=str(source),
+        target=str(target),
+        shape=shape,
+        dtype=dtype,
+    )
+    return target
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert a GEBCO GeoTIFF to .npy")
+    parser.add_argument("source", type=Path)
+    parser.add_argument("target", type=Path)
+    args = parser.parse_args()
+    convert_geotiff(args.source, args.target)
+
+
+if __name__ == "__main__":
+    main()
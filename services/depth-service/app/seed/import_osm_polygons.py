@@ -0,0 +1,50 @@
+"""Import (or re-import) OSM polygons for the known water bodies.
+
+The service seeds missing polygons on startup by itself; use this to
+refresh them from OSM or to import a few by name:
+
+    python -m app.seed.import_osm_polygons --replace
+    python -m app.seed.import_osm_polygons --only "Онежское озеро"
+"""
+
+import argparse
+import asyncio
+
+from app.core.database import engine
+from app.core.http_clients import close_http_clients
+from app.core.logging_config import get_logger
+from app.seed.seed_water_bodies import WATER_BODIES
+from app.services.osm_polygon_importer import after_polygons_changed, import_water_bodies
+
+logger = get_logger(__name__)
+
+
+async def run(replace: bool, only: list[str] | None) -> None:
+    bodies = [wb for wb in WATER_BODIES if not only or wb["name"] in only]
+    try:
+        imported = await import_water_bodies(bodies, replace=replace)
+        if imported:
+            await after_polygons_changed()
+    finally:
+        await close_http_clients()
+        await engine.dispose()
+
+    logger.info(
+        "polygon_import_cli_completed",
+        service="depth-service",
+        action="import_osm_polygons",
+        requested=len(bodies),
+        imported=imported,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import OSM polygons for known water bodies")
+    parser.add_argument("--replace", action="store_true", help="Overwrite polygons already imported")
+    parser.add_argument("--only", action="append", help="Water body name; repeat for several")
+    args = parser.parse_args()
+    asyncio.run(run(args.replace, args.only))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Import a loose ``<layer>/z/x/y.png`` tile tree into the MBTiles store.
+
+    python -m app.seed.import_tile_cache --source /tmp/depth_tiles --target /data/mbtiles
+"""
+
+import argparse
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+from app.services.tile_store import MBTilesTileStore, TileRecord, TileStore
+
+logger = get_logger(__name__)
+
+_DEFAULT_BATCH_SIZE = 500
+
+
+def _iter_layer_tiles(layer_dir: Path):
+    for path in layer_dir.glob("*/*/*.png"):
+        try:
+            z, x, y = int(path.parent.parent.name), int(path.parent.name), int(path.stem)
+        except ValueError:
+            continue
+        yield z, x, y, path
+
+
+def import_tile_tree(
+    source: Path, store: TileStore, batch_size: int = _DEFAULT_BATCH_SIZE
+) -> dict[str, int]:
+    imported: dict[str, int] = {}
+    for layer_dir in sorted(p for p in source.iterdir() if p.is_dir()):
+        layer = layer_dir.name
+        batch: list[TileRecord] = []
+        count = 0
+        for z, x, y, path in _iter_layer_tiles(layer_dir):
+            batch.append((z, x, y, path.read_bytes()))
+            if len(batch) >= batch_size:
+                count += store.put_many(layer, batch)
+                batch = []
+        count += store.put_many(layer, batch)
+        imported[layer] = count
+
+        logger.info(
+            "tile_import_layer_done",
+            service="depth-service",
+            action="tile_import",
+            layer=layer,
+            tiles=count,
+        )
+    return imported
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import TILE_CACHE_DIR into MBTiles")
+    parser.add_argument("--source", default=settings.TILE_CACHE_DIR)
+    parser.add_argument(
+        "--target", default=settings.TILE_MBTILES_DIR or settings.TILE_CACHE_DIR
+    )
+    parser.add_argument("--batch-size", type=int, default=_DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    store = MBTilesTileStore(args.target)
+    try:
+        imported = import_tile_tree(Path(args.source), store, args.batch_size)
+    finally:
+        store.close()
+
+    logger.info(
+        "tile_import_completed",
+        service="depth-service",
+        action="tile_import",
+        layers=len(imported),
+        tiles=sum(imported.values()),
+    )
+
+
+if __name__ == "__main__":
+    main()
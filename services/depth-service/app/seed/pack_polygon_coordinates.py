@@ -0,0 +1,64 @@
+"""Convert JSONB polygon coordinates to the packed ``coordinates_bin`` form.
+
+Run once after migration 014; already packed rows are skipped:
+
+    python -m app.seed.pack_polygon_coordinates
+"""
+
+import asyncio
+
+from sqlalchemy import text
+
+from app.core.database import async_session, engine
+from app.core.logging_config import get_logger
+from app.services.coord_codec import encode_rings, rings_from_row
+
+logger = get_logger(__name__)
+
+_TABLES = {
+    "water_body_polygons": "id",
+    "water_body_polygon_levels": "polygon_id, level",
+}
+
+
+async def _pack_table(session, table: str, key_columns: str) -> int:
+    keys = [k.strip() for k in key_columns.split(",")]
+    result = await session.execute(
+        text(
+            f"SELECT {key_columns}, coordinates FROM {table}"
+            " WHERE coordinates_bin IS NULL AND coordinates IS NOT NULL"
+        )
+    )
+    rows = result.fetchall()
+    if not rows:
+        return 0
+
+    where = " AND ".join(f"{k} = :{k}" for k in keys)
+    await session.execute(
+        text(f"UPDATE {table} SET coordinates_bin = :packed, coordinates = NULL WHERE {where}"),
+        [
+            {**{k: getattr(row, k) for k in keys}, "packed": encode_rings(rings_from_row(row).rings())}
+            for row in rows
+        ],
+    )
+    return len(rows)
+
+
+async def pack():
+    packed = {}
+    async with async_session() as session:
+        for table, key_columns in _TABLES.items():
+            packed[table] = await _pack_table(session, table, key_columns)
+        await session.commit()
+
+    logger.info(
+        "polygon_pack_completed",
+        service="depth-service",
+        action="pack_polygon_coordinates",
+        **packed,
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(pack())
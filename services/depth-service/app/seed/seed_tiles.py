@@ -0,0 +1,218 @@
+"""Pre-render depth tiles for known fishing waters into the tile store.
+
+Walks the tile pyramid over every bbox in seed_water_bodies.WATER_BODIES,
+fetches raw tiles with bounded concurrency (through the same raw layer
+and GEBCO breaker the service uses), recolors them for every scheme in a
+process pool and writes the results to the configured TileStore. Finished
+(water body, zoom) pairs are recorded in a checkpoint file, so an
+interrupted run resumes where it stopped; tiles already in the store are
+skipped either way.
+
+    python -m app.seed.seed_tiles --min-zoom 6 --max-zoom 11
+    python -m app.seed.seed_tiles --only "Ладожское озеро" --schemes navionics
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.http_clients import close_http_clients
+from app.core.logging_config import get_logger
+from app.seed.seed_water_bodies import WATER_BODIES
+from app.services.bbox_cache import tile_range
+from app.services.depth_colors import COLOR_SCHEMES
+from app.services.depth_reader import fetch_raw_tile
+from app.services.tile_store import close_tile_store, get_tile_store
+
+logger = get_logger(__name__)
+
+_DEFAULT_MIN_ZOOM = 6
+_DEFAULT_MAX_ZOOM = 11
+_DEFAULT_CONCURRENCY = 8
+_FETCH_ATTEMPTS = 3
+_RETRY_DELAY_SEC = 2.0
+
+
+def iter_body_tiles(body: dict, z: int):
+    x0, y0, x1, y1 = tile_range(z, body["lat_min"], body["lon_min"], body["lat_max"], body["lon_max"])
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield x, y
+
+
+def derive_tiles(raw_tile: bytes, schemes: list[str]) -> list[bytes]:
+    """Runs in a pool worker: one recolored tile per scheme."""
+    if not settings.TILE_RECOLOR:
+        return [raw_tile] * len(schemes)
+
+    from app.services.tile_recolor import recolor_tile
+
+    return [recolor_tile(raw_tile, scheme=scheme) for scheme in schemes]
+
+
+class Checkpoint:
+    def __init__(self, path: Path | None):
+        self.path = path
+        self.done: set[str] = set()
+        if path is not None and path.exists():
+            self.done = set(json.loads(path.read_text()).get("done", []))
+
+    @staticmethod
+    def key(body: dict, z: int, schemes: list[str]) -> str:
+        return f"{body['name']}|{z}|{','.join(sorted(schemes))}"
+
+    def mark(self, key: str) -> None:
+        self.done.add(key)
+        if self.path is None:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"done": sorted(self.done)}, ensure_ascii=False))
+        os.replace(tmp, self.path)
+
+
+async def _seed_tile(
+    z: int,
+    x: int,
+    y: int,
+    schemes: list[str],
+    executor: Executor | None,
+    semaphore: asyncio.Semaphore,
+    stats: dict[str, int],
+) -> None:
+    store = get_tile_store()
+    existing = await asyncio.to_thread(lambda: [store.get(s, z, x, y) is not None for s in schemes])
+    missing = [s for s, present in zip(schemes, existing) if not present]
+    if not missing:
+        stats["skipped"] += 1
+        return
+
+    # Held through recolor and write too, so fetched tiles can't pile up
+    # in memory ahead of a slower process pool.
+    async with semaphore:
+        raw_tile = None
+        for attempt in range(_FETCH_ATTEMPTS):
+            raw_tile = await fetch_raw_tile(z, x, y)
+            if raw_tile is not None:
+                break
+            await asyncio.sleep(_RETRY_DELAY_SEC * (attempt + 1))
+        if raw_tile is None:
+            stats["failed"] += 1
+            return
+
+        if executor is None:
+            tiles = await asyncio.to_thread(derive_tiles, raw_tile, missing)
+        else:
+            tiles = await asyncio.get_running_loop().run_in_executor(executor, derive_tiles, raw_tile, missing)
+
+        for scheme, data in zip(missing, tiles):
+            await asyncio.to_thread(store.put, scheme, z, x, y, data)
+    stats["seeded"] += 1
+
+
+async def seed_tiles(
+    bodies: list[dict],
+    min_zoom: int = _DEFAULT_MIN_ZOOM,
+    max_zoom: int = _DEFAULT_MAX_ZOOM,
+    schemes: list[str] | None = None,
+    concurrency: int = _DEFAULT_CONCURRENCY,
+    executor: Executor | None = None,
+    checkpoint: Checkpoint | None = None,
+) -> dict[str, int]:
+    schemes = schemes or sorted(COLOR_SCHEMES)
+    checkpoint = checkpoint or Checkpoint(None)
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"seeded": 0, "skipped": 0, "failed": 0}
+    # Bodies overlap (a bay inside a lake); seed each tile once per run.
+    seen: set[tuple[int, int, int]] = set()
+
+    for body in bodies:
+        for z in range(min_zoom, max_zoom + 1):
+            key = Checkpoint.key(body, z, schemes)
+            if key in checkpoint.done:
+                continue
+
+            tiles = [(x, y) for x, y in iter_body_tiles(body, z) if (z, x, y) not in seen]
+            seen.update((z, x, y) for x, y in tiles)
+            failed_before = stats["failed"]
+            await asyncio.gather(*(
+                _seed_tile(z, x, y, schemes, executor, semaphore, stats) for x, y in tiles
+            ))
+
+            if stats["failed"] == failed_before:
+                checkpoint.mark(key)
+            logger.info(
+                "seed_tiles_level_done",
+                service="depth-service",
+                action="seed_tiles",
+                water_body=body["name"],
+                z=z,
+                tiles=len(tiles),
+                **stats,
+            )
+
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-render depth tiles for known water bodies")
+    parser.add_argument("--min-zoom", type=int, default=_DEFAULT_MIN_ZOOM)
+    parser.add_argument("--max-zoom", type=int, default=_DEFAULT_MAX_ZOOM)
+    parser.add_argument("--schemes", default=",".join(sorted(COLOR_SCHEMES)))
+    parser.add_argument("--only", action="append", help="Water body name; repeat for several")
+    parser.add_argument("--concurrency", type=int, default=_DEFAULT_CONCURRENCY)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Recolor processes; 0 recolors in a thread instead")
+    parser.add_argument("--checkpoint", default=str(Path(settings.TILE_CACHE_DIR) / "seed_tiles.checkpoint.json"))
+    parser.add_argument("--reset", action="store_true", help="Ignore and overwrite the checkpoint")
+    args = parser.parse_args()
+
+    bodies = [b for b in WATER_BODIES if not args.only or b["name"] in args.only]
+    checkpoint_path = Path(args.checkpoint)
+    checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    if args.reset and checkpoint_path.exists():
+        checkpoint_path.unlink()
+
+    async def run() -> dict[str, int]:
+        try:
+            return await seed_tiles(
+                bodies,
+                min_zoom=args.min_zoom,
+                max_zoom=args.max_zoom,
+                schemes=[s for s in args.schemes.split(",") if s],
+                concurrency=args.concurrency,
+                executor=executor,
+                checkpoint=Checkpoint(checkpoint_path),
+            )
+        finally:
+            await close_http_clients()
+
+    # Workers start lazily on the first submit, inside the running loop with
+    # HTTP clients and the tile store open; spawn keeps them out of the children.
+    executor = (
+        ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+        if args.workers > 0
+        else None
+    )
+    try:
+        stats = asyncio.run(run())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        close_tile_store()
+
+    logger.info(
+        "seed_tiles_completed",
+        service="depth-service",
+        action="seed_tiles",
+        water_bodies=len(bodies),
+        **stats,
+    )
+
+
+if __name__ == "__main__":
+    main()
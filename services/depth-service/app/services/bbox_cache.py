@@ -0,0 +1,163 @@
+"""Redis cache for the bbox endpoints (/depth/areas, /depth/labels).
+
+Request bboxes are snapped outward to a range of Web Mercator tiles at a
+zoom chosen from the bbox size, and the query runs on the snapped bounds.
+Every viewport that falls into the same tile range then maps to the same
+key and can reuse the serialized response. Keys carry a generation that
+the polygon importer bumps, so an import invalidates everything at once;
+old entries just age out.
+"""
+
+import math
+from typing import Awaitable, Callable
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+from app.core.redis_client import cache_get_raw, cache_incr, cache_set_raw
+from app.core.single_flight import SingleFlight
+
+logger = get_logger(__name__)
+
+_GENERATION_KEY = "depth:bbox:gen"
+_MAX_GRID_ZOOM = 14
+# Widest tile range (per axis) a bbox may snap to; caps how much larger
+# than the viewport the cached query gets.
+_MAX_GRID_SPAN = 3
+_MAX_MERCATOR_LAT = 85.0511287798066
+# Screen pixels per grid tile used to pick the simplification level. The
+# grid zoom is the deepest one the viewport fits in, so clients draw it
+# about one zoom level deeper, i.e. at twice the tile size.
+_VIEW_TILE_PX = 512
+
+
+def _tile_x(lon: float, n: int) -> int:
+    return min(max(int((lon + 180.0) / 360.0 * n), 0), n - 1)
+
+
+def _tile_y(lat: float, n: int) -> int:
+    lat = min(max(lat, -_MAX_MERCATOR_LAT), _MAX_MERCATOR_LAT)
+    rad = math.radians(lat)
+    ty = (1.0 - math.asinh(math.tan(rad)) / math.pi) / 2.0 * n
+    return min(max(int(ty), 0), n - 1)
+
+
+def grid_pixels(x0: int, y0: int, x1: int, y1: int) -> int:
+    """Screen width, in pixels, a client draws the widest axis of a tile range at."""
+    return (max(x1 - x0, y1 - y0) + 1) * _VIEW_TILE_PX
+
+
+def grid_tiles(x0: int, y0: int, x1: int, y1: int) -> int:
+    """Number of tiles in a tile range."""
+    return (x1 - x0 + 1) * (y1 - y0 + 1)
+
+
+def _tile_lat(ty: int, n: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+
+def tile_range(
+    z: int,
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+) -> tuple[int, int, int, int]:
+    """(x0, y0, x1, y1), inclusive, of the zoom-z tiles covering a bbox."""
+    n = 2 ** z
+    return _tile_x(min_lon, n), _tile_y(max_lat, n), _tile_x(max_lon, n), _tile_y(min_lat, n)
+
+
+def snap_bbox(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+) -> tuple[int, int, int, int, int]:
+    """(z, x0, y0, x1, y1): the deepest tile range covering the bbox within _MAX_GRID_SPAN."""
+    for z in range(_MAX_GRID_ZOOM, -1, -1):
+        x0, y0, x1, y1 = tile_range(z, min_lat, min_lon, max_lat, max_lon)
+        if x1 - x0 < _MAX_GRID_SPAN and y1 - y0 < _MAX_GRID_SPAN:
+            return z, x0, y0, x1, y1
+    return 0, 0, 0, 0, 0
+
+
+def grid_bounds(z: int, x0: int, y0: int, x1: int, y1: int) -> tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) of a tile range; edge rows extend to the poles."""
+    n = 2 ** z
+    min_lon = x0 / n * 360.0 - 180.0
+    max_lon = (x1 + 1) / n * 360.0 - 180.0
+    max_lat = 90.0 if y0 == 0 else _tile_lat(y0, n)
+    min_lat = -90.0 if y1 == n - 1 else _tile_lat(y1 + 1, n)
+    return min_lat, min_lon, max_lat, max_lon
+
+
+async def _generation() -> str:
+    return await cache_get_raw(_GENERATION_KEY) or "0"
+
+
+async def _read(key: str, build) -> str | None:
+    return await cache_get_raw(key)
+
+
+async def _build_and_store(key: str, build) -> str:
+    # A build that fails raises, so nothing partial is ever stored.
+    body, empty = await build()
+    ttl = settings.BBOX_CACHE_EMPTY_TTL if empty else settings.BBOX_CACHE_TTL
+    await cache_set_raw(key, body, ttl=ttl)
+    return body
+
+
+_bbox_flight = SingleFlight("bbox_cache", recheck=_read)
+
+
+async def cached_bbox_response(
+    kind: str,
+    variant: str,
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    build: Callable[[float, float, float, float, int, int], Awaitable[tuple[str, bool]]],
+) -> str:
+    """Serialized response for the snapped bbox, from Redis or built once.
+
+    ``build`` gets the snapped bounds, the pixel width they are drawn at
+    (grid_pixels) and the number of tiles they cover (grid_tiles), and
+    returns (body, is_empty). Empty bodies are kept only briefly. A build
+    that cannot complete must raise rather than return a partial body;
+    the error reaches the caller and nothing is cached.
+    """
+    z, x0, y0, x1, y1 = snap_bbox(min_lat, min_lon, max_lat, max_lon)
+    bounds = grid_bounds(z, x0, y0, x1, y1)
+    pixels = grid_pixels(x0, y0, x1, y1)
+    tiles = grid_tiles(x0, y0, x1, y1)
+
+    async def build_snapped():
+        return await build(*bounds, pixels, tiles)
+
+    if not settings.BBOX_CACHE_ENABLED:
+        body, _ = await build_snapped()
+        return body
+
+    key = f"depth:{kind}:g{await _generation()}:{variant}:{z}/{x0}-{x1}/{y0}-{y1}"
+    body = await cache_get_raw(key)
+    if body is not None:
+        logger.debug(
+            "bbox_cache_hit",
+            service="depth-service",
+            action="bbox_cache",
+            key=key,
+        )
+        return body
+
+    return await _bbox_flight.do(key, _build_and_store, key, build_snapped)
+
+
+async def invalidate_bbox_cache() -> None:
+    generation = await cache_incr(_GENERATION_KEY)
+    logger.info(
+        "bbox_cache_invalidated",
+        service="depth-service",
+        action="bbox_cache",
+        generation=generation,
+    )
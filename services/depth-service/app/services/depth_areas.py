@@ -1,23 +1,97 @@
-import json
+from typing import AsyncIterator
 
 from sqlalchemy import text
 
+from app.core.config import settings
 from app.core.database import async_session
 from app.core.logging_config import get_logger
+from app.services.coord_codec import rings_from_row
 from app.services.depth_colors import depth_to_color, depth_category_label
+from app.services.polygon_simplify import VIEWPORT_PX, level_for_bbox
 
 logger = get_logger(__name__)
 
-_MAX_FEATURES = 200
+_STREAM_BATCH_ROWS = 50
 
 
-async def get_depth_areas(
+def _polygon_feature(row, scheme: str) -> dict | None:
+    coords = rings_from_row(row)
+    if not len(coords):
+        # Sub-pixel at this level; the whole polygon simplified away.
+        return None
+    depth = row.max_depth if row.max_depth is not None else row.avg_depth
+    color = depth_to_color(depth, scheme) if depth else "#888888"
+
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": coords,
+        },
+        "properties": {
+            "name": row.name,
+            "water_type": row.water_type,
+            "max_depth": row.max_depth,
+            "avg_depth": row.avg_depth,
+            "depth": depth,
+            "color": color,
+            "category": depth_category_label(depth) if depth else None,
+            "region": row.region,
+        },
+    }
+
+
+def _bbox_feature(row, scheme: str) -> dict:
+    depth = row.max_depth if row.max_depth is not None else row.avg_depth
+    color = depth_to_color(depth, scheme) if depth else "#888888"
+
+    ring = [
+        [row.lon_min, row.lat_min],
+        [row.lon_max, row.lat_min],
+        [row.lon_max, row.lat_max],
+        [row.lon_min, row.lat_max],
+        [row.lon_min, row.lat_min],
+    ]
+
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Polygon", "coordinates": [ring]},
+        "properties": {
+            "name": row.name,
+            "water_type": row.water_type,
+            "max_depth": row.max_depth,
+            "avg_depth": row.avg_depth,
+            "depth": depth,
+            "color": color,
+            "category": depth_category_label(depth) if depth else None,
+            "region": row.region,
+            "fallback_bbox": True,
+        },
+    }
+
+
+async def iter_depth_areas(
     min_lat: float,
     min_lon: float,
     max_lat: float,
     max_lon: float,
     scheme: str = "navionics",
-) -> dict:
+    limit: int | None = None,
+    pixels: int = VIEWPORT_PX,
+    raise_errors: bool = False,
+) -> AsyncIterator[dict]:
+    """Yield area features as rows arrive from server-side cursors.
+
+    Only the names already emitted are kept, so memory does not grow with
+    the geometry returned. A database error ends the stream early; the
+    caller still gets a well-formed (shorter) collection, unless
+    ``raise_errors`` is set, in which case the error is re-raised.
+
+    ``pixels`` is the screen width the bbox is drawn at and picks the
+    simplification level; ``limit`` defaults to DEPTH_AREAS_MAX_FEATURES.
+    """
+    if limit is None:
+        limit = settings.DEPTH_AREAS_MAX_FEATURES
     logger.info(
         "depth_areas_start",
         service="depth-service",
@@ -27,70 +101,81 @@ async def get_depth_areas(
         max_lat=max_lat,
         max_lon=max_lon,
         scheme=scheme,
+        limit=limit,
+        pixels=pixels,
     )
 
-    features = []
+    level = level_for_bbox(min_lat, min_lon, max_lat, max_lon, pixels=pixels)
+    params = {
+        "min_lat": min_lat,
+        "min_lon": min_lon,
+        "max_lat": max_lat,
+        "max_lon": max_lon,
+    }
+    seen_names = set()
+    total = 0
 
     try:
         async with async_session() as session:
-            result = await session.execute(
+            result = await session.stream(
                 text(
                     """
-                    SELECT name, water_type, coordinates, max_depth, avg_depth,
-                           centroid_lat, centroid_lon, area_km2, region
-                    FROM water_body_polygons
-                    WHERE lat_min <= :max_lat AND lat_max >= :min_lat
-                      AND lon_min <= :max_lon AND lon_max >= :min_lon
-                    ORDER BY area_km2 DESC NULLS LAST
+                    SELECT p.name, p.water_type,
+                           CASE WHEN l.polygon_id IS NULL THEN p.coordinates_bin
+                                ELSE l.coordinates_bin END AS coordinates_bin,
+                           CASE WHEN l.polygon_id IS NULL THEN p.coordinates
+                                ELSE l.coordinates END AS coordinates,
+                           p.max_depth, p.avg_depth, p.centroid_lat, p.centroid_lon,
+                           p.area_km2, p.region
+                    FROM water_body_polygons p
+                    LEFT JOIN water_body_polygon_levels l
+                           ON l.polygon_id = p.id AND l.level = :level
+                    WHERE box(point(p.lon_min, p.lat_min), point(p.lon_max, p.lat_max))
+                          && box(point(:min_lon, :min_lat), point(:max_lon, :max_lat))
+                    ORDER BY p.area_km2 DESC NULLS LAST
                     LIMIT :limit
                     """
-                ),
-                {
-                    "min_lat": min_lat,
-                    "min_lon": min_lon,
-                    "max_lat": max_lat,
-                    "max_lon": max_lon,
-                    "limit": _MAX_FEATURES,
-                },
+                ).execution_options(yield_per=_STREAM_BATCH_ROWS),
+                {**params, "level": level, "limit": limit},
             )
-            rows = result.fetchall()
-
-            for row in rows:
-                coords = row.coordinates if isinstance(row.coordinates, list) else json.loads(row.coordinates)
-                depth = row.max_depth if row.max_depth is not None else row.avg_depth
-                color = depth_to_color(depth, scheme) if depth else "#888888"
-
-                feature = {
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Polygon",
-                        "coordinates": coords,
-                    },
-                    "properties": {
-                        "name": row.name,
-                        "water_type": row.water_type,
-                        "max_depth": row.max_depth,
-                        "avg_depth": row.avg_depth,
-                        "depth": depth,
-                        "color": color,
-                        "category": depth_category_label(depth) if depth else None,
-                        "region": row.region,
-                    },
-                }
-                features.append(feature)
+            async for row in result:
+                if row.name:
+                    seen_names.add(row.name)
+                feature = _polygon_feature(row, scheme)
+                if feature is not None:
+                    total += 1
+                    yield feature
 
             logger.info(
                 "depth_areas_polygons",
                 service="depth-service",
                 action="depth_areas",
-                count=len(features),
+                count=total,
+                level=level,
             )
 
-            if len(features) < _MAX_FEATURES:
-                bbox_features = await _get_bbox_fallback(
-                    session, min_lat, min_lon, max_lat, max_lon, scheme, features
+            if total < limit:
+                result = await session.stream(
+                    text(
+                        """
+                        SELECT name, water_type, lat_min, lat_max, lon_min, lon_max,
+                               centroid_lat, centroid_lon, max_depth, avg_depth, area_km2, region
+                        FROM ru_water_bodies
+                        WHERE box(point(lon_min, lat_min), point(lon_max, lat_max))
+                              && box(point(:min_lon, :min_lat), point(:max_lon, :max_lat))
+                        ORDER BY area_km2 DESC NULLS LAST
+                        LIMIT :limit
+                        """
+                    ).execution_options(yield_per=_STREAM_BATCH_ROWS),
+                    {**params, "limit": limit - total},
                 )
-                features.extend(bbox_features)
+                async for row in result:
+                    if row.name in seen_names:
+                        continue
+                    if row.name:
+                        seen_names.add(row.name)
+                    total += 1
+                    yield _bbox_feature(row, scheme)
 
     except Exception as e:
         logger.error(
@@ -100,83 +185,33 @@ async def get_depth_areas(
             error=str(e),
             exc_info=True,
         )
+        if raise_errors:
+            raise
 
     logger.info(
         "depth_areas_completed",
         service="depth-service",
         action="depth_areas",
-        total=len(features),
+        total=total,
     )
 
-    return {"type": "FeatureCollection", "features": features}
-
 
-async def _get_bbox_fallback(
-    session,
+async def get_depth_areas(
     min_lat: float,
     min_lon: float,
     max_lat: float,
     max_lon: float,
-    scheme: str,
-    existing_features: list,
-) -> list:
-    existing_names = {
-        f["properties"]["name"] for f in existing_features if f["properties"].get("name")
-    }
-
-    result = await session.execute(
-        text(
-            """
-            SELECT name, water_type, lat_min, lat_max, lon_min, lon_max,
-                   centroid_lat, centroid_lon, max_depth, avg_depth, area_km2, region
-            FROM ru_water_bodies
-            WHERE lat_min <= :max_lat AND lat_max >= :min_lat
-              AND lon_min <= :max_lon AND lon_max >= :min_lon
-            ORDER BY area_km2 DESC NULLS LAST
-            LIMIT :limit
-            """
-        ),
-        {
-            "min_lat": min_lat,
-            "min_lon": min_lon,
-            "max_lat": max_lat,
-            "max_lon": max_lon,
-            "limit": _MAX_FEATURES - len(existing_features),
-        },
-    )
-    rows = result.fetchall()
-
-    features = []
-    for row in rows:
-        if row.name in existing_names:
-            continue
-
-        depth = row.max_depth if row.max_depth is not None else row.avg_depth
-        color = depth_to_color(depth, scheme) if depth else "#888888"
-
-        ring = [
-            [row.lon_min, row.lat_min],
-            [row.lon_max, row.lat_min],
-            [row.lon_max, row.lat_max],
-            [row.lon_min, row.lat_max],
-            [row.lon_min, row.lat_min],
-        ]
-
-        feature = {
-            "type": "Feature",
-            "geometry": {"type": "Polygon", "coordinates": [ring]},
-            "properties": {
-                "name": row.name,
-                "water_type": row.water_type,
-                "max_depth": row.max_depth,
-                "avg_depth": row.avg_depth,
-                "depth": depth,
-                "color": color,
-                "category": depth_category_label(depth) if depth else None,
-                "region": row.region,
-                "fallback_bbox": True,
-            },
-        }
-        features.append(feature)
-
-    return features
+    scheme: str = "navionics",
+    limit: int | None = None,
+    pixels: int = VIEWPORT_PX,
+) -> dict:
+    """All area features as one collection; database errors propagate, so a
+    truncated collection is never mistaken for a complete one."""
+    features = [
+        feature
+        async for feature in iter_depth_areas(
+            min_lat, min_lon, max_lat, max_lon, scheme,
+            limit=limit, pixels=pixels, raise_errors=True,
+        )
+    ]
+    return {"type": "FeatureCollection", "features": features}
@@ -1,3 +1,5 @@
+import hashlib
+
 DEPTH_COLOR_RAMP_NAVIONICS = [
     (0, 2, "#B3E5FC"),
     (2, 5, "#4FC3F7"),
@@ -33,11 +35,29 @@ COLOR_SCHEMES = {
 
 DEFAULT_SCHEME = "navionics"
 
+_ramp_listeners = []
+
 
 def get_color_ramp(scheme: str = DEFAULT_SCHEME):
     return COLOR_SCHEMES.get(scheme, COLOR_SCHEMES[DEFAULT_SCHEME])
 
 
+def ramp_version(scheme: str = DEFAULT_SCHEME) -> str:
+    """Short fingerprint of a scheme's current ramp, for keys of cached colored output."""
+    return hashlib.md5(repr(get_color_ramp(scheme)).encode()).hexdigest()[:8]
+
+
+def on_ramps_changed(callback) -> None:
+    """Register a callback run with the scheme name after its ramp is replaced."""
+    _ramp_listeners.append(callback)
+
+
+def set_color_ramp(scheme: str, ramp: list[tuple[float, float, str]]) -> None:
+    COLOR_SCHEMES[scheme] = ramp
+    for callback in _ramp_listeners:
+        callback(scheme)
+
+
 def depth_to_color(depth: float, scheme: str = DEFAULT_SCHEME) -> str:
     ramp = get_color_ramp(scheme)
     for min_d, max_d, color in ramp:
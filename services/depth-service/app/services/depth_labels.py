@@ -2,12 +2,33 @@ from sqlalchemy import text
 
 from app.core.database import async_session
 from app.core.logging_config import get_logger
+from app.services.label_placement import place_labels, rank_key
 
 logger = get_logger(__name__)
 
 _MIN_ZOOM_FOR_LABELS = 7
 
 
+def _label_candidate(row) -> tuple[tuple[float, float], dict] | None:
+    depth = row.max_depth if row.max_depth is not None else row.avg_depth
+    if depth is None:
+        return None
+    feature = {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [row.centroid_lon, row.centroid_lat],
+        },
+        "properties": {
+            "name": row.name,
+            "depth": depth,
+            "label": f"{depth:g}\u043c",
+            "water_type": row.water_type,
+        },
+    }
+    return rank_key(row.area_km2, depth), feature
+
+
 async def get_depth_labels(
     min_lat: float,
     min_lon: float,
@@ -35,7 +56,7 @@ async def get_depth_labels(
         )
         return {"type": "FeatureCollection", "features": []}
 
-    features = []
+    candidates = []
     seen_names = set()
 
     try:
@@ -46,8 +67,8 @@ async def get_depth_labels(
                     SELECT name, water_type, centroid_lat, centroid_lon,
                            max_depth, avg_depth, area_km2
                     FROM water_body_polygons
-                    WHERE lat_min <= :max_lat AND lat_max >= :min_lat
-                      AND lon_min <= :max_lon AND lon_max >= :min_lon
+                    WHERE box(point(lon_min, lat_min), point(lon_max, lat_max))
+                          && box(point(:min_lon, :min_lat), point(:max_lon, :max_lat))
                     ORDER BY area_km2 DESC NULLS LAST
                     LIMIT 100
                     """
@@ -65,38 +86,19 @@ async def get_depth_labels(
                 if row.name in seen_names:
                     continue
                 seen_names.add(row.name)
+                candidate = _label_candidate(row)
+                if candidate is not None:
+                    candidates.append(candidate)
 
-                depth = row.max_depth if row.max_depth is not None else row.avg_depth
-                if depth is None:
-                    continue
-
-                label = f"{depth:g}\u043c"
-
-                features.append(
-                    {
-                        "type": "Feature",
-                        "geometry": {
-                            "type": "Point",
-                            "coordinates": [row.centroid_lon, row.centroid_lat],
-                        },
-                        "properties": {
-                            "name": row.name,
-                            "depth": depth,
-                            "label": label,
-                            "water_type": row.water_type,
-                        },
-                    }
-                )
-
-            if len(features) < 50:
+            if len(candidates) < 50:
                 bbox_result = await session.execute(
                     text(
                         """
                         SELECT name, water_type, centroid_lat, centroid_lon,
                                max_depth, avg_depth, area_km2
                         FROM ru_water_bodies
-                        WHERE lat_min <= :max_lat AND lat_max >= :min_lat
-                          AND lon_min <= :max_lon AND lon_max >= :min_lon
+                        WHERE box(point(lon_min, lat_min), point(lon_max, lat_max))
+                              && box(point(:min_lon, :min_lat), point(:max_lon, :max_lat))
                         ORDER BY area_km2 DESC NULLS LAST
                         LIMIT 50
                         """
@@ -114,28 +116,9 @@ async def get_depth_labels(
                     if row.name in seen_names:
                         continue
                     seen_names.add(row.name)
-
-                    depth = row.max_depth if row.max_depth is not None else row.avg_depth
-                    if depth is None:
-                        continue
-
-                    label = f"{depth:g}\u043c"
-
-                    features.append(
-                        {
-                            "type": "Feature",
-                            "geometry": {
-                                "type": "Point",
-                                "coordinates": [row.centroid_lon, row.centroid_lat],
-                            },
-                            "properties": {
-                                "name": row.name,
-                                "depth": depth,
-                                "label": label,
-                                "water_type": row.water_type,
-                            },
-                        }
-                    )
+                    candidate = _label_candidate(row)
+                    if candidate is not None:
+                        candidates.append(candidate)
 
     except Exception as e:
         logger.error(
@@ -145,11 +128,18 @@ async def get_depth_labels(
             error=str(e),
             exc_info=True,
         )
+        # Don't let a half-read candidate list be placed and cached.
+        raise
+
+    # Stable sort: equal ranks keep the polygon-before-fallback order.
+    candidates.sort(key=lambda candidate: candidate[0])
+    features = place_labels([feature for _, feature in candidates], zoom)
 
     logger.info(
         "depth_labels_completed",
         service="depth-service",
         action="depth_labels",
+        candidates=len(candidates),
         count=len(features),
     )
 
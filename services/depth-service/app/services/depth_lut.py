@@ -0,0 +1,129 @@
+import numpy as np
+
+from app.core.logging_config import get_logger
+from app.services.depth_colors import (
+    COLOR_SCHEMES,
+    get_color_ramp,
+    hex_to_rgb,
+    on_ramps_changed,
+)
+
+logger = get_logger(__name__)
+
+LAND_BG_RATIO_THRESHOLD = 0.7
+
+DEPTH_RAMP = [
+    (80, 6000.0),
+    (200, 4000.0),
+    (350, 2500.0),
+    (400, 1500.0),
+    (500, 500.0),
+    (600, 200.0),
+    (650, 80.0),
+    (700, 30.0),
+    (800, 10.0),
+    (1000, 3.0),
+]
+
+# r + g + b of an 8-bit pixel spans 0..765; 768 keeps the table a round size.
+BRIGHTNESS_LEVELS = 768
+
+WATER_ALPHA = 180
+
+DEPTH_BY_BRIGHTNESS: np.ndarray = np.empty(0)
+_RGBA_LUTS: dict[str, np.ndarray] = {}
+
+
+def _interpolate_depth(brightness: int) -> float:
+    for i, (threshold, depth) in enumerate(DEPTH_RAMP):
+        if brightness <= threshold:
+            if i == 0:
+                return depth
+            prev_threshold, prev_depth = DEPTH_RAMP[i - 1]
+            ratio = (brightness - prev_threshold) / max(threshold - prev_threshold, 1)
+            return prev_depth + ratio * (depth - prev_depth)
+
+    return DEPTH_RAMP[-1][1]
+
+
+def _scheme_rgb(depth: float, scheme: str) -> tuple[int, int, int]:
+    ramp = get_color_ramp(scheme)
+    for min_d, max_d, hex_color in ramp:
+        if min_d <= depth < max_d:
+            return hex_to_rgb(hex_color)
+    return hex_to_rgb(ramp[-1][2])
+
+
+def _build_rgba_lut(scheme: str) -> np.ndarray:
+    # Rows [0, 768) are water pixels indexed by brightness, rows [768, 1536)
+    # are land pixels and stay fully transparent.
+    lut = np.zeros((2 * BRIGHTNESS_LEVELS, 4), dtype=np.uint8)
+    for brightness, depth in enumerate(DEPTH_BY_BRIGHTNESS):
+        lut[brightness, :3] = _scheme_rgb(float(depth), scheme)
+        lut[brightness, 3] = WATER_ALPHA
+    return lut
+
+
+def rebuild_luts() -> None:
+    global DEPTH_BY_BRIGHTNESS, _RGBA_LUTS
+    DEPTH_BY_BRIGHTNESS = np.array(
+        [_interpolate_depth(b) for b in range(BRIGHTNESS_LEVELS)], dtype=np.float64
+    )
+    _RGBA_LUTS = {scheme: _build_rgba_lut(scheme) for scheme in COLOR_SCHEMES}
+    logger.info(
+        "depth_lut_built",
+        service="depth-service",
+        action="depth_lut",
+        schemes=sorted(_RGBA_LUTS),
+    )
+
+
+def _on_ramp_changed(scheme: str) -> None:
+    _RGBA_LUTS[scheme] = _build_rgba_lut(scheme)
+    logger.info(
+        "depth_lut_rebuilt",
+        service="depth-service",
+        action="depth_lut",
+        scheme=scheme,
+    )
+
+
+def get_rgba_lut(scheme: str) -> np.ndarray:
+    lut = _RGBA_LUTS.get(scheme)
+    if lut is None:
+        lut = _build_rgba_lut(scheme)
+        _RGBA_LUTS[scheme] = lut
+    return lut
+
+
+def is_land_pixel(r: int, g: int, b: int) -> bool:
+    if b / max(g, 1) < LAND_BG_RATIO_THRESHOLD:
+        return True
+    return r >= 250 and g >= 250 and b >= 250
+
+
+def land_mask(r: np.ndarray, g: np.ndarray, b: np.ndarray) -> np.ndarray:
+    bg_ratio = b / np.maximum(g, 1)
+    white = (r >= 250) & (g >= 250) & (b >= 250)
+    return (bg_ratio < LAND_BG_RATIO_THRESHOLD) | white
+
+
+def lut_index(rgba: np.ndarray) -> np.ndarray:
+    """Per-pixel row into an RGBA LUT: brightness, offset by 768 for land."""
+    r = rgba[..., 0].astype(np.int32)
+    g = rgba[..., 1].astype(np.int32)
+    b = rgba[..., 2].astype(np.int32)
+    return r + g + b + land_mask(r, g, b) * BRIGHTNESS_LEVELS
+
+
+def estimate_depth(r: int, g: int, b: int) -> float | None:
+    if is_land_pixel(r, g, b):
+        return None
+    brightness = r + g + b
+    if brightness >= BRIGHTNESS_LEVELS:
+        return _interpolate_depth(brightness)
+    return float(DEPTH_BY_BRIGHTNESS[brightness])
+
+
+rebuild_luts()
+on_ramps_changed(_on_ramp_changed)
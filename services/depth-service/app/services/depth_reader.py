@@ -1,12 +1,22 @@
+import asyncio
 import math
-from io import BytesIO
+import time
 from pathlib import Path
 
-import httpx
-from PIL import Image
-
+from app.core.circuit_breaker import get_upstream_guard, parse_retry_after
 from app.core.config import settings
+from app.core.http_clients import GEBCO, get_http_client
 from app.core.logging_config import get_logger
+from app.core.metrics import TILE_FETCH_SECONDS, TILE_RECOLOR_SECONDS, timed
+from app.core.process_pool import ProcessPoolBusy, run_cpu
+from app.core.redis_client import cache_get, cache_set
+from app.core.single_flight import SingleFlight
+from app.core.upstream_errors import record_upstream_error, track_upstream_errors
+from app.services.depth_colors import get_color_ramp, on_ramps_changed
+from app.services.tile_memory_cache import tile_memory_cache
+from app.services.tile_store import get_tile_store, tile_etag
+from app.services.tile_recolor import estimate_depth_from_image as _estimate_depth_from_image
+from app.services.raster_engine import GeoRaster, load_raster
 
 logger = get_logger(__name__)
 
@@ -14,22 +24,13 @@ _DEPTHIAS_SOURCE = "GEBCO_2024"
 _DEPTHIAS_ACCURACY_M = 463
 
 _TILES_DIR = None
-_RASTER_DATA = None
+_RASTER: GeoRaster | None = None
 
-_LAND_BG_RATIO_THRESHOLD = 0.7
+# Untouched upstream PNGs; every color scheme is derived from this layer.
+_RAW_LAYER = "raw"
 
-_DEPTH_RAMP = [
-    (80, 6000.0),
-    (200, 4000.0),
-    (350, 2500.0),
-    (400, 1500.0),
-    (500, 500.0),
-    (600, 200.0),
-    (650, 80.0),
-    (700, 30.0),
-    (800, 10.0),
-    (1000, 3.0),
-]
+# GEBCO_2024 is a 15 arc-second grid; every point in a cell reads the same value.
+_GEBCO_CELLS_PER_DEG = 240
 
 
 def _init_tiles_dir():
@@ -46,6 +47,26 @@ def _init_tiles_dir():
 _init_tiles_dir()
 
 
+def _init_raster():
+    global _RASTER
+    path = settings.GEBCO_GEOTIFF_PATH
+    _RASTER = None
+    if not path or not Path(path).is_file():
+        return
+    try:
+        _RASTER = load_raster(path)
+    except Exception as e:
+        logger.error(
+            "depth_reader_raster_load_error",
+            service="depth-service",
+            path=path,
+            error=str(e),
+        )
+
+
+_init_raster()
+
+
 def _web_mercator_to_lat_lon(x: float, y: float) -> tuple[float, float]:
     lon = math.degrees(x / 6378137.0)
     lat = math.degrees(math.atan(math.sinh(y / 6378137.0)))
@@ -70,10 +91,9 @@ async def query_depth(lat: float, lon: float) -> dict:
         lon=lon,
     )
 
-    if _RASTER_DATA is not None:
-        result = _query_local_raster(lat, lon)
-    else:
-        result = await _query_gebco_api(lat, lon)
+    result = _query_local_raster(lat, lon) if _RASTER is not None else None
+    if result is None:
+        result = await _query_gebco_cell(lat, lon)
 
     logger.info(
         "depth_point_query_completed",
@@ -87,140 +107,225 @@ async def query_depth(lat: float, lon: float) -> dict:
     return result
 
 
-def _query_local_raster(lat: float, lon: float) -> dict:
+def _gebco_cache_key(lat: float, lon: float) -> str:
+    row = math.floor((lat + 90.0) * _GEBCO_CELLS_PER_DEG)
+    col = math.floor((lon + 180.0) * _GEBCO_CELLS_PER_DEG)
+    return f"depth:gebco:{row}:{col}"
+
+
+async def _query_gebco_cell(lat: float, lon: float) -> dict:
+    """GEBCO WMS answer, cached per grid cell. Only successful calls are cached."""
+    key = _gebco_cache_key(lat, lon)
+    cached = await cache_get(key)
+    if cached is not None:
+        return cached
+
+    with track_upstream_errors() as failures:
+        result = await _query_gebco_api(lat, lon)
+    # Pass failures on to the caller's own tracking.
+    for source in failures:
+        record_upstream_error(source)
+
+    if not failures:
+        ttl = settings.DEPTH_CACHE_TTL if result["has_data"] else settings.DEPTH_CACHE_NO_DATA_TTL
+        await cache_set(key, result, ttl=ttl)
+    return result
+
+
+def _query_local_raster(lat: float, lon: float) -> dict | None:
+    """Depth from the local GEBCO grid, or None when the point is not covered."""
     try:
-        row, col = _RASTER_DATA["transform"].get_coord(lat, lon)
-        data = _RASTER_DATA["band"]
-        if 0 <= row < data.shape[0] and 0 <= col < data.shape[1]:
-            depth_val = float(data[row, col])
-            return {
-                "depth": depth_val,
-                "source": _DEPTHIAS_SOURCE,
-                "accuracy_m": _DEPTHIAS_ACCURACY_M,
-                "has_data": True,
-            }
+        if settings.GEBCO_RASTER_BILINEAR:
+            elevation = _RASTER.sample_bilinear(lat, lon)
+        else:
+            elevation = _RASTER.sample(lat, lon)
     except Exception as e:
         logger.error("depth_local_raster_error", service="depth-service", error=str(e), exc_info=True)
+        return None
 
+    if elevation is None:
+        return None
+
+    # GEBCO stores elevation: water is below zero, land at or above it.
+    is_water = elevation < 0
     return {
-        "depth": None,
+        "depth": -elevation if is_water else None,
         "source": _DEPTHIAS_SOURCE,
         "accuracy_m": _DEPTHIAS_ACCURACY_M,
-        "has_data": False,
+        "has_data": is_water,
     }
 
 
-def _estimate_depth_from_pixel(r: int, g: int, b: int) -> float | None:
-    bg_ratio = b / max(g, 1)
-    if bg_ratio < _LAND_BG_RATIO_THRESHOLD:
-        return None
+async def _record_gebco_response(guard, resp) -> None:
+    if resp.status_code == 200:
+        await guard.record_success()
+    elif resp.status_code == 429:
+        await guard.record_failure(
+            rate_limited=True,
+            retry_after=parse_retry_after(resp.headers.get("retry-after")),
+        )
+    elif resp.status_code >= 500:
+        await guard.record_failure()
 
-    if r >= 250 and g >= 250 and b >= 250:
-        return None
 
-    brightness = r + g + b
+async def _query_gebco_api(lat: float, lon: float) -> dict:
+    guard = get_upstream_guard(GEBCO)
+    if not await guard.allow():
+        logger.info(
+            "depth_gebco_circuit_open",
+            service="depth-service",
+            action="depth_point_query",
+            lat=lat,
+            lon=lon,
+            breaker=guard.state,
+        )
+        record_upstream_error("gebco")
+        return {
+            "depth": None,
+            "source": _DEPTHIAS_SOURCE,
+            "accuracy_m": _DEPTHIAS_ACCURACY_M,
+            "has_data": False,
+        }
 
-    for i, (threshold, depth) in enumerate(_DEPTH_RAMP):
-        if brightness <= threshold:
-            if i == 0:
-                return depth
-            prev_threshold, prev_depth = _DEPTH_RAMP[i - 1]
-            ratio = (brightness - prev_threshold) / max(threshold - prev_threshold, 1)
-            return prev_depth + ratio * (depth - prev_depth)
+    try:
+        margin = 0.005
+        client = get_http_client(GEBCO)
+        params = {
+            "SERVICE": "WMS",
+            "VERSION": "1.1.1",
+            "REQUEST": "GetMap",
+            "LAYERS": settings.GEBCO_QUERY_LAYER,
+            "SRS": "EPSG:4326",
+            "BBOX": f"{lon - margin},{lat - margin},{lon + margin},{lat + margin}",
+            "WIDTH": 3,
+            "HEIGHT": 3,
+            "FORMAT": "image/tiff",
+            "TRANSPARENT": "TRUE",
+        }
+        resp = await client.get(settings.GEBCO_WMS_URL, params=params)
+        await _record_gebco_response(guard, resp)
+
+        if resp.status_code == 200 and "image" in resp.headers.get("content-type", ""):
+            depth = await run_cpu(_estimate_depth_from_image, resp.content)
+            if depth is not None:
+                logger.info(
+                    "depth_gebco_api_result",
+                    service="depth-service",
+                    action="depth_point_query",
+                    lat=lat,
+                    lon=lon,
+                    depth=depth,
+                )
+                return {
+                    "depth": depth,
+                    "source": _DEPTHIAS_SOURCE,
+                    "accuracy_m": _DEPTHIAS_ACCURACY_M,
+                    "has_data": True,
+                }
 
-    return _DEPTH_RAMP[-1][1]
+        logger.warning(
+            "depth_gebco_api_no_data",
+            service="depth-service",
+            action="depth_point_query",
+            lat=lat,
+            lon=lon,
+            status_code=resp.status_code,
+        )
+        if resp.status_code != 200:
+            record_upstream_error("gebco")
+    except ProcessPoolBusy:
+        raise
+    except Exception as e:
+        logger.warning(
+            "depth_gebco_api_unavailable",
+            service="depth-service",
+            error=str(e),
+        )
+        await guard.record_failure()
+        record_upstream_error("gebco")
+
+    return {
+        "depth": None,
+        "source": _DEPTHIAS_SOURCE,
+        "accuracy_m": _DEPTHIAS_ACCURACY_M,
+        "has_data": False,
+    }
 
 
-def _estimate_depth_from_image(image_bytes: bytes) -> float | None:
+def _read_file(path: Path) -> bytes | None:
     try:
-        img = Image.open(BytesIO(image_bytes))
-        cx, cy = img.size[0] // 2, img.size[1] // 2
-        pixel = img.getpixel((cx, cy))
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
 
-        if len(pixel) >= 4 and pixel[3] == 0:
-            return None
 
-        r, g, b = pixel[0], pixel[1], pixel[2]
-        depth = _estimate_depth_from_pixel(r, g, b)
-        logger.info(
-            "depth_pixel_analyzed",
-            service="depth-service",
-            action="depth_pixel_analysis",
-            r=r,
-            g=g,
-            b=b,
-            estimated_depth=depth,
-        )
-        return depth
+async def _write_cache(layer: str, z: int, x: int, y: int, data: bytes) -> None:
+    try:
+        await asyncio.to_thread(get_tile_store().put, layer, z, x, y, data)
     except Exception as e:
         logger.warning(
-            "depth_image_parse_error",
+            "depth_tile_cache_write_error",
             service="depth-service",
+            action="depth_tile",
+            layer=layer,
             error=str(e),
         )
-        return None
 
 
-async def _query_gebco_api(lat: float, lon: float) -> dict:
+_purge_tasks: set[asyncio.Task] = set()
+
+
+def _delete_scheme_layer(scheme: str) -> None:
     try:
-        margin = 0.005
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            params = {
-                "SERVICE": "WMS",
-                "VERSION": "1.1.1",
-                "REQUEST": "GetMap",
-                "LAYERS": settings.GEBCO_QUERY_LAYER,
-                "SRS": "EPSG:4326",
-                "BBOX": f"{lon - margin},{lat - margin},{lon + margin},{lat + margin}",
-                "WIDTH": 3,
-                "HEIGHT": 3,
-                "FORMAT": "image/tiff",
-                "TRANSPARENT": "TRUE",
-            }
-            resp = await client.get(settings.GEBCO_WMS_URL, params=params)
-
-            if resp.status_code == 200 and "image" in resp.headers.get("content-type", ""):
-                depth = _estimate_depth_from_image(resp.content)
-                if depth is not None:
-                    logger.info(
-                        "depth_gebco_api_result",
-                        service="depth-service",
-                        action="depth_point_query",
-                        lat=lat,
-                        lon=lon,
-                        depth=depth,
-                    )
-                    return {
-                        "depth": depth,
-                        "source": _DEPTHIAS_SOURCE,
-                        "accuracy_m": _DEPTHIAS_ACCURACY_M,
-                        "has_data": True,
-                    }
-
-            logger.warning(
-                "depth_gebco_api_no_data",
-                service="depth-service",
-                action="depth_point_query",
-                lat=lat,
-                lon=lon,
-                status_code=resp.status_code,
-            )
+        get_tile_store().delete_layer(scheme)
     except Exception as e:
         logger.warning(
-            "depth_gebco_api_unavailable",
+            "depth_tile_cache_purge_error",
             service="depth-service",
+            action="depth_tile",
+            scheme=scheme,
             error=str(e),
         )
+        return
+    logger.info(
+        "depth_tile_cache_purged",
+        service="depth-service",
+        action="depth_tile",
+        scheme=scheme,
+    )
 
-    return {
-        "depth": None,
-        "source": _DEPTHIAS_SOURCE,
-        "accuracy_m": _DEPTHIAS_ACCURACY_M,
-        "has_data": False,
-    }
+
+def _purge_scheme_cache(scheme: str) -> None:
+    if scheme == _RAW_LAYER:
+        return
+    tile_memory_cache.invalidate_scheme(scheme)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Not on the event loop (scripts, worker threads): nothing to block.
+        _delete_scheme_layer(scheme)
+        return
+    # Deleting a layer walks a directory tree or rewrites an MBTiles file.
+    task = loop.create_task(asyncio.to_thread(_delete_scheme_layer, scheme))
+    _purge_tasks.add(task)
+    task.add_done_callback(_purge_tasks.discard)
 
 
-async def fetch_tile(z: int, x: int, y: int, scheme: str = "navionics") -> bytes | None:
+on_ramps_changed(_purge_scheme_cache)
+
+
+async def _derive_tile(raw_tile: bytes, scheme: str) -> bytes:
+    if settings.TILE_RECOLOR:
+        from app.services.tile_recolor import recolor_tile
+
+        with timed(TILE_RECOLOR_SECONDS, scheme=scheme):
+            return await run_cpu(recolor_tile, raw_tile, scheme, get_color_ramp(scheme))
+    return raw_tile
+
+
+async def fetch_tile(z: int, x: int, y: int, scheme: str = "navionics") -> tuple[bytes, str] | None:
+    """The tile and its ETag; the ETag comes from wherever the tile did, so
+    serving it never re-hashes the body."""
     logger.info(
         "depth_tile_request",
         service="depth-service",
@@ -231,10 +336,15 @@ async def fetch_tile(z: int, x: int, y: int, scheme: str = "navionics") -> bytes
         scheme=scheme,
     )
 
-    cache_dir = Path(settings.TILE_CACHE_DIR) / scheme
-    if cache_dir.exists():
-        tile_path = cache_dir / f"{z}" / f"{x}" / f"{y}.png"
-        if tile_path.exists():
+    with timed(TILE_FETCH_SECONDS, outcome="unavailable") as labels:
+        memory_key = (scheme, z, x, y)
+        cached = tile_memory_cache.get(memory_key)
+        if cached is not None:
+            labels["outcome"] = "memory"
+            return cached, tile_memory_cache.get_etag(memory_key)
+
+        stored = await asyncio.to_thread(_read_stored_tile, scheme, z, x, y)
+        if stored is not None:
             logger.info(
                 "depth_tile_cache_hit",
                 service="depth-service",
@@ -243,80 +353,171 @@ async def fetch_tile(z: int, x: int, y: int, scheme: str = "navionics") -> bytes
                 x=x,
                 y=y,
             )
-            return tile_path.read_bytes()
+            tile_memory_cache.put(memory_key, *stored)
+            labels["outcome"] = "disk"
+            return stored
+
+        if _TILES_DIR is not None:
+            tile_path = _TILES_DIR / f"{z}" / f"{x}" / f"{y}.png"
+            prerendered = await asyncio.to_thread(_read_file, tile_path)
+            if prerendered is not None:
+                etag = tile_etag(prerendered)
+                tile_memory_cache.put(memory_key, prerendered, etag)
+                labels["outcome"] = "disk"
+                return prerendered, etag
+
+        tile = await _tile_flight.do(f"{scheme}/{z}/{x}/{y}", _render_tile, z, x, y, scheme)
+        if tile is None:
+            return None
+        labels["outcome"] = "upstream"
+        # Leader results are in the memory cache already; followers that
+        # re-read the store hash once here.
+        return tile, tile_memory_cache.get_etag(memory_key) or tile_etag(tile)
 
-    if _TILES_DIR is not None:
-        tile_path = _TILES_DIR / f"{z}" / f"{x}" / f"{y}.png"
-        if tile_path.exists():
-            return tile_path.read_bytes()
 
-    raw_tile = await _proxy_gebco_wms(z, x, y)
+def _read_stored_tile(scheme: str, z: int, x: int, y: int) -> tuple[bytes, str] | None:
+    store = get_tile_store()
+    data = store.get(scheme, z, x, y)
+    if data is None:
+        return None
+    # Tiles written before ETags were stored have none on disk.
+    return data, store.get_etag(scheme, z, x, y) or tile_etag(data)
+
+
+async def _render_tile(z: int, x: int, y: int, scheme: str) -> bytes | None:
+    raw_tile = await fetch_raw_tile(z, x, y)
     if raw_tile is None:
         return None
 
-    if settings.TILE_RECOLOR:
-        from app.services.tile_recolor import recolor_tile
+    result_tile = await _derive_tile(raw_tile, scheme)
+    await _write_cache(scheme, z, x, y, result_tile)
+    tile_memory_cache.put((scheme, z, x, y), result_tile)
+    return result_tile
 
-        result_tile = recolor_tile(raw_tile, scheme=scheme)
-    else:
-        result_tile = raw_tile
 
+async def _read_raw_tile(z: int, x: int, y: int) -> bytes | None:
+    return await asyncio.to_thread(get_tile_store().get, _RAW_LAYER, z, x, y)
+
+
+async def _load_raw_tile(z: int, x: int, y: int) -> bytes | None:
+    raw_tile = await _read_raw_tile(z, x, y)
+    if raw_tile is not None:
+        logger.info(
+            "depth_tile_raw_cache_hit",
+            service="depth-service",
+            action="depth_tile",
+            z=z,
+            x=x,
+            y=y,
+        )
+        return raw_tile
+
+    raw_tile = await _proxy_gebco_wms(z, x, y)
+    if raw_tile is not None:
+        await _write_cache(_RAW_LAYER, z, x, y, raw_tile)
+    return raw_tile
+
+
+async def fetch_raw_tile(z: int, x: int, y: int) -> bytes | None:
+    """The untouched upstream tile, from the raw layer or GEBCO WMS."""
+    return await _raw_flight.do(f"{z}/{x}/{y}", _load_raw_tile, z, x, y)
+
+
+async def _read_scheme_tile(z: int, x: int, y: int, scheme: str) -> bytes | None:
+    return await asyncio.to_thread(get_tile_store().get, scheme, z, x, y)
+
+
+_raw_flight = SingleFlight("raw_tile", recheck=_read_raw_tile)
+_tile_flight = SingleFlight("tile", recheck=_read_scheme_tile)
+
+
+async def lookup_tile_etag(z: int, x: int, y: int, scheme: str = "navionics") -> str | None:
+    etag = tile_memory_cache.get_etag((scheme, z, x, y))
+    if etag is not None:
+        return etag
     try:
-        cache_path = cache_dir / f"{z}" / f"{x}" / f"{y}.png"
-        cache_path.parent.mkdir(parents=True, exist_ok=True)
-        cache_path.write_bytes(result_tile)
+        return await asyncio.to_thread(get_tile_store().get_etag, scheme, z, x, y)
     except Exception as e:
         logger.warning(
-            "depth_tile_cache_write_error",
+            "depth_tile_etag_lookup_error",
             service="depth-service",
             action="depth_tile",
             error=str(e),
         )
+        return None
 
-    return result_tile
+
+async def _wait_for_gebco_slot(guard) -> bool:
+    """Take a GEBCO token, waiting up to GEBCO_TILE_TOKEN_WAIT_SEC if the bucket is only empty.
+
+    A burst of tile requests would otherwise come back as missing tiles
+    although the upstream is healthy. An open breaker still fails fast.
+    """
+    deadline = time.monotonic() + settings.GEBCO_TILE_TOKEN_WAIT_SEC
+    while not await guard.allow():
+        wait = guard.token_wait()
+        if wait is None or time.monotonic() + wait > deadline:
+            return False
+        await asyncio.sleep(max(wait, 0.001))
+    return True
 
 
 async def _proxy_gebco_wms(z: int, x: int, y: int) -> bytes | None:
     lon_min, lat_min, lon_max, lat_max = _tile_to_bbox(z, x, y)
     bbox = f"{lon_min},{lat_min},{lon_max},{lat_max}"
 
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            params = {
-                "SERVICE": "WMS",
-                "VERSION": "1.1.1",
-                "REQUEST": "GetMap",
-                "LAYERS": settings.GEBCO_WMS_LAYER,
-                "SRS": "EPSG:4326",
-                "BBOX": bbox,
-                "WIDTH": "256",
-                "HEIGHT": "256",
-                "FORMAT": "image/png",
-                "TRANSPARENT": "TRUE",
-            }
-            resp = await client.get(settings.GEBCO_WMS_URL, params=params)
-
-            if resp.status_code == 200 and resp.headers.get("content-type", "").startswith("image"):
-                logger.info(
-                    "depth_tile_proxy_ok",
-                    service="depth-service",
-                    action="depth_tile",
-                    z=z,
-                    x=x,
-                    y=y,
-                )
-                return resp.content
+    guard = get_upstream_guard(GEBCO)
+    if not await _wait_for_gebco_slot(guard):
+        logger.info(
+            "depth_tile_circuit_open",
+            service="depth-service",
+            action="depth_tile",
+            z=z,
+            x=x,
+            y=y,
+            breaker=guard.state,
+        )
+        return None
 
-            logger.warning(
-                "depth_tile_proxy_fail",
+    try:
+        client = get_http_client(GEBCO)
+        params = {
+            "SERVICE": "WMS",
+            "VERSION": "1.1.1",
+            "REQUEST": "GetMap",
+            "LAYERS": settings.GEBCO_WMS_LAYER,
+            "SRS": "EPSG:4326",
+            "BBOX": bbox,
+            "WIDTH": "256",
+            "HEIGHT": "256",
+            "FORMAT": "image/png",
+            "TRANSPARENT": "TRUE",
+        }
+        resp = await client.get(settings.GEBCO_WMS_URL, params=params)
+        await _record_gebco_response(guard, resp)
+
+        if resp.status_code == 200 and resp.headers.get("content-type", "").startswith("image"):
+            logger.info(
+                "depth_tile_proxy_ok",
                 service="depth-service",
                 action="depth_tile",
                 z=z,
                 x=x,
                 y=y,
-                status_code=resp.status_code,
             )
+            return resp.content
+
+        logger.warning(
+            "depth_tile_proxy_fail",
+            service="depth-service",
+            action="depth_tile",
+            z=z,
+            x=x,
+            y=y,
+            status_code=resp.status_code,
+        )
     except Exception as e:
+        await guard.record_failure()
         logger.warning(
             "depth_tile_proxy_error",
             service="depth-service",
@@ -1,16 +1,47 @@
 
+import asyncio
+import math
+
+from app.core.config import settings
 from app.core.logging_config import get_logger
-from app.core.redis_client import cache_get, cache_set
+from app.core.metrics import DEPTH_RESOLVE_SECONDS, timed
+from app.core.redis_client import cache_get, cache_get_many, cache_set, cache_set_many
+from app.core.upstream_errors import record_upstream_error, track_upstream_errors
 from app.services import gvr_cache, osm_overpass_client
 from app.services.depth_reader import query_depth as query_gebco
 
 logger = get_logger(__name__)
 
 
+# Water-body sources (OSM searches 50 m around the point, GVR is per body)
+# and "no data" answers don't resolve finer than this, ~50 m. GEBCO keeps
+# its own per-cell cache in depth_reader.
+_POINT_CELLS_PER_DEG = 2000
+
+
 def _cache_key(lat: float, lon: float) -> str:
+    lat = math.floor(lat * _POINT_CELLS_PER_DEG) / _POINT_CELLS_PER_DEG
+    lon = math.floor(lon * _POINT_CELLS_PER_DEG) / _POINT_CELLS_PER_DEG
     return f"depth:{lat:.4f}:{lon:.4f}"
 
 
+def _pick_cached(lat: float, lon: float, cached: dict | None) -> dict | None:
+    if cached is None:
+        return None
+    # Keys are coarser than the request; answer for the point actually asked.
+    cached["lat"] = lat
+    cached["lon"] = lon
+    return cached
+
+
+def _cache_ttl(result: dict, failures: set[str]) -> int:
+    """Long for a clean hit, medium for a clean miss or a hit while a source was down,
+    short back-off when nothing was found and some source could not be asked."""
+    if not failures:
+        return settings.DEPTH_CACHE_TTL if result["has_data"] else settings.DEPTH_CACHE_NO_DATA_TTL
+    return settings.DEPTH_CACHE_NO_DATA_TTL if result["has_data"] else settings.DEPTH_CACHE_ERROR_TTL
+
+
 def _no_data(lat: float, lon: float) -> dict:
     return {
         "depth": None,
@@ -35,74 +66,165 @@ async def resolve_depth(lat: float, lon: float) -> dict:
         lon=lon,
     )
 
-    key = _cache_key(lat, lon)
-    cached = await cache_get(key)
-    if cached is not None:
+    with timed(DEPTH_RESOLVE_SECONDS, source="none") as labels:
+        cached = _pick_cached(lat, lon, await cache_get(_cache_key(lat, lon)))
+        if cached is not None:
+            labels["source"] = "cache"
+            logger.info(
+                "depth_resolver_cache_hit",
+                service="depth-service",
+                action="depth_resolver",
+                lat=lat,
+                lon=lon,
+                source=cached.get("source"),
+            )
+            return cached
+
+        result = await _resolve_uncached(lat, lon)
+        labels["source"] = (result.get("source") or "none").lower()
+        return result
+
+
+async def _resolve_uncached(lat: float, lon: float) -> dict:
+    with track_upstream_errors() as failures:
+        result = await _resolve_sources(lat, lon)
+
+    ttl = _cache_ttl(result, failures)
+    await cache_set(_cache_key(lat, lon), result, ttl=ttl)
+
+    if failures:
         logger.info(
-            "depth_resolver_cache_hit",
+            "depth_resolver_upstream_degraded",
             service="depth-service",
             action="depth_resolver",
             lat=lat,
             lon=lon,
-            source=cached.get("source"),
+            failed=sorted(failures),
+            ttl=ttl,
         )
-        return cached
+    return result
 
-    osm_result = await osm_overpass_client.query_water_body(lat, lon)
 
-    if osm_result and osm_result.get("has_data"):
-        result = _build_result(lat, lon, osm_result)
-        await cache_set(key, result)
-        logger.info(
-            "depth_resolver_osm_hit",
+def _has_data(task: asyncio.Task | None) -> bool:
+    if task is None or not task.done() or task.cancelled() or task.exception():
+        return False
+    result = task.result()
+    return bool(result and result.get("has_data"))
+
+
+async def _settle(task: asyncio.Task, deadline: float, source: str):
+    """Result of a source task, or None once the shared deadline passes."""
+    if not task.done():
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining > 0:
+            await asyncio.wait({task}, timeout=remaining)
+    if not task.done():
+        task.cancel()
+        record_upstream_error(source)
+        logger.warning(
+            "depth_resolver_source_deadline",
             service="depth-service",
             action="depth_resolver",
-            lat=lat,
-            lon=lon,
-            name=osm_result.get("name"),
+            source=source,
         )
-        return result
+        return None
+    if task.cancelled() or task.exception():
+        record_upstream_error(source)
+        return None
+    return task.result()
 
-    if osm_result and osm_result.get("name"):
-        gvr_by_name = await gvr_cache.query_water_body_by_name(
-            osm_result["name"]
-        )
-        if gvr_by_name and gvr_by_name.get("has_data"):
-            gvr_by_name["name"] = osm_result.get("name") or gvr_by_name.get("name")
-            gvr_by_name["water_type"] = osm_result.get("water_type") or gvr_by_name.get("water_type")
-            result = _build_result(lat, lon, gvr_by_name)
-            await cache_set(key, result)
+
+def _cancel(*tasks: asyncio.Task) -> None:
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+
+
+async def _resolve_sources(lat: float, lon: float) -> dict:
+    """Run all sources at once and merge by priority under a latency budget.
+
+    Priority is unchanged: OSM depth, OSM name cross-referenced in GVR,
+    GVR point lookup, GEBCO. The local GVR lookup and GEBCO start together
+    with Overpass instead of after it. Overpass gets DEPTH_RESOLVE_DEADLINE_SEC,
+    but only DEPTH_RESOLVE_HEDGE_SEC once a lower-priority source already
+    has an answer; losing tasks are cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + settings.DEPTH_RESOLVE_DEADLINE_SEC
+    hedge_deadline = started + settings.DEPTH_RESOLVE_HEDGE_SEC
+
+    osm_task = asyncio.create_task(osm_overpass_client.query_water_body(lat, lon))
+    gvr_task = asyncio.create_task(gvr_cache.query_water_body(lat, lon))
+    gebco_task = asyncio.create_task(query_gebco(lat, lon))
+
+    try:
+        while not osm_task.done():
+            hedged = _has_data(gvr_task) or _has_data(gebco_task)
+            remaining = (hedge_deadline if hedged else deadline) - loop.time()
+            if remaining <= 0:
+                break
+            pending = {t for t in (osm_task, gvr_task, gebco_task) if not t.done()}
+            await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+
+        osm_result = await _settle(osm_task, loop.time(), "overpass")
+
+        if osm_result and osm_result.get("has_data"):
+            _cancel(gvr_task, gebco_task)
+            result = _build_result(lat, lon, osm_result)
             logger.info(
-                "depth_resolver_osm_gvr_crossref",
+                "depth_resolver_osm_hit",
                 service="depth-service",
                 action="depth_resolver",
                 lat=lat,
                 lon=lon,
-                name=osm_result["name"],
+                name=osm_result.get("name"),
             )
             return result
 
-    gvr_result = await gvr_cache.query_water_body(lat, lon)
-    if gvr_result and gvr_result.get("has_data"):
-        result = _build_result(lat, lon, gvr_result)
-        await cache_set(key, result)
-        logger.info(
-            "depth_resolver_gvr_hit",
-            service="depth-service",
-            action="depth_resolver",
-            lat=lat,
-            lon=lon,
-            name=gvr_result.get("name"),
-        )
-        return result
+        if osm_result and osm_result.get("name"):
+            gvr_by_name = await gvr_cache.query_water_body_by_name(
+                osm_result["name"]
+            )
+            if gvr_by_name and gvr_by_name.get("has_data"):
+                _cancel(gvr_task, gebco_task)
+                gvr_by_name["name"] = osm_result.get("name") or gvr_by_name.get("name")
+                gvr_by_name["water_type"] = osm_result.get("water_type") or gvr_by_name.get("water_type")
+                result = _build_result(lat, lon, gvr_by_name)
+                logger.info(
+                    "depth_resolver_osm_gvr_crossref",
+                    service="depth-service",
+                    action="depth_resolver",
+                    lat=lat,
+                    lon=lon,
+                    name=osm_result["name"],
+                )
+                return result
+
+        gvr_result = await _settle(gvr_task, deadline, "gvr")
+        if gvr_result and gvr_result.get("has_data"):
+            _cancel(gebco_task)
+            result = _build_result(lat, lon, gvr_result)
+            logger.info(
+                "depth_resolver_gvr_hit",
+                service="depth-service",
+                action="depth_resolver",
+                lat=lat,
+                lon=lon,
+                name=gvr_result.get("name"),
+            )
+            return result
+
+        gebco_result = await _settle(gebco_task, deadline, "gebco") or {}
+    finally:
+        # Also covers cancellation of the caller itself.
+        _cancel(osm_task, gvr_task, gebco_task)
 
-    gebco_result = await query_gebco(lat, lon)
     if gebco_result.get("has_data") and gebco_result.get("depth") is not None:
         gebco_result["name"] = None
         gebco_result["water_type"] = None
         gebco_result["depth_type"] = "point"
         result = _build_result(lat, lon, gebco_result)
-        await cache_set(key, result)
         logger.info(
             "depth_resolver_gebco_hit",
             service="depth-service",
@@ -121,7 +243,6 @@ async def resolve_depth(lat: float, lon: float) -> dict:
         fallback_result["water_body_name"] = gvr_result.get("name")
         fallback_result["water_body_type"] = gvr_result.get("water_type")
 
-    await cache_set(key, fallback_result)
     logger.info(
         "depth_resolver_no_data",
         service="depth-service",
@@ -133,6 +254,96 @@ async def resolve_depth(lat: float, lon: float) -> dict:
     return fallback_result
 
 
+async def resolve_depth_batch(points: list[tuple[float, float]]) -> list[dict]:
+    """Resolve many points with as few round-trips as possible.
+
+    Cached points come from one MGET, the rest go through one set-based GVR
+    bbox query, and only points GVR cannot answer fall back to the full
+    per-point chain, at most DEPTH_BATCH_CONCURRENCY at a time. A GVR hit
+    is accepted without asking Overpass first, which is what keeps a long
+    track to a handful of round-trips. Such answers skip OSM, so they are
+    cached for DEPTH_BATCH_GVR_TTL only and the full chain gets to answer
+    the point again soon after.
+
+    Fallback points that share a cache cell are resolved once. The fallbacks
+    together get DEPTH_BATCH_DEADLINE_SEC; points still unresolved by then
+    come back as no data and are not cached.
+    """
+    logger.info(
+        "depth_resolver_batch_start",
+        service="depth-service",
+        action="depth_resolver_batch",
+        points=len(points),
+    )
+
+    cached = await cache_get_many([_cache_key(lat, lon) for lat, lon in points])
+    results: list[dict | None] = [
+        _pick_cached(lat, lon, entry) for (lat, lon), entry in zip(points, cached)
+    ]
+    misses = [i for i, cached in enumerate(results) if cached is None]
+    cache_hits = len(points) - len(misses)
+
+    gvr_results = await gvr_cache.query_water_bodies_batch([points[i] for i in misses])
+    to_cache = []
+    remaining = []
+    for i, gvr_result in zip(misses, gvr_results):
+        if gvr_result and gvr_result.get("has_data"):
+            lat, lon = points[i]
+            results[i] = _build_result(lat, lon, gvr_result)
+            to_cache.append((_cache_key(lat, lon), results[i]))
+        else:
+            remaining.append(i)
+    await cache_set_many(to_cache, ttl=settings.DEPTH_BATCH_GVR_TTL)
+
+    # Dense tracks put many points in one cell; ask the sources once per cell.
+    cells: dict[str, list[int]] = {}
+    for i in remaining:
+        cells.setdefault(_cache_key(*points[i]), []).append(i)
+
+    semaphore = asyncio.Semaphore(settings.DEPTH_BATCH_CONCURRENCY)
+
+    async def _resolve_cell(indices: list[int]) -> None:
+        async with semaphore:
+            result = await _resolve_uncached(*points[indices[0]])
+        for i in indices:
+            results[i] = _pick_cached(*points[i], dict(result))
+
+    timed_out = 0
+    if cells:
+        tasks = [asyncio.create_task(_resolve_cell(indices)) for indices in cells.values()]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=settings.DEPTH_BATCH_DEADLINE_SEC)
+        finally:
+            # Also covers cancellation of the caller itself.
+            _cancel(*tasks)
+        for task in done:
+            task.result()
+        for i in remaining:
+            if results[i] is None:
+                results[i] = _no_data(*points[i])
+                timed_out += 1
+        if timed_out:
+            logger.warning(
+                "depth_resolver_batch_deadline",
+                service="depth-service",
+                action="depth_resolver_batch",
+                unresolved=timed_out,
+            )
+
+    logger.info(
+        "depth_resolver_batch_completed",
+        service="depth-service",
+        action="depth_resolver_batch",
+        points=len(points),
+        cache_hits=cache_hits,
+        gvr_hits=len(to_cache),
+        fallbacks=len(remaining),
+        fallback_cells=len(cells),
+        timed_out=timed_out,
+    )
+    return results
+
+
 def _build_result(lat: float, lon: float, source_data: dict) -> dict:
     depth = source_data.get("depth")
     has_data = source_data.get("has_data", False)
@@ -0,0 +1,65 @@
+"""GeoJSON serialization that splices pre-encoded ring text into the output.
+
+Polygon coordinates held as PackedRings are rendered straight from their
+NumPy arrays instead of going through FastAPI's jsonable_encoder, which
+walks every nested float list in Python.
+"""
+
+import json
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from app.services.coord_codec import PackedRings
+
+# Flush threshold for streamed responses; one send per feature is too chatty.
+_STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def feature_json(feature: dict) -> str:
+    geometry = feature["geometry"]
+    coords = geometry["coordinates"]
+    coords_json = coords.to_json() if isinstance(coords, PackedRings) else _dumps(coords)
+    return (
+        '{"type":"Feature","geometry":{"type":'
+        + _dumps(geometry["type"])
+        + ',"coordinates":'
+        + coords_json
+        + '},"properties":'
+        + _dumps(feature["properties"])
+        + "}"
+    )
+
+
+def iter_feature_collection(features: Iterable[dict]) -> Iterator[str]:
+    yield '{"type":"FeatureCollection","features":['
+    for i, feature in enumerate(features):
+        yield feature_json(feature) if i == 0 else "," + feature_json(feature)
+    yield "]}"
+
+
+def encode_feature_collection(collection: dict) -> bytes:
+    return "".join(iter_feature_collection(collection["features"])).encode("utf-8")
+
+
+async def aiter_feature_collection(
+    features: AsyncIterable[dict],
+    chunk_size: int = _STREAM_CHUNK_BYTES,
+) -> AsyncIterator[bytes]:
+    """Stream a FeatureCollection as features arrive, in roughly chunk_size pieces."""
+    buf = [b'{"type":"FeatureCollection","features":[']
+    size = len(buf[0])
+    first = True
+    async for feature in features:
+        text = feature_json(feature) if first else "," + feature_json(feature)
+        first = False
+        encoded = text.encode("utf-8")
+        buf.append(encoded)
+        size += len(encoded)
+        if size >= chunk_size:
+            yield b"".join(buf)
+            buf, size = [], 0
+    buf.append(b"]}")
+    yield b"".join(buf)
@@ -4,6 +4,8 @@ from sqlalchemy import text
 
 from app.core.database import async_session
 from app.core.logging_config import get_logger
+from app.core.upstream_errors import record_upstream_error
+from app.services.polygon_index import ensure_fresh_polygon_index, get_polygon_index
 
 logger = get_logger(__name__)
 
@@ -21,6 +23,54 @@ def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return r * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
 
+def _closest_row(lat: float, lon: float, rows):
+    return min(
+        rows,
+        key=lambda r: _haversine_km(lat, lon, r.centroid_lat, r.centroid_lon),
+    )
+
+
+def _row_to_result(row) -> dict:
+    depth = None
+    depth_type = None
+
+    if row.max_depth is not None:
+        depth = float(row.max_depth)
+        depth_type = "max"
+    elif row.avg_depth is not None:
+        depth = float(row.avg_depth)
+        depth_type = "avg"
+
+    return {
+        "name": row.name,
+        "water_type": row.water_type,
+        "depth": depth,
+        "depth_type": depth_type,
+        "source": "GVR",
+        "accuracy_m": 100,
+        "has_data": depth is not None,
+        "area_km2": float(row.area_km2) if row.area_km2 else None,
+        "gvr_id": getattr(row, "gvr_id", None),
+    }
+
+
+def _query_polygon_index(lat: float, lon: float) -> dict | None:
+    """Exact point-in-polygon hit from the in-memory index.
+
+    A miss falls back to the ru_water_bodies bbox query, which covers
+    bodies without OSM geometry. A containing polygon without depth is
+    still the answer: the bbox query could only offer a neighbouring
+    body's depth.
+    """
+    index = get_polygon_index()
+    if index is None:
+        return None
+    polygon = index.find(lat, lon)
+    if polygon is None:
+        return None
+    return _row_to_result(polygon)
+
+
 async def query_water_body(lat: float, lon: float) -> dict | None:
     logger.info(
         "gvr_query_start",
@@ -30,6 +80,20 @@ async def query_water_body(lat: float, lon: float) -> dict | None:
         lon=lon,
     )
 
+    await ensure_fresh_polygon_index()
+    polygon_result = _query_polygon_index(lat, lon)
+    if polygon_result is not None:
+        logger.info(
+            "gvr_polygon_index_hit",
+            service="depth-service",
+            action="gvr_query",
+            lat=lat,
+            lon=lon,
+            name=polygon_result["name"],
+            depth=polygon_result["depth"],
+        )
+        return polygon_result
+
     try:
         async with async_session() as session:
             query = text(
@@ -37,8 +101,8 @@ async def query_water_body(lat: float, lon: float) -> dict | None:
                 SELECT name, water_type, avg_depth, max_depth,
                        centroid_lat, centroid_lon, area_km2, gvr_id
                 FROM ru_water_bodies
-                WHERE lat_min <= :lat AND lat_max >= :lat
-                  AND lon_min <= :lon AND lon_max >= :lon
+                WHERE box(point(lon_min, lat_min), point(lon_max, lat_max))
+                      && box(point(:lon, :lat), point(:lon, :lat))
                 ORDER BY area_km2 DESC NULLS LAST
                 LIMIT 5
                 """
@@ -56,34 +120,9 @@ async def query_water_body(lat: float, lon: float) -> dict | None:
                 )
                 return None
 
-            best = min(
-                rows,
-                key=lambda r: _haversine_km(
-                    lat, lon, r.centroid_lat, r.centroid_lon
-                ),
-            )
-
-            depth = None
-            depth_type = None
-
-            if best.max_depth is not None:
-                depth = float(best.max_depth)
-                depth_type = "max"
-            elif best.avg_depth is not None:
-                depth = float(best.avg_depth)
-                depth_type = "avg"
-
-            result_dict = {
-                "name": best.name,
-                "water_type": best.water_type,
-                "depth": depth,
-                "depth_type": depth_type,
-                "source": "GVR",
-                "accuracy_m": 100,
-                "has_data": depth is not None,
-                "area_km2": float(best.area_km2) if best.area_km2 else None,
-                "gvr_id": best.gvr_id,
-            }
+            best = _closest_row(lat, lon, rows)
+            result_dict = _row_to_result(best)
+            depth = result_dict["depth"]
 
             logger.info(
                 "gvr_query_result",
@@ -107,6 +146,7 @@ async def query_water_body(lat: float, lon: float) -> dict | None:
             lon=lon,
             error=str(e),
         )
+        record_upstream_error("gvr")
         return None
 
 
@@ -142,27 +182,8 @@ async def query_water_body_by_name(name: str) -> dict | None:
                 )
                 return None
 
-            depth = None
-            depth_type = None
-
-            if row.max_depth is not None:
-                depth = float(row.max_depth)
-                depth_type = "max"
-            elif row.avg_depth is not None:
-                depth = float(row.avg_depth)
-                depth_type = "avg"
-
-            result_dict = {
-                "name": row.name,
-                "water_type": row.water_type,
-                "depth": depth,
-                "depth_type": depth_type,
-                "source": "GVR",
-                "accuracy_m": 100,
-                "has_data": depth is not None,
-                "area_km2": float(row.area_km2) if row.area_km2 else None,
-                "gvr_id": row.gvr_id,
-            }
+            result_dict = _row_to_result(row)
+            depth = result_dict["depth"]
 
             logger.info(
                 "gvr_name_lookup_result",
@@ -182,4 +203,83 @@ async def query_water_body_by_name(name: str) -> dict | None:
             name=name,
             error=str(e),
         )
+        record_upstream_error("gvr")
         return None
+
+
+async def query_water_bodies_batch(points: list[tuple[float, float]]) -> list[dict | None]:
+    """Bbox lookup for many points in one set-based query, results in input order.
+
+    Points the polygon index answers exactly never reach the database.
+    """
+    if not points:
+        return []
+
+    await ensure_fresh_polygon_index()
+    results: list[dict | None] = [None] * len(points)
+    pending = []
+    for i, (lat, lon) in enumerate(points):
+        results[i] = _query_polygon_index(lat, lon)
+        if results[i] is None:
+            pending.append(i)
+    if not pending:
+        return results
+
+    logger.info(
+        "gvr_batch_query_start",
+        service="depth-service",
+        action="gvr_batch_query",
+        points=len(points),
+        polygon_hits=len(points) - len(pending),
+    )
+
+    try:
+        async with async_session() as session:
+            query = text(
+                """
+                SELECT p.idx, w.name, w.water_type, w.avg_depth, w.max_depth,
+                       w.centroid_lat, w.centroid_lon, w.area_km2, w.gvr_id
+                FROM unnest(CAST(:lats AS float8[]), CAST(:lons AS float8[]))
+                     WITH ORDINALITY AS p(lat, lon, idx)
+                CROSS JOIN LATERAL (
+                    SELECT name, water_type, avg_depth, max_depth,
+                           centroid_lat, centroid_lon, area_km2, gvr_id
+                    FROM ru_water_bodies
+                    WHERE box(point(lon_min, lat_min), point(lon_max, lat_max))
+                          && box(point(p.lon, p.lat), point(p.lon, p.lat))
+                    ORDER BY area_km2 DESC NULLS LAST
+                    LIMIT 5
+                ) w
+                """
+            )
+            result = await session.execute(
+                query,
+                {
+                    "lats": [points[i][0] for i in pending],
+                    "lons": [points[i][1] for i in pending],
+                },
+            )
+            rows_by_point: dict[int, list] = {}
+            for row in result.fetchall():
+                rows_by_point.setdefault(pending[row.idx - 1], []).append(row)
+
+        for i, rows in rows_by_point.items():
+            lat, lon = points[i]
+            results[i] = _row_to_result(_closest_row(lat, lon, rows))
+
+        logger.info(
+            "gvr_batch_query_result",
+            service="depth-service",
+            action="gvr_batch_query",
+            points=len(points),
+            matched=len(rows_by_point),
+        )
+    except Exception as e:
+        logger.warning(
+            "gvr_batch_query_error",
+            service="depth-service",
+            action="gvr_batch_query",
+            points=len(points),
+            error=str(e),
+        )
+    return results
@@ -0,0 +1,97 @@
+"""Server-side decluttering for /depth/labels.
+
+Label anchors are projected to Web Mercator pixels at the requested zoom
+and each label gets an approximate screen box from its text. Candidates
+are placed greedily in priority order (larger, then deeper water first);
+a label whose box overlaps one already placed is dropped. Placed boxes
+live in a uniform grid, so each check only looks at the few labels in
+the cells the new box touches.
+
+Positions are absolute pixels for the zoom, not viewport-relative, so
+the same zoom always yields the same layout for a given set of bodies,
+which keeps the result cacheable per snapped bbox.
+"""
+
+import math
+
+TILE_SIZE = 256
+_MAX_MERCATOR_LAT = 85.0511287798066
+
+# Rough glyph metrics of the client's label font (name above, depth below).
+_CHAR_WIDTH_PX = 7
+_LINE_HEIGHT_PX = 14
+_PADDING_PX = 4
+_MAX_LABEL_WIDTH_PX = 160
+
+_CELL_PX = 64
+
+Box = tuple[float, float, float, float]
+
+
+def project(lat: float, lon: float, zoom: int) -> tuple[float, float]:
+    """World pixel coordinates of a point at ``zoom`` (origin top-left)."""
+    size = TILE_SIZE * 2 ** zoom
+    lat = min(max(lat, -_MAX_MERCATOR_LAT), _MAX_MERCATOR_LAT)
+    x = (lon + 180.0) / 360.0 * size
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * size
+    return x, y
+
+
+def label_box(name: str | None, text: str, x: float, y: float) -> Box:
+    """Screen box of a label centred on (x, y), padded on every side."""
+    lines = [line for line in (name, text) if line]
+    width = min(max(len(line) for line in lines) * _CHAR_WIDTH_PX, _MAX_LABEL_WIDTH_PX)
+    half_w = width / 2 + _PADDING_PX
+    half_h = len(lines) * _LINE_HEIGHT_PX / 2 + _PADDING_PX
+    return x - half_w, y - half_h, x + half_w, y + half_h
+
+
+def rank_key(area_km2: float | None, depth: float | None) -> tuple[float, float]:
+    """Sort key putting the labels most worth keeping first."""
+    return -(area_km2 or 0.0), -(depth or 0.0)
+
+
+def _overlaps(a: Box, b: Box) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class CollisionGrid:
+    def __init__(self, cell_px: int = _CELL_PX):
+        self.cell_px = cell_px
+        self._cells: dict[tuple[int, int], list[Box]] = {}
+
+    def _cells_for(self, box: Box):
+        x0, y0, x1, y1 = (int(v // self.cell_px) for v in box)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                yield cx, cy
+
+    def collides(self, box: Box) -> bool:
+        return any(
+            _overlaps(box, placed)
+            for cell in self._cells_for(box)
+            for placed in self._cells.get(cell, ())
+        )
+
+    def insert(self, box: Box) -> None:
+        for cell in self._cells_for(box):
+            self._cells.setdefault(cell, []).append(box)
+
+    def try_place(self, box: Box) -> bool:
+        if self.collides(box):
+            return False
+        self.insert(box)
+        return True
+
+
+def place_labels(features: list[dict], zoom: int) -> list[dict]:
+    """Keep the point features whose labels don't overlap, in the given priority order."""
+    grid = CollisionGrid()
+    placed = []
+    for feature in features:
+        lon, lat = feature["geometry"]["coordinates"]
+        props = feature["properties"]
+        x, y = project(lat, lon, zoom)
+        if grid.try_place(label_box(props.get("name"), props["label"], x, y)):
+            placed.append(feature)
+    return placed
@@ -0,0 +1,161 @@
+"""Minimal Mapbox Vector Tile (spec v2.1) protobuf writer.
+
+Only what the depth layers need: points and polygons with string/number
+properties. Geometry must already be in integer tile coordinates.
+"""
+
+import struct
+
+POINT = 1
+POLYGON = 3
+
+_MOVE_TO = 1
+_LINE_TO = 2
+_CLOSE_PATH = 7
+
+_WIRE_VARINT = 0
+_WIRE_64BIT = 1
+_WIRE_BYTES = 2
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field: int, payload: bytes) -> bytes:
+    return _key(field, _WIRE_BYTES) + _varint(len(payload)) + payload
+
+
+def _varint_field(field: int, value: int) -> bytes:
+    return _key(field, _WIRE_VARINT) + _varint(value)
+
+
+def _packed_field(field: int, values: list[int]) -> bytes:
+    return _bytes_field(field, b"".join(_varint(v) for v in values))
+
+
+def _command(cmd: int, count: int) -> int:
+    return (cmd & 0x7) | (count << 3)
+
+
+def _encode_value(value) -> bytes:
+    if isinstance(value, bool):
+        return _varint_field(7, int(value))
+    if isinstance(value, int):
+        return _varint_field(6, _zigzag(value))
+    if isinstance(value, float):
+        return _key(3, _WIRE_64BIT) + struct.pack("<d", value)
+    return _bytes_field(1, str(value).encode("utf-8"))
+
+
+def ring_area(ring: list[tuple[int, int]]) -> int:
+    """Twice the signed area in tile coordinates (y down).
+
+    Positive means clockwise on screen, which the spec requires for
+    exterior rings; interior rings must be negative.
+    """
+    area = 0
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        area += x1 * y2 - x2 * y1
+    return area
+
+
+def _encode_point(point: tuple[int, int]) -> list[int]:
+    x, y = point
+    return [_command(_MOVE_TO, 1), _zigzag(x), _zigzag(y)]
+
+
+def _encode_polygon(parts: list[list[list[tuple[int, int]]]]) -> list[int]:
+    """Encode a (multi)polygon.
+
+    Each part is a list of open rings (first vertex not repeated): the
+    exterior first, then its holes. Winding is fixed up here.
+    """
+    out = []
+    cx = cy = 0
+    for rings in parts:
+        for i, ring in enumerate(rings):
+            if (i == 0) != (ring_area(ring) > 0):
+                ring = ring[::-1]
+            x, y = ring[0]
+            out += [_command(_MOVE_TO, 1), _zigzag(x - cx), _zigzag(y - cy)]
+            cx, cy = x, y
+            out.append(_command(_LINE_TO, len(ring) - 1))
+            for x, y in ring[1:]:
+                out += [_zigzag(x - cx), _zigzag(y - cy)]
+                cx, cy = x, y
+            out.append(_command(_CLOSE_PATH, 1))
+    return out
+
+
+class LayerBuilder:
+    def __init__(self, name: str, extent: int = 4096):
+        self.name = name
+        self.extent = extent
+        self._features: list[bytes] = []
+        self._keys: dict[str, int] = {}
+        self._values: dict[tuple[type, object], int] = {}
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def _tags(self, properties: dict) -> list[int]:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            key_idx = self._keys.setdefault(key, len(self._keys))
+            value_idx = self._values.setdefault((type(value), value), len(self._values))
+            tags += [key_idx, value_idx]
+        return tags
+
+    def add_point(self, point: tuple[int, int], properties: dict, feature_id: int | None = None) -> None:
+        self._add(POINT, _encode_point(point), properties, feature_id)
+
+    def add_polygon(
+        self,
+        parts: list[list[list[tuple[int, int]]]],
+        properties: dict,
+        feature_id: int | None = None,
+    ) -> None:
+        self._add(POLYGON, _encode_polygon(parts), properties, feature_id)
+
+    def _add(self, geom_type: int, geometry: list[int], properties: dict, feature_id: int | None) -> None:
+        feature = b""
+        if feature_id is not None:
+            feature += _varint_field(1, feature_id)
+        tags = self._tags(properties)
+        if tags:
+            feature += _packed_field(2, tags)
+        feature += _varint_field(3, geom_type)
+        feature += _packed_field(4, geometry)
+        self._features.append(feature)
+
+    def encode(self) -> bytes:
+        layer = _varint_field(15, 2) + _bytes_field(1, self.name.encode("utf-8"))
+        for feature in self._features:
+            layer += _bytes_field(2, feature)
+        for key in self._keys:
+            layer += _bytes_field(3, key.encode("utf-8"))
+        for _, value in self._values:
+            layer += _bytes_field(4, _encode_value(value))
+        layer += _varint_field(5, self.extent)
+        return layer
+
+
+def encode_tile(layers: list[LayerBuilder]) -> bytes:
+    """Serialize a Tile message; empty layers are omitted."""
+    return b"".join(_bytes_field(3, layer.encode()) for layer in layers if len(layer))
@@ -1,7 +1,11 @@
 import httpx
 
+from app.core.circuit_breaker import get_upstream_guard, parse_retry_after
 from app.core.config import settings
+from app.core.http_clients import OVERPASS, get_http_client
 from app.core.logging_config import get_logger
+from app.core.single_flight import SingleFlight
+from app.core.upstream_errors import record_upstream_error
 
 logger = get_logger(__name__)
 
@@ -88,7 +92,24 @@ def _pick_best_element(elements: list[dict]) -> dict | None:
     return None
 
 
+class OverpassError(Exception):
+    """Overpass could not answer (rate limit, HTTP error, timeout)."""
+
+
+_flight = SingleFlight("overpass_water_body")
+
+
 async def query_water_body(lat: float, lon: float) -> dict | None:
+    radius = settings.OVERPASS_SEARCH_RADIUS_M
+    try:
+        return await _flight.do(f"{lat}:{lon}:{radius}", _query_water_body, lat, lon)
+    except OverpassError:
+        # Raised through the flight so every joined caller records it.
+        record_upstream_error("overpass")
+        return None
+
+
+async def _query_water_body(lat: float, lon: float) -> dict | None:
     logger.info(
         "osm_query_start",
         service="depth-service",
@@ -100,77 +121,97 @@ async def query_water_body(lat: float, lon: float) -> dict | None:
 
     query = _build_query(lat, lon, settings.OVERPASS_SEARCH_RADIUS_M)
 
+    guard = get_upstream_guard(OVERPASS)
+    if not await guard.allow():
+        logger.info(
+            "osm_circuit_open",
+            service="depth-service",
+            action="osm_query",
+            lat=lat,
+            lon=lon,
+            breaker=guard.state,
+        )
+        raise OverpassError("circuit open")
+
     try:
-        async with httpx.AsyncClient(timeout=settings.OVERPASS_TIMEOUT + 5) as client:
-            resp = await client.post(
-                settings.OVERPASS_API_URL,
-                data={"data": query},
+        client = get_http_client(OVERPASS)
+        resp = await client.post(
+            settings.OVERPASS_API_URL,
+            data={"data": query},
+        )
+
+        if resp.status_code == 429:
+            logger.warning(
+                "osm_rate_limited",
+                service="depth-service",
+                action="osm_query",
+                lat=lat,
+                lon=lon,
+                status_code=429,
             )
+            await guard.record_failure(
+                rate_limited=True,
+                retry_after=parse_retry_after(resp.headers.get("retry-after")),
+            )
+            raise OverpassError("rate limited")
 
-            if resp.status_code == 429:
-                logger.warning(
-                    "osm_rate_limited",
-                    service="depth-service",
-                    action="osm_query",
-                    lat=lat,
-                    lon=lon,
-                    status_code=429,
-                )
-                return None
-
-            if resp.status_code != 200:
-                logger.warning(
-                    "osm_http_error",
-                    service="depth-service",
-                    action="osm_query",
-                    lat=lat,
-                    lon=lon,
-                    status_code=resp.status_code,
-                )
-                return None
-
-            data = resp.json()
-            elements = data.get("elements", [])
-            tags = _pick_best_element(elements)
-
-            if tags is None:
-                logger.info(
-                    "osm_no_water_body",
-                    service="depth-service",
-                    action="osm_query",
-                    lat=lat,
-                    lon=lon,
-                )
-                return None
-
-            name = tags.get("name")
-            water_type = _parse_water_type(tags)
-            depth, depth_type = _parse_depth(tags)
-
-            result = {
-                "name": name,
-                "water_type": water_type,
-                "depth": depth,
-                "depth_type": depth_type,
-                "source": "OSM",
-                "accuracy_m": settings.OVERPASS_SEARCH_RADIUS_M,
-                "has_data": depth is not None,
-            }
+        if resp.status_code != 200:
+            logger.warning(
+                "osm_http_error",
+                service="depth-service",
+                action="osm_query",
+                lat=lat,
+                lon=lon,
+                status_code=resp.status_code,
+            )
+            await guard.record_failure()
+            raise OverpassError(f"HTTP {resp.status_code}")
 
+        data = resp.json()
+        await guard.record_success()
+        elements = data.get("elements", [])
+        tags = _pick_best_element(elements)
+
+        if tags is None:
             logger.info(
-                "osm_query_result",
+                "osm_no_water_body",
                 service="depth-service",
                 action="osm_query",
                 lat=lat,
                 lon=lon,
-                name=name,
-                water_type=water_type,
-                depth=depth,
-                has_data=result["has_data"],
             )
-            return result
+            return None
+
+        name = tags.get("name")
+        water_type = _parse_water_type(tags)
+        depth, depth_type = _parse_depth(tags)
+
+        result = {
+            "name": name,
+            "water_type": water_type,
+            "depth": depth,
+            "depth_type": depth_type,
+            "source": "OSM",
+            "accuracy_m": settings.OVERPASS_SEARCH_RADIUS_M,
+            "has_data": depth is not None,
+        }
+
+        logger.info(
+            "osm_query_result",
+            service="depth-service",
+            action="osm_query",
+            lat=lat,
+            lon=lon,
+            name=name,
+            water_type=water_type,
+            depth=depth,
+            has_data=result["has_data"],
+        )
+        return result
 
-    except httpx.TimeoutException:
+    except OverpassError:
+        raise
+    except httpx.TimeoutException as e:
         logger.warning(
             "osm_timeout",
             service="depth-service",
@@ -178,7 +219,8 @@ async def query_water_body(lat: float, lon: float) -> dict | None:
             lat=lat,
             lon=lon,
         )
-        return None
+        await guard.record_failure()
+        raise OverpassError("timeout") from e
     except Exception as e:
         logger.warning(
             "osm_error",
@@ -188,4 +230,5 @@ async def query_water_body(lat: float, lon: float) -> dict | None:
             lon=lon,
             error=str(e),
         )
-        return None
+        await guard.record_failure()
+        raise OverpassError(str(e)) from e
@@ -1,36 +1,96 @@
+"""Import OSM polygons for the known water bodies into water_body_polygons.
+
+Bodies are fetched several at a time with one Overpass union query per
+group, by a small pool of workers that share the Overpass rate limiter
+and circuit breaker. Parsed polygons are written in batches with
+multi-row INSERT ... ON CONFLICT, each batch in its own transaction, so
+whatever was committed before a restart is simply skipped next time.
+"""
+
 import asyncio
-import json
+import time
 
 import httpx
 from sqlalchemy import text
 
+from app.core.circuit_breaker import OPEN, get_upstream_guard, parse_retry_after
 from app.core.config import settings
+from app.core.http_clients import OVERPASS, get_http_client
 from app.core.database import async_session
 from app.core.logging_config import get_logger
 from app.seed.seed_water_bodies import WATER_BODIES
+from app.services.coord_codec import encode_rings
+from app.services.bbox_cache import invalidate_bbox_cache
+from app.services.polygon_index import invalidate_polygon_index, refresh_polygon_index
+from app.services.polygon_simplify import build_pyramid
+from app.services.vector_tiles import purge_vector_tiles
 
 logger = get_logger(__name__)
 
-_OVERPASS_DELAY_SEC = 2
 _MAX_RETRIES = 3
+_IMPORT_TIMEOUT_SEC = 120.0
+_QUERY_TIMEOUT_SEC = 90
+# Longest one group (including every half it is split into) waits for the
+# rate limiter / an open breaker overall.
+_FETCH_DEADLINE_SEC = 300.0
+_LIMITER_POLL_SEC = 0.5
+
+_POLYGON_COLUMNS = (
+    "name", "water_type", "coordinates_bin", "lat_min", "lat_max", "lon_min", "lon_max",
+    "centroid_lat", "centroid_lon", "max_depth", "avg_depth", "area_km2", "source", "region",
+)
+_LEVEL_COLUMNS = ("polygon_id", "level", "tolerance", "coordinates_bin", "point_count")
+# asyncpg caps a statement at 32767 bind parameters.
+_MAX_LEVEL_ROWS_PER_INSERT = 1000
+
 
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
 
-def _build_overpass_query(
+
+def _body_clauses(
     name: str, lat_min: float, lon_min: float, lat_max: float, lon_max: float
-) -> str:
+) -> list[str]:
     bbox = f"{lat_min},{lon_min},{lat_max},{lon_max}"
+    name = _quote(name)
+    return [
+        f'  way({bbox})["natural"="water"]["name"="{name}"];',
+        f'  relation({bbox})["natural"="water"]["name"="{name}"];',
+        f'  way({bbox})["waterway"="riverbank"]["name"="{name}"];',
+        f'  relation({bbox})["waterway"="riverbank"]["name"="{name}"];',
+    ]
+
+
+def _build_union_query(bodies: list[dict]) -> str:
+    clauses = [
+        clause
+        for wb in bodies
+        for clause in _body_clauses(wb["name"], wb["lat_min"], wb["lon_min"], wb["lat_max"], wb["lon_max"])
+    ]
+    return f"[out:json][timeout:{_QUERY_TIMEOUT_SEC}];\n(\n" + "\n".join(clauses) + "\n);\nout geom;"
+
+
+def _overlaps(element: dict, wb: dict) -> bool:
+    bounds = element.get("bounds")
+    if not bounds:
+        return True
     return (
-        f"[out:json][timeout:60];\n"
-        f"(\n"
-        f'  way({bbox})["natural"="water"]["name"="{name}"];\n'
-        f'  relation({bbox})["natural"="water"]["name"="{name}"];\n'
-        f'  way({bbox})["waterway"="riverbank"]["name"="{name}"];\n'
-        f'  relation({bbox})["waterway"="riverbank"]["name"="{name}"];\n'
-        f");\n"
-        f"out geom;"
+        bounds["minlat"] <= wb["lat_max"] and bounds["maxlat"] >= wb["lat_min"]
+        and bounds["minlon"] <= wb["lon_max"] and bounds["maxlon"] >= wb["lon_min"]
     )
 
 
+def _split_by_body(data: dict, bodies: list[dict]) -> dict[str, list[dict]]:
+    """Elements of a union response grouped by the body (name + bbox) they answer."""
+    groups: dict[str, list[dict]] = {wb["name"]: [] for wb in bodies}
+    by_name = {wb["name"]: wb for wb in bodies}
+    for element in data.get("elements", []):
+        wb = by_name.get(element.get("tags", {}).get("name"))
+        if wb is not None and _overlaps(element, wb):
+            groups[wb["name"]].append(element)
+    return groups
+
+
 def _parse_polygon_from_overpass(data: dict) -> list[list[list[float]]] | None:
     elements = data.get("elements", [])
 
@@ -81,161 +141,359 @@ def _compute_bbox_and_centroid(
     return lat_min, lat_max, lon_min, lon_max, centroid_lat, centroid_lon
 
 
-async def _fetch_overpass(query: str) -> dict | None:
-    for attempt in range(_MAX_RETRIES):
+async def _fetch_overpass(query: str, deadline: float | None = None) -> dict | None:
+    """POST a query under the shared Overpass rate limiter and breaker.
+
+    ``deadline`` is a time.monotonic() value; by default the query gets
+    _FETCH_DEADLINE_SEC of its own.
+    """
+    guard = get_upstream_guard(OVERPASS)
+    if deadline is None:
+        deadline = time.monotonic() + _FETCH_DEADLINE_SEC
+    attempt = 0
+    while attempt < _MAX_RETRIES and time.monotonic() < deadline:
+        if not await guard.allow():
+            await asyncio.sleep(_LIMITER_POLL_SEC)
+            continue
+        attempt += 1
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                resp = await client.post(
-                    settings.OVERPASS_API_URL, data={"data": query}
-                )
-                if resp.status_code == 200:
-                    return resp.json()
-                if resp.status_code == 429:
-                    logger.warning(
-                        "overpass_rate_limited",
-                        service="depth-service",
-                        action="polygon_import",
-                        attempt=attempt + 1,
-                    )
-                    await asyncio.sleep(5)
-                    continue
-                logger.warning(
-                    "overpass_http_error",
-                    service="depth-service",
-                    action="polygon_import",
-                    status_code=resp.status_code,
-                )
-                return None
+            client = get_http_client(OVERPASS)
+            resp = await client.post(
+                settings.OVERPASS_API_URL, data={"data": query}, timeout=_IMPORT_TIMEOUT_SEC
+            )
         except httpx.TimeoutException:
             logger.warning(
                 "overpass_timeout",
                 service="depth-service",
                 action="polygon_import",
-                attempt=attempt + 1,
+                attempt=attempt,
             )
-            await asyncio.sleep(3)
+            await guard.record_failure()
+            continue
         except Exception as e:
             logger.warning(
                 "overpass_error",
                 service="depth-service",
                 action="polygon_import",
                 error=str(e),
-                attempt=attempt + 1,
+                attempt=attempt,
             )
-            await asyncio.sleep(3)
+            await guard.record_failure()
+            continue
+
+        if resp.status_code == 200:
+            await guard.record_success()
+            return resp.json()
+        if resp.status_code == 429:
+            logger.warning(
+                "overpass_rate_limited",
+                service="depth-service",
+                action="polygon_import",
+                attempt=attempt,
+            )
+            await guard.record_failure(
+                rate_limited=True,
+                retry_after=parse_retry_after(resp.headers.get("retry-after")),
+            )
+            continue
+        logger.warning(
+            "overpass_http_error",
+            service="depth-service",
+            action="polygon_import",
+            status_code=resp.status_code,
+        )
+        if resp.status_code < 500:
+            return None
+        await guard.record_failure()
     return None
 
 
-async def import_single_water_body(wb: dict) -> bool:
-    name = wb["name"]
-    logger.info(
-        "polygon_import_start",
-        service="depth-service",
-        action="polygon_import",
-        name=name,
+def _pyramid_rows(rings: list[list[list[float]]]) -> list[dict]:
+    return [
+        {
+            "level": level,
+            "tolerance": tolerance,
+            "coordinates_bin": encode_rings(simplified),
+            "point_count": sum(len(ring) for ring in simplified),
+        }
+        for level, tolerance, simplified in build_pyramid(rings)
+    ]
+
+
+def _level_rows(polygon_id: int, rings: list[list[list[float]]]) -> list[dict]:
+    return [{"polygon_id": polygon_id, **row} for row in _pyramid_rows(rings)]
+
+
+async def store_polygon_levels(session, polygon_id: int, rings: list[list[list[float]]]) -> None:
+    rows = await asyncio.to_thread(_level_rows, polygon_id, rings)
+    await _insert_level_rows(session, rows)
+
+
+def _polygon_row(wb: dict, rings: list[list[list[float]]]) -> dict:
+    lat_min, lat_max, lon_min, lon_max, centroid_lat, centroid_lon = (
+        _compute_bbox_and_centroid(rings)
     )
+    return {
+        "name": wb["name"],
+        "water_type": wb.get("water_type", "lake"),
+        "coordinates_bin": encode_rings(rings),
+        "lat_min": lat_min,
+        "lat_max": lat_max,
+        "lon_min": lon_min,
+        "lon_max": lon_max,
+        "centroid_lat": centroid_lat,
+        "centroid_lon": centroid_lon,
+        "max_depth": wb.get("max_depth"),
+        "avg_depth": wb.get("avg_depth"),
+        "area_km2": wb.get("area_km2"),
+        "source": "OSM",
+        "region": wb.get("region"),
+    }
+
+
+def _prepare(wb: dict, rings: list[list[list[float]]]) -> tuple[dict, list[dict]]:
+    """Polygon row and its pyramid; CPU-bound, run off the event loop."""
+    return _polygon_row(wb, rings), _pyramid_rows(rings)
+
+
+def _multi_row_insert(
+    table: str, columns: tuple[str, ...], rows: list[dict], on_conflict: str
+) -> tuple[str, dict]:
+    values = ",\n".join(
+        "(" + ", ".join(f":{column}_{i}" for column in columns) + ")" for i in range(len(rows))
+    )
+    params = {f"{column}_{i}": row[column] for i, row in enumerate(rows) for column in columns}
+    sql = f"INSERT INTO {table} ({', '.join(columns)})\nVALUES\n{values}\n{on_conflict}"
+    return sql, params
+
+
+def _polygon_conflict_clause(replace: bool) -> str:
+    if not replace:
+        return "ON CONFLICT (name) DO NOTHING\nRETURNING id, name"
+    updates = ",\n    ".join(
+        f"{column} = EXCLUDED.{column}" for column in _POLYGON_COLUMNS if column != "name"
+    )
+    return (
+        "ON CONFLICT (name) DO UPDATE SET\n    "
+        + updates
+        + ",\n    coordinates = NULL,\n    updated_at = CURRENT_TIMESTAMP\n"
+        "RETURNING id, name"
+    )
+
+
+_LEVEL_CONFLICT_CLAUSE = """ON CONFLICT (polygon_id, level) DO UPDATE
+    SET tolerance = EXCLUDED.tolerance,
+        coordinates = NULL,
+        coordinates_bin = EXCLUDED.coordinates_bin,
+        point_count = EXCLUDED.point_count"""
+
+
+async def _insert_level_rows(session, rows: list[dict]) -> None:
+    for i in range(0, len(rows), _MAX_LEVEL_ROWS_PER_INSERT):
+        chunk = rows[i:i + _MAX_LEVEL_ROWS_PER_INSERT]
+        sql, params = _multi_row_insert(
+            "water_body_polygon_levels", _LEVEL_COLUMNS, chunk, _LEVEL_CONFLICT_CLAUSE
+        )
+        await session.execute(text(sql), params)
+
 
-    query = _build_overpass_query(
-        name, wb["lat_min"], wb["lon_min"], wb["lat_max"], wb["lon_max"]
+async def store_polygon_batch(prepared: list[tuple[dict, list[dict]]], replace: bool = False) -> int:
+    """Upsert polygons with their pyramids in one transaction; returns rows written."""
+    by_name = {row["name"]: (row, levels) for row, levels in prepared}
+    sql, params = _multi_row_insert(
+        "water_body_polygons",
+        _POLYGON_COLUMNS,
+        [row for row, _ in by_name.values()],
+        _polygon_conflict_clause(replace),
     )
-    data = await _fetch_overpass(query)
 
+    async with async_session() as session:
+        result = await session.execute(text(sql), params)
+        ids = {name: polygon_id for polygon_id, name in result.all()}
+
+        level_rows = [
+            {"polygon_id": ids[name], **level}
+            for name, (_, levels) in by_name.items()
+            if name in ids
+            for level in levels
+        ]
+        await _insert_level_rows(session, level_rows)
+        await session.commit()
+    return len(ids)
+
+
+async def _fetch_group(
+    bodies: list[dict], deadline: float | None = None
+) -> list[tuple[dict, list[dict]]]:
+    """Fetch and prepare a group of bodies; a failed union is retried in halves.
+
+    The halves share the group's deadline. Splitting stops once it has
+    passed or the Overpass breaker is open, since smaller queries would
+    only queue behind the same outage; those bodies wait for the next run.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + _FETCH_DEADLINE_SEC
+    data = await _fetch_overpass(_build_union_query(bodies), deadline)
     if data is None:
+        if time.monotonic() >= deadline or get_upstream_guard(OVERPASS).state == OPEN:
+            logger.warning(
+                "polygon_import_group_skipped",
+                service="depth-service",
+                action="polygon_import",
+                names=[wb["name"] for wb in bodies],
+            )
+            return []
+        if len(bodies) > 1:
+            mid = len(bodies) // 2
+            return (
+                await _fetch_group(bodies[:mid], deadline)
+                + await _fetch_group(bodies[mid:], deadline)
+            )
         logger.warning(
             "polygon_import_no_data",
             service="depth-service",
             action="polygon_import",
-            name=name,
+            name=bodies[0]["name"],
         )
-        return False
+        return []
 
-    rings = _parse_polygon_from_overpass(data)
-    if rings is None:
-        logger.warning(
-            "polygon_import_parse_fail",
+    groups = _split_by_body(data, bodies)
+    prepared = []
+    for wb in bodies:
+        rings = _parse_polygon_from_overpass({"elements": groups[wb["name"]]})
+        if rings is None:
+            logger.warning(
+                "polygon_import_parse_fail",
+                service="depth-service",
+                action="polygon_import",
+                name=wb["name"],
+            )
+            continue
+        prepared.append(await asyncio.to_thread(_prepare, wb, rings))
+    return prepared
+
+
+async def _fetch_worker(groups: asyncio.Queue, prepared: asyncio.Queue) -> None:
+    while True:
+        try:
+            bodies = groups.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        try:
+            for item in await _fetch_group(bodies):
+                await prepared.put(item)
+        except Exception as e:
+            logger.error(
+                "polygon_import_group_error",
+                service="depth-service",
+                action="polygon_import",
+                names=[wb["name"] for wb in bodies],
+                error=str(e),
+            )
+
+
+async def _write_batch(batch: list[tuple[dict, list[dict]]], replace: bool, stats: dict[str, int]) -> None:
+    try:
+        stats["imported"] += await store_polygon_batch(batch, replace=replace)
+    except Exception as e:
+        # Keep consuming so the fetch workers never block on a full queue;
+        # the bodies are picked up again on the next run.
+        stats["failed_writes"] += len(batch)
+        logger.error(
+            "polygon_import_write_error",
             service="depth-service",
             action="polygon_import",
-            name=name,
+            names=[row["name"] for row, _ in batch],
+            error=str(e),
         )
-        return False
 
-    lat_min, lat_max, lon_min, lon_max, centroid_lat, centroid_lon = (
-        _compute_bbox_and_centroid(rings)
-    )
 
-    async with async_session() as session:
-        await session.execute(
-            text(
-                """
-                INSERT INTO water_body_polygons
-                    (name, water_type, coordinates, lat_min, lat_max, lon_min, lon_max,
-                     centroid_lat, centroid_lon, max_depth, avg_depth, area_km2,
-                     source, region)
-                VALUES
-                    (:name, :water_type, CAST(:coordinates AS JSONB),
-                     :lat_min, :lat_max, :lon_min, :lon_max,
-                     :centroid_lat, :centroid_lon, :max_depth, :avg_depth,
-                     :area_km2, 'OSM', :region)
-                ON CONFLICT DO NOTHING
-                """
-            ),
-            {
-                "name": name,
-                "water_type": wb.get("water_type", "lake"),
-                "coordinates": json.dumps(rings),
-                "lat_min": lat_min,
-                "lat_max": lat_max,
-                "lon_min": lon_min,
-                "lon_max": lon_max,
-                "centroid_lat": centroid_lat,
-                "centroid_lon": centroid_lon,
-                "max_depth": wb.get("max_depth"),
-                "avg_depth": wb.get("avg_depth"),
-                "area_km2": wb.get("area_km2"),
-                "region": wb.get("region"),
-            },
-        )
-        await session.commit()
+async def _writer(prepared: asyncio.Queue, replace: bool, stats: dict[str, int]) -> None:
+    batch = []
+    while True:
+        item = await prepared.get()
+        if item is None:
+            break
+        batch.append(item)
+        if len(batch) >= settings.POLYGON_IMPORT_WRITE_BATCH:
+            await _write_batch(batch, replace, stats)
+            batch = []
+    if batch:
+        await _write_batch(batch, replace, stats)
+
+
+async def import_water_bodies(bodies: list[dict], replace: bool = False) -> int:
+    """Fetch, parse and store ``bodies``; returns how many polygons were written.
+
+    Without ``replace`` bodies already in the table are left untouched.
+    """
+    group_size = settings.POLYGON_IMPORT_GROUP_SIZE
+    groups: asyncio.Queue = asyncio.Queue()
+    for i in range(0, len(bodies), group_size):
+        groups.put_nowait(bodies[i:i + group_size])
+
+    prepared: asyncio.Queue = asyncio.Queue(maxsize=2 * settings.POLYGON_IMPORT_WRITE_BATCH)
+    stats = {"imported": 0, "failed_writes": 0}
+    writer = asyncio.create_task(_writer(prepared, replace, stats))
+    try:
+        await asyncio.gather(*(
+            _fetch_worker(groups, prepared)
+            for _ in range(min(settings.POLYGON_IMPORT_WORKERS, groups.qsize()))
+        ))
+        await prepared.put(None)
+        await writer
+    finally:
+        writer.cancel()
 
     logger.info(
-        "polygon_import_success",
+        "polygon_import_completed",
         service="depth-service",
         action="polygon_import",
-        name=name,
-        rings=len(rings),
+        requested=len(bodies),
+        **stats,
     )
-    return True
+    return stats["imported"]
+
+
+async def _existing_names() -> set[str]:
+    async with async_session() as session:
+        result = await session.execute(text("SELECT name FROM water_body_polygons"))
+        return {row[0] for row in result.all()}
+
+
+async def after_polygons_changed() -> None:
+    await invalidate_polygon_index()
+    await refresh_polygon_index()
+    purge_vector_tiles()
+    await invalidate_bbox_cache()
 
 
-async def seed_polygons_if_empty():
+async def seed_missing_polygons():
+    """Import every known water body that has no polygon yet.
+
+    Rows are committed batch by batch, so an interrupted seed resumes with
+    whatever is still missing on the next start.
+    """
     try:
-        async with async_session() as session:
-            result = await session.execute(
-                text("SELECT COUNT(*) FROM water_body_polygons")
+        existing = await _existing_names()
+        missing = [wb for wb in WATER_BODIES if wb["name"] not in existing]
+        if not missing:
+            logger.info(
+                "polygon_seed_skip",
+                service="depth-service",
+                action="polygon_seed",
+                existing=len(existing),
             )
-            count = result.scalar()
-            if count and count > 0:
-                logger.info(
-                    "polygon_seed_skip",
-                    service="depth-service",
-                    action="polygon_seed",
-                    existing=count,
-                )
-                return
+            return
 
         logger.info(
             "polygon_seed_start",
             service="depth-service",
             action="polygon_seed",
             total=len(WATER_BODIES),
+            missing=len(missing),
         )
-
-        imported = 0
-        for wb in WATER_BODIES:
-            success = await import_single_water_body(wb)
-            if success:
-                imported += 1
-            await asyncio.sleep(_OVERPASS_DELAY_SEC)
+        imported = await import_water_bodies(missing)
 
         logger.info(
             "polygon_seed_completed",
@@ -244,6 +502,8 @@ async def seed_polygons_if_empty():
             imported=imported,
             total=len(WATER_BODIES),
         )
+        if imported:
+            await after_polygons_changed()
     except Exception as e:
         logger.error(
             "polygon_seed_error",
@@ -0,0 +1,259 @@
+"""In-process spatial index over water_body_polygons.
+
+The whole polygon table is small enough to keep in memory, so point
+resolution can skip the database: a packed R-tree (Sort-Tile-Recursive
+bulk load) narrows candidates by bbox, then an exact even-odd test runs
+over each candidate's rings stored as one contiguous float64 array.
+The index is immutable; refresh builds a new one and swaps the global.
+
+Every worker holds its own copy. The polygon importer bumps a generation
+counter in Redis; workers compare it with the generation their index was
+built from (at most every POLYGON_INDEX_CHECK_SEC) and reload on change.
+"""
+
+import asyncio
+import math
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.core.logging_config import get_logger
+from app.core.redis_client import cache_get_raw, cache_incr
+from app.services.coord_codec import rings_from_row
+
+logger = get_logger(__name__)
+
+_NODE_CAPACITY = 16
+_GENERATION_KEY = "depth:polygons:gen"
+
+
+class WaterPolygon:
+    __slots__ = (
+        "name", "water_type", "max_depth", "avg_depth", "area_km2", "region",
+        "coords", "ring_offsets", "bbox",
+    )
+
+    def __init__(self, name, water_type, rings, max_depth=None, avg_depth=None,
+                 area_km2=None, region=None):
+        self.name = name
+        self.water_type = water_type
+        self.max_depth = max_depth
+        self.avg_depth = avg_depth
+        self.region = region
+
+        parts = [np.asarray(ring, dtype=np.float64).reshape(-1, 2) for ring in rings]
+        self.coords = np.concatenate(parts) if parts else np.empty((0, 2))
+        self.ring_offsets = np.cumsum([0] + [len(p) for p in parts])
+        lon_min, lat_min = self.coords.min(axis=0)
+        lon_max, lat_max = self.coords.max(axis=0)
+        self.bbox = (lon_min, lat_min, lon_max, lat_max)
+        if area_km2 is None:
+            area_km2 = (lon_max - lon_min) * (lat_max - lat_min) * 111.0 * 111.0
+        self.area_km2 = area_km2
+
+    def contains(self, lon: float, lat: float) -> bool:
+        """Even-odd rule across all rings, so inner rings act as holes."""
+        crossings = 0
+        for start, end in zip(self.ring_offsets[:-1], self.ring_offsets[1:]):
+            ring = self.coords[start:end]
+            if len(ring) < 3:
+                continue
+            x1, y1 = ring[:, 0], ring[:, 1]
+            x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+            straddles = (y1 > lat) != (y2 > lat)
+            if not straddles.any():
+                continue
+            x1, y1, x2, y2 = x1[straddles], y1[straddles], x2[straddles], y2[straddles]
+            x_cross = x1 + (lat - y1) * (x2 - x1) / (y2 - y1)
+            crossings += int(np.count_nonzero(lon < x_cross))
+        return crossings % 2 == 1
+
+
+class PolygonIndex:
+    """Packed R-tree over WaterPolygon bboxes.
+
+    Leaves are ordered by STR; every upper level groups _NODE_CAPACITY
+    consecutive entries of the level below, so node i of a level covers
+    children [i * cap, (i + 1) * cap) and no child pointers are stored.
+    """
+
+    def __init__(self, polygons: list[WaterPolygon], node_capacity: int = _NODE_CAPACITY):
+        self._capacity = node_capacity
+        self.polygons = _str_order(polygons, node_capacity)
+        self._levels: list[np.ndarray] = []
+
+        if not self.polygons:
+            return
+
+        boxes = np.array([p.bbox for p in self.polygons], dtype=np.float64)
+        self._levels.append(boxes)
+        while len(boxes) > node_capacity:
+            boxes = np.array([
+                _union(boxes[i:i + node_capacity])
+                for i in range(0, len(boxes), node_capacity)
+            ])
+            self._levels.append(boxes)
+        self._levels.reverse()
+
+    def __len__(self) -> int:
+        return len(self.polygons)
+
+    def candidates(self, lon: float, lat: float) -> list[WaterPolygon]:
+        """Polygons whose bbox contains the point, boundaries inclusive."""
+        if not self._levels:
+            return []
+
+        nodes = np.arange(len(self._levels[0]))
+        for depth, boxes in enumerate(self._levels):
+            if depth > 0:
+                nodes = (nodes[:, None] * self._capacity + np.arange(self._capacity)).ravel()
+                nodes = nodes[nodes < len(boxes)]
+            b = boxes[nodes]
+            hit = (b[:, 0] <= lon) & (b[:, 2] >= lon) & (b[:, 1] <= lat) & (b[:, 3] >= lat)
+            nodes = nodes[hit]
+            if not len(nodes):
+                return []
+        return [self.polygons[i] for i in nodes]
+
+    def find(self, lat: float, lon: float) -> WaterPolygon | None:
+        """Smallest polygon that actually contains the point.
+
+        Nested bodies (a bay inside a lake, an island lake) are resolved to
+        the most specific one.
+        """
+        containing = [p for p in self.candidates(lon, lat) if p.contains(lon, lat)]
+        if not containing:
+            return None
+        return min(containing, key=lambda p: p.area_km2)
+
+
+def _union(boxes: np.ndarray) -> tuple[float, float, float, float]:
+    return (
+        boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max(),
+    )
+
+
+def _str_order(polygons: list[WaterPolygon], capacity: int) -> list[WaterPolygon]:
+    if len(polygons) <= capacity:
+        return list(polygons)
+
+    leaf_count = math.ceil(len(polygons) / capacity)
+    slice_count = math.ceil(math.sqrt(leaf_count))
+    slice_size = slice_count * capacity
+
+    by_x = sorted(polygons, key=lambda p: p.bbox[0] + p.bbox[2])
+    ordered = []
+    for i in range(0, len(by_x), slice_size):
+        ordered.extend(sorted(by_x[i:i + slice_size], key=lambda p: p.bbox[1] + p.bbox[3]))
+    return ordered
+
+
+def build_index(rows) -> PolygonIndex:
+    polygons = []
+    for row in rows:
+        rings = [ring for ring in rings_from_row(row).rings() if len(ring) >= 3]
+        if not rings:
+            continue
+        polygons.append(WaterPolygon(
+            name=row.name,
+            water_type=row.water_type,
+            rings=rings,
+            max_depth=row.max_depth,
+            avg_depth=row.avg_depth,
+            area_km2=row.area_km2,
+            region=row.region,
+        ))
+    return PolygonIndex(polygons)
+
+
+_index: PolygonIndex | None = None
+# Generation the current index was loaded at; None until a load succeeds.
+_index_generation: str | None = None
+_checked_at = 0.0
+_refresh_lock = asyncio.Lock()
+
+
+def get_polygon_index() -> PolygonIndex | None:
+    return _index
+
+
+def set_polygon_index(index: PolygonIndex | None, generation: str | None = None) -> None:
+    global _index, _index_generation
+    _index = index
+    _index_generation = generation
+
+
+async def _generation() -> str:
+    return await cache_get_raw(_GENERATION_KEY) or "0"
+
+
+async def refresh_polygon_index() -> None:
+    if not settings.POLYGON_INDEX_ENABLED:
+        return
+
+    try:
+        # Read before loading: an import finishing mid-load bumps it again
+        # and the next check reloads.
+        generation = await _generation()
+        async with async_session() as session:
+            result = await session.execute(
+                text(
+                    """
+                    SELECT name, water_type, coordinates_bin, coordinates,
+                           max_depth, avg_depth, area_km2, region
+                    FROM water_body_polygons
+                    """
+                )
+            )
+            rows = result.fetchall()
+
+        index = await asyncio.to_thread(build_index, rows)
+        set_polygon_index(index, generation)
+        logger.info(
+            "polygon_index_loaded",
+            service="depth-service",
+            action="polygon_index_refresh",
+            polygons=len(index),
+            generation=generation,
+        )
+    except Exception as e:
+        logger.warning(
+            "polygon_index_refresh_error",
+            service="depth-service",
+            action="polygon_index_refresh",
+            error=str(e),
+        )
+
+
+async def ensure_fresh_polygon_index() -> None:
+    """Reload the index if another process imported polygons since it was built.
+
+    An index that never loaded (say the database was not up at startup) is
+    stale too, so the load is retried at the same rate.
+    """
+    global _checked_at
+    if not settings.POLYGON_INDEX_ENABLED:
+        return
+    now = time.monotonic()
+    if now - _checked_at < settings.POLYGON_INDEX_CHECK_SEC:
+        return
+    _checked_at = now
+
+    if _index_generation is not None and await _generation() == _index_generation:
+        return
+    async with _refresh_lock:
+        if _index_generation is None or await _generation() != _index_generation:
+            await refresh_polygon_index()
+
+
+async def invalidate_polygon_index() -> None:
+    generation = await cache_incr(_GENERATION_KEY)
+    logger.info(
+        "polygon_index_invalidated",
+        service="depth-service",
+        action="polygon_index_refresh",
+        generation=generation,
+    )
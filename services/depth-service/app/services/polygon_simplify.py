@@ -0,0 +1,107 @@
+"""Douglas-Peucker simplification and the per-polygon simplification pyramid.
+
+The importer stores each polygon at every tolerance in SIMPLIFY_LEVELS
+(water_body_polygon_levels); readers pick the coarsest level whose
+tolerance still stays under one screen pixel for the area they render.
+Level 0 is the original geometry in water_body_polygons itself.
+"""
+
+import math
+
+import numpy as np
+
+# Tolerances in degrees for levels 1..N (~30 m up to ~3 km at the equator).
+SIMPLIFY_LEVELS = (0.0003, 0.001, 0.003, 0.01, 0.03)
+
+# Assumed viewport width when a bbox is turned into degrees per pixel.
+VIEWPORT_PX = 1024
+
+
+def simplify_ring(ring: np.ndarray, tolerance: float) -> np.ndarray:
+    """Douglas-Peucker on an open ring (last vertex not repeated), anchored at its first vertex."""
+    if len(ring) < 4:
+        return ring
+    closed = np.vstack((ring, ring[:1]))
+    keep = np.zeros(len(closed), dtype=bool)
+    keep[0] = keep[-1] = True
+    far = int(np.argmax(np.hypot(*(closed - closed[0]).T)))
+    keep[far] = True
+    stack = [(0, far), (far, len(closed) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = closed[start], closed[end]
+        seg = closed[start + 1:end]
+        dx, dy = b - a
+        norm = math.hypot(dx, dy)
+        if norm == 0:
+            dist = np.hypot(*(seg - a).T)
+        else:
+            dist = np.abs(dx * (seg[:, 1] - a[1]) - dy * (seg[:, 0] - a[0])) / norm
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            mid = start + 1 + i
+            keep[mid] = True
+            stack += [(start, mid), (mid, end)]
+    return closed[keep][:-1]
+
+
+def _decimals_for(tolerance: float) -> int:
+    # One extra digit below the tolerance is all the precision the level can show.
+    return max(0, math.ceil(-math.log10(tolerance)) + 1)
+
+
+def simplify_rings(rings: list[list[list[float]]], tolerance: float) -> list[list[list[float]]]:
+    """Simplify GeoJSON-style closed rings; rings that collapse are dropped."""
+    decimals = _decimals_for(tolerance)
+    result = []
+    for ring in rings:
+        points = np.asarray(ring, dtype=np.float64).reshape(-1, 2)
+        if len(points) > 1 and (points[0] == points[-1]).all():
+            points = points[:-1]
+        if len(points) < 3 or np.ptp(points, axis=0).max() < tolerance:
+            continue
+        simplified = np.round(simplify_ring(points, tolerance), decimals)
+        distinct = np.any(simplified != np.roll(simplified, 1, axis=0), axis=1)
+        simplified = simplified[distinct]
+        if len(simplified) < 3:
+            continue
+        closed = simplified.tolist()
+        closed.append(closed[0])
+        result.append(closed)
+    return result
+
+
+def build_pyramid(rings: list[list[list[float]]]) -> list[tuple[int, float, list]]:
+    """(level, tolerance, rings) for every level in SIMPLIFY_LEVELS.
+
+    Each level is simplified from the previous one rather than from the
+    original, which is much cheaper on big rings; the deviation from the
+    original stays within the sum of the tolerances so far, dominated by the
+    current one since they grow roughly 3x per level.
+    """
+    levels = []
+    current = rings
+    for level, tolerance in enumerate(SIMPLIFY_LEVELS, start=1):
+        current = simplify_rings(current, tolerance)
+        levels.append((level, tolerance, current))
+    return levels
+
+
+def level_for_bbox(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    pixels: int = VIEWPORT_PX,
+) -> int:
+    """Coarsest pyramid level whose tolerance is below one pixel of the bbox."""
+    mid_lat = math.radians((min_lat + max_lat) / 2)
+    span = max(max_lat - min_lat, (max_lon - min_lon) * math.cos(mid_lat))
+    degrees_per_pixel = span / pixels
+    level = 0
+    for i, tolerance in enumerate(SIMPLIFY_LEVELS, start=1):
+        if tolerance <= degrees_per_pixel:
+            level = i
+    return level
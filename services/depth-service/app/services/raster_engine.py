@@ -0,0 +1,235 @@
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+from PIL import TiffImagePlugin
+
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_TAG_WIDTH = 256
+_TAG_HEIGHT = 257
+_TAG_BITS_PER_SAMPLE = 258
+_TAG_COMPRESSION = 259
+_TAG_STRIP_OFFSETS = 273
+_TAG_STRIP_BYTE_COUNTS = 279
+_TAG_SAMPLES_PER_PIXEL = 277
+_TAG_ROWS_PER_STRIP = 278
+_TAG_TILE_WIDTH = 322
+_TAG_TILE_LENGTH = 323
+_TAG_TILE_OFFSETS = 324
+_TAG_TILE_BYTE_COUNTS = 325
+_TAG_SAMPLE_FORMAT = 339
+_TAG_MODEL_PIXEL_SCALE = 33550
+_TAG_MODEL_TIEPOINT = 33922
+_TAG_GDAL_NODATA = 42113
+
+_SAMPLE_FORMAT_KIND = {1: "u", 2: "i", 3: "f"}
+
+
+class RasterFormatError(ValueError):
+    pass
+
+
+class BlockBand:
+    """Read-only 2-D view over the strips or tiles of a single-band TIFF.
+
+    The file is memory-mapped once; a point read touches only the page that
+    holds the requested sample, so even a multi-GB grid costs no RAM. Point
+    reads need uncompressed blocks; ``block_bytes`` hands out the stored
+    bytes of any block for callers that decode it themselves.
+    """
+
+    def __init__(self, path: Path, ifd, byteorder: str):
+        self.ifd = ifd
+        self.byteorder = byteorder
+        self.width = int(ifd[_TAG_WIDTH])
+        self.height = int(ifd[_TAG_HEIGHT])
+        bits = _first(ifd.get(_TAG_BITS_PER_SAMPLE, 8))
+        kind = _SAMPLE_FORMAT_KIND.get(_first(ifd.get(_TAG_SAMPLE_FORMAT, 1)))
+        if kind is None:
+            raise RasterFormatError("unsupported TIFF sample format")
+        self.dtype = np.dtype(f"{byteorder}{kind}{bits // 8}")
+
+        if _TAG_TILE_OFFSETS in ifd:
+            self.block_w = int(ifd[_TAG_TILE_WIDTH])
+            self.block_h = int(ifd[_TAG_TILE_LENGTH])
+            offsets = ifd[_TAG_TILE_OFFSETS]
+        else:
+            self.block_w = self.width
+            self.block_h = int(ifd.get(_TAG_ROWS_PER_STRIP, self.height))
+            offsets = ifd[_TAG_STRIP_OFFSETS]
+        self.tiled = _TAG_TILE_OFFSETS in ifd
+        self.blocks_across = -(-self.width // self.block_w)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        byte_counts = ifd.get(_TAG_TILE_BYTE_COUNTS if self.tiled else _TAG_STRIP_BYTE_COUNTS, ())
+        self.byte_counts = np.asarray(byte_counts, dtype=np.int64)
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.height, self.width
+
+    def block_index(self, top: int, left: int) -> int:
+        """Index of the strip or tile holding pixel (top, left)."""
+        return (top // self.block_h) * self.blocks_across + left // self.block_w
+
+    def block_bytes(self, block: int) -> bytes:
+        """Stored (possibly compressed) bytes of one strip or tile."""
+        start = int(self.offsets[block])
+        return self._mm[start:start + int(self.byte_counts[block])].tobytes()
+
+    def __getitem__(self, index: tuple[int, int]):
+        row, col = index
+        block = self.block_index(row, col)
+        within = (row % self.block_h) * self.block_w + col % self.block_w
+        start = int(self.offsets[block]) + within * self.dtype.itemsize
+        return self._mm[start : start + self.dtype.itemsize].view(self.dtype)[0]
+
+
+class GeoRaster:
+    """Single-band north-up elevation grid with a GDAL-style affine transform.
+
+    ``transform`` is ``(origin_lon, pixel_width, 0, origin_lat, 0, pixel_height)``
+    with ``pixel_height`` negative, referring to the outer corner of pixel (0, 0).
+    """
+
+    def __init__(self, band, transform: tuple, nodata: float | None = None):
+        if transform[2] != 0 or transform[4] != 0:
+            raise RasterFormatError("rotated rasters are not supported")
+        self.band = band
+        self.transform = tuple(float(v) for v in transform)
+        self.nodata = nodata
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.band.shape
+
+    def get_coord(self, lat: float, lon: float) -> tuple[float, float]:
+        origin_lon, pixel_w, _, origin_lat, _, pixel_h = self.transform
+        return (lat - origin_lat) / pixel_h, (lon - origin_lon) / pixel_w
+
+    def _value(self, row: int, col: int) -> float | None:
+        value = float(self.band[row, col])
+        if math.isnan(value) or (self.nodata is not None and value == self.nodata):
+            return None
+        return value
+
+    def sample(self, lat: float, lon: float) -> float | None:
+        row_f, col_f = self.get_coord(lat, lon)
+        row, col = math.floor(row_f), math.floor(col_f)
+        height, width = self.shape
+        if not (0 <= row < height and 0 <= col < width):
+            return None
+        return self._value(row, col)
+
+    def sample_bilinear(self, lat: float, lon: float) -> float | None:
+        row_f, col_f = self.get_coord(lat, lon)
+        height, width = self.shape
+        if not (0 <= row_f < height and 0 <= col_f < width):
+            return None
+
+        # Interpolate between pixel centres; clamp at the raster edge.
+        y = min(max(row_f - 0.5, 0.0), height - 1)
+        x = min(max(col_f - 0.5, 0.0), width - 1)
+        r0, c0 = int(y), int(x)
+        r1, c1 = min(r0 + 1, height - 1), min(c0 + 1, width - 1)
+        dy, dx = y - r0, x - c0
+
+        corners = [
+            (self._value(r0, c0), (1 - dy) * (1 - dx)),
+            (self._value(r0, c1), (1 - dy) * dx),
+            (self._value(r1, c0), dy * (1 - dx)),
+            (self._value(r1, c1), dy * dx),
+        ]
+        valid = [(v, w) for v, w in corners if v is not None and w > 0]
+        if not valid:
+            return self._value(round(y), round(x))
+        total = sum(w for _, w in valid)
+        return sum(v * w for v, w in valid) / total
+
+
+def _first(value):
+    return value[0] if isinstance(value, tuple) else value
+
+
+def _read_tiff_ifd(path: Path):
+    with open(path, "rb") as f:
+        header = f.read(8)
+        if header[:4] not in (b"II*\x00", b"MM\x00*"):
+            raise RasterFormatError("not a classic TIFF file (BigTIFF is not supported)")
+        ifd = TiffImagePlugin.ImageFileDirectory_v2(header)
+        f.seek(ifd.next)
+        ifd.load(f)
+    byteorder = "<" if header[:2] == b"II" else ">"
+    return ifd, byteorder
+
+
+def geotiff_transform(ifd) -> tuple:
+    scale = ifd.get(_TAG_MODEL_PIXEL_SCALE)
+    tiepoint = ifd.get(_TAG_MODEL_TIEPOINT)
+    if not scale or not tiepoint:
+        raise RasterFormatError("GeoTIFF lacks ModelPixelScale/ModelTiepoint tags")
+    i, j, _, x, y, _ = tiepoint[:6]
+    sx, sy = scale[0], scale[1]
+    return (x - i * sx, sx, 0.0, y + j * sy, 0.0, -sy)
+
+
+def geotiff_nodata(ifd) -> float | None:
+    raw = ifd.get(_TAG_GDAL_NODATA)
+    if raw is None:
+        return None
+    try:
+        return float(str(raw).strip("\x00 "))
+    except ValueError:
+        return None
+
+
+def open_tiff_band(path: str | Path) -> BlockBand:
+    """Memory-map the single band of a classic TIFF; its tags are on ``band.ifd``."""
+    path = Path(path)
+    ifd, byteorder = _read_tiff_ifd(path)
+    if _first(ifd.get(_TAG_SAMPLES_PER_PIXEL, 1)) != 1:
+        raise RasterFormatError("only single-band GeoTIFFs are supported")
+    return BlockBand(path, ifd, byteorder)
+
+
+def _load_geotiff(path: Path) -> GeoRaster:
+    band = open_tiff_band(path)
+    if band.ifd.get(_TAG_COMPRESSION, 1) != 1:
+        raise RasterFormatError(
+            "compressed GeoTIFF cannot be memory-mapped; "
+            "convert it with python -m app.seed.convert_gebco_raster"
+        )
+    return GeoRaster(band, geotiff_transform(band.ifd), geotiff_nodata(band.ifd))
+
+
+def _load_npy(path: Path) -> GeoRaster:
+    meta = json.loads(path.with_suffix(".json").read_text())
+    band = np.load(path, mmap_mode="r")
+    if band.ndim != 2:
+        raise RasterFormatError("expected a 2-D grid")
+    return GeoRaster(band, tuple(meta["transform"]), meta.get("nodata"))
+
+
+def load_raster(path: str | Path) -> GeoRaster:
+    """Open a GEBCO grid as a GeoTIFF or as ``.npy`` with a ``.json`` sidecar."""
+    path = Path(path)
+    if path.suffix.lower() == ".npy":
+        raster = _load_npy(path)
+    elif path.suffix.lower() in (".tif", ".tiff"):
+        raster = _load_geotiff(path)
+    else:
+        raise RasterFormatError(f"unsupported raster format: {path.suffix}")
+
+    logger.info(
+        "raster_loaded",
+        service="depth-service",
+        action="raster_load",
+        path=str(path),
+        shape=list(raster.shape),
+        transform=list(raster.transform),
+    )
+    return raster
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.services.tile_store import tile_etag
+
+TileKey = tuple[str, int, int, int]
+
+
+class TileLRUCache:
+    """Byte-budgeted LRU of encoded tiles keyed by (scheme, z, x, y).
+
+    Each entry keeps the tile's ETag so conditional requests can be answered
+    without touching the body. Only used from the event loop, so no locking.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[TileKey, tuple[bytes, str]] = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: TileKey) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def get_etag(self, key: TileKey) -> str | None:
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def put(self, key: TileKey, data: bytes, etag: str | None = None) -> None:
+        if len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size_bytes -= len(old[0])
+        self._entries[key] = (data, etag or tile_etag(data))
+        self.size_bytes += len(data)
+        while self.size_bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self.size_bytes -= len(evicted)
+            self.evictions += 1
+
+    def invalidate_scheme(self, scheme: str) -> None:
+        for key in [k for k in self._entries if k[0] == scheme]:
+            self.size_bytes -= len(self._entries.pop(key)[0])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+tile_memory_cache = TileLRUCache(settings.TILE_MEMORY_CACHE_MB * 1024 * 1024)
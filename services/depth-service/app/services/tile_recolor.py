@@ -1,78 +1,34 @@
 from io import BytesIO
 
+import numpy as np
 from PIL import Image
 
 from app.core.logging_config import get_logger
-from app.services.depth_colors import hex_to_rgb, get_color_ramp
+from app.services.depth_colors import get_color_ramp, set_color_ramp
+from app.services.depth_lut import estimate_depth, get_rgba_lut, lut_index
 
 logger = get_logger(__name__)
 
-_LAND_BG_RATIO_THRESHOLD = 0.7
 
-_DEPTH_RAMP = [
-    (80, 6000.0),
-    (200, 4000.0),
-    (350, 2500.0),
-    (400, 1500.0),
-    (500, 500.0),
-    (600, 200.0),
-    (650, 80.0),
-    (700, 30.0),
-    (800, 10.0),
-    (1000, 3.0),
-]
+def _recolor_array(rgba: np.ndarray, scheme: str = "navionics") -> np.ndarray:
+    out = get_rgba_lut(scheme)[lut_index(rgba)]
+    hidden = rgba[..., 3] == 0
+    out[hidden] = rgba[hidden]
+    return out
 
 
-def _estimate_depth_from_pixel(r: int, g: int, b: int) -> float | None:
-    bg_ratio = b / max(g, 1)
-    if bg_ratio < _LAND_BG_RATIO_THRESHOLD:
-        return None
-
-    if r >= 250 and g >= 250 and b >= 250:
-        return None
-
-    brightness = r + g + b
-
-    for i, (threshold, depth) in enumerate(_DEPTH_RAMP):
-        if brightness <= threshold:
-            if i == 0:
-                return depth
-            prev_threshold, prev_depth = _DEPTH_RAMP[i - 1]
-            ratio = (brightness - prev_threshold) / max(threshold - prev_threshold, 1)
-            return prev_depth + ratio * (depth - prev_depth)
-
-    return _DEPTH_RAMP[-1][1]
-
-
-def _depth_to_scheme_rgb(depth: float, scheme: str = "navionics") -> tuple[int, int, int]:
-    ramp = get_color_ramp(scheme)
-    for min_d, max_d, hex_color in ramp:
-        if min_d <= depth < max_d:
-            return hex_to_rgb(hex_color)
-    return hex_to_rgb(ramp[-1][2])
-
-
-def recolor_tile(raw_png: bytes, scheme: str = "navionics") -> bytes:
+def recolor_tile(raw_png: bytes, scheme: str = "navionics", ramp: list | None = None) -> bytes:
+    """``ramp`` is the caller's current ramp for ``scheme``; pool workers
+    adopt it when theirs is stale."""
+    if ramp is not None and ramp != get_color_ramp(scheme):
+        set_color_ramp(scheme, ramp)
     try:
         img = Image.open(BytesIO(raw_png)).convert("RGBA")
-        pixels = img.load()
-        w, h = img.size
-
-        for y in range(h):
-            for x in range(w):
-                r, g, b, a = pixels[x, y]
-                if a == 0:
-                    continue
-
-                depth = _estimate_depth_from_pixel(r, g, b)
-                if depth is None:
-                    pixels[x, y] = (0, 0, 0, 0)
-                else:
-                    nr, ng, nb = _depth_to_scheme_rgb(depth, scheme)
-                    pixels[x, y] = (nr, ng, nb, 180)
+        rgba = np.asarray(img, dtype=np.uint8)
+        recolored = Image.fromarray(_recolor_array(rgba, scheme))
 
         output = BytesIO()
-        img.save(output, format="PNG", optimize=True)
+        recolored.save(output, format="PNG", optimize=True)
         result = output.getvalue()
 
         logger.info(
@@ -92,3 +48,33 @@ def recolor_tile(raw_png: bytes, scheme: str = "navionics") -> bytes:
             error=str(e),
         )
         return raw_png
+
+
+def estimate_depth_from_image(image_bytes: bytes) -> float | None:
+    try:
+        img = Image.open(BytesIO(image_bytes))
+        cx, cy = img.size[0] // 2, img.size[1] // 2
+        pixel = img.getpixel((cx, cy))
+
+        if len(pixel) >= 4 and pixel[3] == 0:
+            return None
+
+        r, g, b = pixel[0], pixel[1], pixel[2]
+        depth = estimate_depth(r, g, b)
+        logger.info(
+            "depth_pixel_analyzed",
+            service="depth-service",
+            action="depth_pixel_analysis",
+            r=r,
+            g=g,
+            b=b,
+            estimated_depth=depth,
+        )
+        return depth
+    except Exception as e:
+        logger.warning(
+            "depth_image_parse_error",
+            service="depth-service",
+            error=str(e),
+        )
+        return None
@@ -0,0 +1,240 @@
+import hashlib
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+TileRecord = tuple[int, int, int, bytes]
+
+# Layers under this prefix hold Mapbox Vector Tiles instead of PNGs.
+VECTOR_LAYER_PREFIX = "vt-"
+
+
+def tile_format(layer: str) -> str:
+    return "pbf" if layer.startswith(VECTOR_LAYER_PREFIX) else "png"
+
+
+def tile_etag(data: bytes) -> str:
+    return '"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"'
+
+
+class TileStore:
+    """Persistent tile storage addressed by (layer, z, x, y).
+
+    A layer is either the raw upstream tileset or one color scheme.
+    """
+
+    backend = "base"
+
+    def get(self, layer: str, z: int, x: int, y: int) -> bytes | None:
+        raise NotImplementedError
+
+    def get_etag(self, layer: str, z: int, x: int, y: int) -> str | None:
+        """ETag saved with the tile, readable without loading the tile body."""
+        raise NotImplementedError
+
+    def put(self, layer: str, z: int, x: int, y: int, data: bytes) -> None:
+        self.put_many(layer, [(z, x, y, data)])
+
+    def put_many(self, layer: str, tiles: Iterable[TileRecord]) -> int:
+        raise NotImplementedError
+
+    def delete_layer(self, layer: str) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class FileTileStore(TileStore):
+    """Loose ``<root>/<layer>/z/x/y.<ext>`` files with a ``y.<ext>.etag`` sidecar.
+
+    The extension is ``png`` for raster layers and ``pbf`` for vector ones.
+    """
+
+    backend = "files"
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def _path(self, layer: str, z: int, x: int, y: int) -> Path:
+        return self.root / layer / f"{z}" / f"{x}" / f"{y}.{tile_format(layer)}"
+
+    def get(self, layer: str, z: int, x: int, y: int) -> bytes | None:
+        try:
+            return self._path(layer, z, x, y).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def get_etag(self, layer: str, z: int, x: int, y: int) -> str | None:
+        try:
+            path = self._path(layer, z, x, y)
+            return path.with_name(path.name + ".etag").read_text()
+        except FileNotFoundError:
+            return None
+
+    def put_many(self, layer: str, tiles: Iterable[TileRecord]) -> int:
+        count = 0
+        for z, x, y, data in tiles:
+            path = self._path(layer, z, x, y)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            path.with_name(path.name + ".etag").write_text(tile_etag(data))
+            count += 1
+        return count
+
+    def delete_layer(self, layer: str) -> None:
+        shutil.rmtree(self.root / layer, ignore_errors=True)
+
+
+class MBTilesTileStore(TileStore):
+    """One MBTiles (SQLite) file per layer: ``<root>/<layer>.mbtiles``.
+
+    Rows follow the MBTiles spec, so ``tile_row`` is stored TMS-flipped.
+    Connections are opened per thread in WAL mode, which lets tile reads
+    run concurrently with the single writer.
+    """
+
+    backend = "mbtiles"
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)",
+        "CREATE TABLE IF NOT EXISTS tiles ("
+        " zoom_level INTEGER NOT NULL,"
+        " tile_column INTEGER NOT NULL,"
+        " tile_row INTEGER NOT NULL,"
+        " tile_data BLOB NOT NULL,"
+        " etag TEXT,"
+        " PRIMARY KEY (zoom_level, tile_column, tile_row)"
+        ") WITHOUT ROWID",
+    )
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized: set[str] = set()
+        self._connections: list[sqlite3.Connection] = []
+
+    def _db_path(self, layer: str) -> Path:
+        return self.root / f"{layer}.mbtiles"
+
+    def _connect(self, layer: str) -> sqlite3.Connection:
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn = conns.get(layer)
+        if conn is not None:
+            return conn
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self._db_path(layer), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._init_lock:
+            if layer not in self._initialized:
+                with conn:
+                    for statement in self._SCHEMA:
+                        conn.execute(statement)
+                    columns = {row[1] for row in conn.execute("PRAGMA table_info(tiles)")}
+                    if "etag" not in columns:
+                        conn.execute("ALTER TABLE tiles ADD COLUMN etag TEXT")
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO metadata (name, value) VALUES (?, ?)",
+                        [("name", layer), ("format", tile_format(layer)), ("type", "overlay")],
+                    )
+                self._initialized.add(layer)
+            self._connections.append(conn)
+        conns[layer] = conn
+        return conn
+
+    def get(self, layer: str, z: int, x: int, y: int) -> bytes | None:
+        row = self._connect(layer).execute(
+            "SELECT tile_data FROM tiles"
+            " WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (z, x, _tms_row(z, y)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_etag(self, layer: str, z: int, x: int, y: int) -> str | None:
+        row = self._connect(layer).execute(
+            "SELECT etag FROM tiles"
+            " WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (z, x, _tms_row(z, y)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, layer: str, tiles: Iterable[TileRecord]) -> int:
+        rows = [(z, x, _tms_row(z, y), data, tile_etag(data)) for z, x, y, data in tiles]
+        if not rows:
+            return 0
+        conn = self._connect(layer)
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO tiles"
+                " (zoom_level, tile_column, tile_row, tile_data, etag)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def delete_layer(self, layer: str) -> None:
+        if not self._db_path(layer).exists():
+            return
+        conn = self._connect(layer)
+        with conn:
+            conn.execute("DELETE FROM tiles")
+
+    def close(self) -> None:
+        with self._init_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def _tms_row(z: int, y: int) -> int:
+    return (1 << z) - 1 - y
+
+
+_store: TileStore | None = None
+
+
+def create_tile_store(backend: str | None = None) -> TileStore:
+    backend = backend or settings.TILE_STORE_BACKEND
+    if backend == "mbtiles":
+        return MBTilesTileStore(settings.TILE_MBTILES_DIR or settings.TILE_CACHE_DIR)
+    if backend != "files":
+        logger.warning(
+            "tile_store_unknown_backend",
+            service="depth-service",
+            action="tile_store_init",
+            backend=backend,
+        )
+    return FileTileStore(settings.TILE_CACHE_DIR)
+
+
+def get_tile_store() -> TileStore:
+    global _store
+    if _store is None:
+        _store = create_tile_store()
+        logger.info(
+            "tile_store_init",
+            service="depth-service",
+            action="tile_store_init",
+            backend=_store.backend,
+        )
+    return _store
+
+
+def close_tile_store() -> None:
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
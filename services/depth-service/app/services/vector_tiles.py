@@ -0,0 +1,416 @@
+"""Mapbox Vector Tiles for the depth areas and labels layers.
+
+Polygons are projected into tile space, quantized to the MVT extent,
+simplified with a fixed tolerance in tile units (so detail tracks the
+zoom level), clipped to the tile plus a small buffer and encoded. Tiles
+are cached through the same memory LRU and TileStore as raster tiles,
+under one ``vt-<scheme>`` layer per color scheme.
+
+At low zoom one tile spans most of the country, so the queries skip bodies
+smaller than a screen pixel at that zoom and return at most
+VECTOR_TILE_MAX_FEATURES rows each, largest first.
+"""
+
+import asyncio
+import math
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.core.logging_config import get_logger
+from app.core.single_flight import SingleFlight
+from app.services.coord_codec import rings_from_row
+from app.services.depth_colors import (
+    COLOR_SCHEMES,
+    depth_category_label,
+    depth_to_color,
+    on_ramps_changed,
+)
+from app.services.mvt_encoder import LayerBuilder, encode_tile, ring_area
+from app.services.polygon_simplify import level_for_bbox, simplify_ring
+from app.services.tile_memory_cache import tile_memory_cache
+from app.services.tile_store import VECTOR_LAYER_PREFIX, get_tile_store, tile_etag
+
+logger = get_logger(__name__)
+
+EXTENT = 4096
+_BUFFER = 64
+# Douglas-Peucker tolerance in tile units: a quarter of a screen pixel on a 256px tile.
+_SIMPLIFY_TOLERANCE = 4.0
+# Drop rings smaller than one screen pixel (16x16 tile units), doubled like ring_area.
+_MIN_RING_AREA2 = 2 * 16 * 16
+_MIN_ZOOM_FOR_LABELS = 7
+_EARTH_CIRCUMFERENCE_KM = 40075.016686
+
+AREAS_LAYER = "depth_areas"
+LABELS_LAYER = "depth_labels"
+
+
+def vector_layer(scheme: str) -> str:
+    return f"{VECTOR_LAYER_PREFIX}{scheme}"
+
+
+def _tile_bounds(z: int, x: int, y: int, buffer: float = 0.0) -> tuple[float, float, float, float]:
+    n = 2 ** z
+    pad = buffer / EXTENT
+
+    def lon(tx):
+        return tx / n * 360.0 - 180.0
+
+    def lat(ty):
+        ty = min(max(ty, 0.0), float(n))
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return lon(x - pad), lat(y + 1 + pad), lon(x + 1 + pad), lat(y - pad)
+
+
+def _project(lonlat: np.ndarray, z: int, x: int, y: int) -> np.ndarray:
+    """Lon/lat pairs to float tile coordinates (0..EXTENT inside the tile, y down)."""
+    n = 2 ** z
+    lon = lonlat[:, 0]
+    lat = np.radians(np.clip(lonlat[:, 1], -85.05112878, 85.05112878))
+    px = ((lon + 180.0) / 360.0 * n - x) * EXTENT
+    py = ((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * n - y) * EXTENT
+    return np.column_stack((px, py))
+
+
+def _dedupe(points: np.ndarray) -> np.ndarray:
+    if len(points) < 2:
+        return points
+    keep = np.any(points[1:] != points[:-1], axis=1)
+    points = points[np.concatenate(([True], keep))]
+    if len(points) > 1 and (points[0] == points[-1]).all():
+        points = points[:-1]
+    return points
+
+
+def _clip_ring(ring: list[tuple[float, float]], lo: float, hi: float) -> list[tuple[float, float]]:
+    """Sutherland-Hodgman against the square [lo, hi] x [lo, hi]."""
+    edges = (
+        (lambda p: p[0] >= lo, lambda p, q: (lo, p[1] + (q[1] - p[1]) * (lo - p[0]) / (q[0] - p[0]))),
+        (lambda p: p[0] <= hi, lambda p, q: (hi, p[1] + (q[1] - p[1]) * (hi - p[0]) / (q[0] - p[0]))),
+        (lambda p: p[1] >= lo, lambda p, q: (p[0] + (q[0] - p[0]) * (lo - p[1]) / (q[1] - p[1]), lo)),
+        (lambda p: p[1] <= hi, lambda p, q: (p[0] + (q[0] - p[0]) * (hi - p[1]) / (q[1] - p[1]), hi)),
+    )
+    for inside, intersect in edges:
+        if not ring:
+            break
+        clipped = []
+        prev = ring[-1]
+        for cur in ring:
+            if inside(cur):
+                if not inside(prev):
+                    clipped.append(intersect(prev, cur))
+                clipped.append(cur)
+            elif inside(prev):
+                clipped.append(intersect(prev, cur))
+            prev = cur
+        ring = clipped
+    return ring
+
+
+def _prepare_ring(lonlat, z: int, x: int, y: int) -> list[tuple[int, int]] | None:
+    points = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+    points = _dedupe(np.rint(_project(points, z, x, y)))
+    if len(points) < 3:
+        return None
+    points = simplify_ring(points, _SIMPLIFY_TOLERANCE)
+    clipped = _clip_ring([tuple(p) for p in points.tolist()], -_BUFFER, EXTENT + _BUFFER)
+    if len(clipped) < 3:
+        return None
+    ring = _dedupe(np.rint(np.asarray(clipped)))
+    if len(ring) < 3:
+        return None
+    ring = [(int(px), int(py)) for px, py in ring.tolist()]
+    if abs(ring_area(ring)) < _MIN_RING_AREA2:
+        return None
+    return ring
+
+
+def _ring_contains(ring: list[tuple[int, int]], point: tuple[int, int]) -> bool:
+    px, py = point
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        if (y1 > py) != (y2 > py) and px < x1 + (py - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def _group_rings(rings: list[list[tuple[int, int]]]) -> list[list[list[tuple[int, int]]]]:
+    """Split rings into polygon parts with the same even-odd rule as the polygon index.
+
+    A ring whose first vertex lies inside an odd number of earlier rings is
+    a hole of the latest exterior containing it; anything else starts a part.
+    """
+    parts: list[list[list[tuple[int, int]]]] = []
+    for i, ring in enumerate(rings):
+        depth = sum(_ring_contains(prev, ring[0]) for prev in rings[:i])
+        owner = None
+        if depth % 2 == 1:
+            owner = next((p for p in reversed(parts) if _ring_contains(p[0], ring[0])), None)
+        if owner is None:
+            parts.append([ring])
+        else:
+            owner.append(ring)
+    return parts
+
+
+def _area_properties(row, scheme: str, fallback_bbox: bool = False) -> dict:
+    depth = row.max_depth if row.max_depth is not None else row.avg_depth
+    return {
+        "name": row.name,
+        "water_type": row.water_type,
+        "max_depth": row.max_depth,
+        "avg_depth": row.avg_depth,
+        "depth": depth,
+        "color": depth_to_color(depth, scheme) if depth else "#888888",
+        "category": depth_category_label(depth) if depth else None,
+        "region": row.region,
+        "fallback_bbox": True if fallback_bbox else None,
+    }
+
+
+def _build_tile(z: int, x: int, y: int, scheme: str, polygon_rows, bbox_rows) -> bytes:
+    areas = LayerBuilder(AREAS_LAYER, EXTENT)
+    labels = LayerBuilder(LABELS_LAYER, EXTENT)
+    seen_names = set()
+    label_candidates = []
+
+    for row in polygon_rows:
+        seen_names.add(row.name)
+        label_candidates.append(row)
+        rings = rings_from_row(row).rings()
+        prepared = [r for r in (_prepare_ring(ring, z, x, y) for ring in rings if len(ring) >= 3) if r]
+        if prepared:
+            areas.add_polygon(_group_rings(prepared), _area_properties(row, scheme), len(areas) + 1)
+
+    for row in bbox_rows:
+        if row.name in seen_names:
+            continue
+        seen_names.add(row.name)
+        label_candidates.append(row)
+        ring = _prepare_ring(
+            [
+                [row.lon_min, row.lat_min],
+                [row.lon_max, row.lat_min],
+                [row.lon_max, row.lat_max],
+                [row.lon_min, row.lat_max],
+            ],
+            z, x, y,
+        )
+        if ring:
+            areas.add_polygon([[ring]], _area_properties(row, scheme, fallback_bbox=True), len(areas) + 1)
+
+    if z >= _MIN_ZOOM_FOR_LABELS:
+        for row in label_candidates:
+            depth = row.max_depth if row.max_depth is not None else row.avg_depth
+            if depth is None:
+                continue
+            px, py = np.rint(_project(np.array([[row.centroid_lon, row.centroid_lat]]), z, x, y))[0]
+            if not (0 <= px < EXTENT and 0 <= py < EXTENT):
+                continue
+            labels.add_point(
+                (int(px), int(py)),
+                {
+                    "name": row.name,
+                    "depth": depth,
+                    "label": f"{depth:g}м",
+                    "water_type": row.water_type,
+                },
+                len(labels) + 1,
+            )
+
+    return encode_tile([areas, labels])
+
+
+def _min_area_km2(z: int, lat: float) -> float:
+    """Area of one screen pixel at this zoom and latitude; smaller bodies can't show."""
+    pixel_km = _EARTH_CIRCUMFERENCE_KM * math.cos(math.radians(lat)) / (256 * 2 ** z)
+    return pixel_km * pixel_km
+
+
+async def _query_rows(z: int, x: int, y: int):
+    lon_min, lat_min, lon_max, lat_max = _tile_bounds(z, x, y, _BUFFER)
+    # Pixels are largest at the tile edge nearest the equator.
+    widest_lat = 0.0 if lat_min <= 0.0 <= lat_max else min(abs(lat_min), abs(lat_max))
+    params = {
+        "min_lat": lat_min,
+        "min_lon": lon_min,
+        "max_lat": lat_max,
+        "max_lon": lon_max,
+        "min_area": _min_area_km2(z, widest_lat),
+        "limit": settings.VECTOR_TILE_MAX_FEATURES,
+    }
+    # The pyramid level must stay below the tile-space tolerance, not just a pixel.
+    level = level_for_bbox(lat_min, lon_min, lat_max, lon_max, pixels=EXTENT // int(_SIMPLIFY_TOLERANCE))
+    async with async_session() as session:
+        polygons = await session.execute(
+            text(
+                """
+                SELECT p.name, p.water_type,
+                       CASE WHEN l.polygon_id IS NULL THEN p.coordinates_bin
+                            ELSE l.coordinates_bin END AS coordinates_bin,
+                       CASE WHEN l.polygon_id IS NULL THEN p.coordinates
+                            ELSE l.coordinates END AS coordinates,
+                       p.max_depth, p.avg_depth, p.centroid_lat, p.centroid_lon,
+                       p.area_km2, p.region
+                FROM water_body_polygons p
+                LEFT JOIN water_body_polygon_levels l
+                       ON l.polygon_id = p.id AND l.level = :level
+                WHERE box(point(p.lon_min, p.lat_min), point(p.lon_max, p.lat_max))
+                      && box(point(:min_lon, :min_lat), point(:max_lon, :max_lat))
+                  AND (p.area_km2 IS NULL OR p.area_km2 >= :min_area)
+                ORDER BY p.area_km2 DESC NULLS LAST
+                LIMIT :limit
+                """
+            ),
+            {**params, "level": level},
+        )
+        polygon_rows = polygons.fetchall()
+        bboxes = await session.execute(
+            text(
+                """
+                SELECT name, water_type, lat_min, lat_max, lon_min, lon_max,
+                       centroid_lat, centroid_lon, max_depth, avg_depth, area_km2, region
+                FROM ru_water_bodies
+                WHERE box(point(lon_min, lat_min), point(lon_max, lat_max))
+                      && box(point(:min_lon, :min_lat), point(:max_lon, :max_lat))
+                  AND (area_km2 IS NULL OR area_km2 >= :min_area)
+                ORDER BY area_km2 DESC NULLS LAST
+                LIMIT :limit
+                """
+            ),
+            params,
+        )
+        bbox_rows = bboxes.fetchall()
+    return polygon_rows, bbox_rows
+
+
+async def fetch_vector_tile(z: int, x: int, y: int, scheme: str = "navionics") -> tuple[bytes, str] | None:
+    """Encoded MVT for the tile and its ETag, or None if it could not be built.
+
+    An empty tile is a valid (cacheable) result and comes back as b"". The
+    ETag comes from wherever the tile did, so serving it never re-hashes it.
+    """
+    layer = vector_layer(scheme)
+    memory_key = (layer, z, x, y)
+    cached = tile_memory_cache.get(memory_key)
+    if cached is not None:
+        return cached, tile_memory_cache.get_etag(memory_key)
+
+    stored = await _read_vector_tile(z, x, y, scheme)
+    if stored is not None:
+        tile_memory_cache.put(memory_key, *stored)
+        return stored
+
+    return await _vt_flight.do(f"{layer}/{z}/{x}/{y}", _render_vector_tile, z, x, y, scheme)
+
+
+def _read_stored_vector_tile(layer: str, z: int, x: int, y: int) -> tuple[bytes, str] | None:
+    store = get_tile_store()
+    data = store.get(layer, z, x, y)
+    if data is None:
+        return None
+    # Tiles written before ETags were stored have none on disk.
+    return data, store.get_etag(layer, z, x, y) or tile_etag(data)
+
+
+async def _read_vector_tile(z: int, x: int, y: int, scheme: str) -> tuple[bytes, str] | None:
+    return await asyncio.to_thread(_read_stored_vector_tile, vector_layer(scheme), z, x, y)
+
+
+async def _render_vector_tile(z: int, x: int, y: int, scheme: str) -> tuple[bytes, str] | None:
+    try:
+        polygon_rows, bbox_rows = await _query_rows(z, x, y)
+    except Exception as e:
+        logger.error(
+            "vector_tile_query_error",
+            service="depth-service",
+            action="vector_tile",
+            z=z,
+            x=x,
+            y=y,
+            error=str(e),
+        )
+        return None
+
+    tile = await asyncio.to_thread(_build_tile, z, x, y, scheme, polygon_rows, bbox_rows)
+    etag = tile_etag(tile)
+    layer = vector_layer(scheme)
+    try:
+        await asyncio.to_thread(get_tile_store().put, layer, z, x, y, tile)
+    except Exception as e:
+        logger.warning(
+            "vector_tile_cache_write_error",
+            service="depth-service",
+            action="vector_tile",
+            error=str(e),
+        )
+    tile_memory_cache.put((layer, z, x, y), tile, etag)
+
+    logger.info(
+        "vector_tile_rendered",
+        service="depth-service",
+        action="vector_tile",
+        z=z,
+        x=x,
+        y=y,
+        polygons=len(polygon_rows),
+        bboxes=len(bbox_rows),
+        size=len(tile),
+    )
+    return tile, etag
+
+
+_vt_flight = SingleFlight("vector_tile", recheck=_read_vector_tile)
+
+
+_purge_tasks: set[asyncio.Task] = set()
+
+
+def _delete_vector_layers(layers: list[str]) -> None:
+    store = get_tile_store()
+    for layer in layers:
+        try:
+            store.delete_layer(layer)
+        except Exception as e:
+            logger.warning(
+                "vector_tile_cache_purge_error",
+                service="depth-service",
+                action="vector_tile",
+                layer=layer,
+                error=str(e),
+            )
+            continue
+        logger.info(
+            "vector_tile_cache_purged",
+            service="depth-service",
+            action="vector_tile",
+            layer=layer,
+        )
+
+
+def purge_vector_tiles(scheme: str | None = None) -> None:
+    """Drop cached vector tiles for one scheme, or all of them after a data import.
+
+    The memory cache is dropped at once; the stored layers are deleted in a
+    worker thread when called on the event loop.
+    """
+    layers = [vector_layer(name) for name in ([scheme] if scheme else COLOR_SCHEMES)]
+    for layer in layers:
+        tile_memory_cache.invalidate_scheme(layer)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Not on the event loop (scripts, worker threads): nothing to block.
+        _delete_vector_layers(layers)
+        return
+    # Deleting a layer walks a directory tree or rewrites an MBTiles file.
+    task = loop.create_task(asyncio.to_thread(_delete_vector_layers, layers))
+    _purge_tasks.add(task)
+    task.add_done_callback(_purge_tasks.discard)
+
+
+on_ramps_changed(purge_vector_tiles)
@@ -0,0 +1,90 @@
+"""Decode + serialize cost of polygon coordinates: JSONB text vs packed bytea.
+
+Simulates what /areas does per request for a page of polygons:
+
+* json:   json.loads on the JSONB text, then FastAPI's jsonable_encoder + json.dumps
+* packed: decode_rings on the bytea, then the splicing GeoJSON writer
+
+Run from the service root:
+
+    python -m benchmarks.bench_polygon_codec --polygons 200 --points 2000
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from app.services.coord_codec import decode_rings, encode_rings
+from app.services.geojson_writer import encode_feature_collection
+
+
+def _synthetic_rings(points: int, rng: random.Random) -> list:
+    lon, lat, r = rng.uniform(30, 60), rng.uniform(50, 65), rng.uniform(0.05, 0.5)
+    ring = []
+    for i in range(points):
+        t = 2 * math.pi * i / points
+        wobble = 1 + 0.1 * math.sin(17 * t) + rng.uniform(-0.01, 0.01)
+        ring.append([round(lon + r * wobble * math.cos(t), 7), round(lat + r * wobble * math.sin(t), 7)])
+    ring.append(ring[0])
+    return [ring]
+
+
+def _collection(coordinates: list) -> dict:
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": coords},
+                "properties": {"name": f"lake-{i}", "depth": 10.0, "color": "#1e88e5"},
+            }
+            for i, coords in enumerate(coordinates)
+        ],
+    }
+
+
+def _json_path(texts: list[str]) -> bytes:
+    collection = _collection([json.loads(t) for t in texts])
+    return json.dumps(
+        jsonable_encoder(collection), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _packed_path(blobs: list[bytes]) -> bytes:
+    return encode_feature_collection(_collection([decode_rings(b) for b in blobs]))
+
+
+def _time(fn, arg, repeat: int) -> float:
+    fn(arg)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(polygons: int, points: int, repeat: int, seed: int) -> None:
+    rng = random.Random(seed)
+    rings = [_synthetic_rings(points, rng) for _ in range(polygons)]
+    texts = [json.dumps(r) for r in rings]
+    blobs = [encode_rings(r) for r in rings]
+
+    json_ms = _time(_json_path, texts, repeat)
+    packed_ms = _time(_packed_path, blobs, repeat)
+
+    print(f"polygons={polygons} points/polygon={points}")
+    print(f"stored size  json: {sum(map(len, texts)) / 1024:8.1f} KiB   packed: {sum(map(len, blobs)) / 1024:8.1f} KiB")
+    print(f"per request  json: {json_ms:8.2f} ms        packed: {packed_ms:8.2f} ms   ({json_ms / packed_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--polygons", type=int, default=200)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    main(args.polygons, args.points, args.repeat, args.seed)
@@ -0,0 +1,139 @@
+"""Bbox lookup latency with and without the migration 012 GiST index.
+
+Builds a throwaway table shaped like ru_water_bodies with synthetic
+bounding boxes scattered over Russia, then times point-in-bbox and
+bbox-overlap queries against it, first with only the original B-tree
+pairs, then with the GiST box index. Needs a reachable Postgres:
+
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_spatial_index --rows 100000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+
+_TABLE = "bench_water_bodies"
+
+_POINT_QUERY = f"""
+    SELECT name FROM {_TABLE}
+    WHERE box(point(lon_min, lat_min), point(lon_max, lat_max))
+          && box(point(:lon, :lat), point(:lon, :lat))
+    ORDER BY area_km2 DESC NULLS LAST
+    LIMIT 5
+"""
+
+_BBOX_QUERY = f"""
+    SELECT name FROM {_TABLE}
+    WHERE box(point(lon_min, lat_min), point(lon_max, lat_max))
+          && box(point(:min_lon, :min_lat), point(:max_lon, :max_lat))
+    ORDER BY area_km2 DESC NULLS LAST
+    LIMIT 200
+"""
+
+
+def _synthetic_rows(count: int, rng: random.Random) -> list[dict]:
+    rows = []
+    for i in range(count):
+        lat = rng.uniform(42.0, 70.0)
+        lon = rng.uniform(20.0, 180.0)
+        half = rng.expovariate(1 / 0.02)
+        rows.append({
+            "name": f"wb-{i}",
+            "lat_min": lat - half,
+            "lat_max": lat + half,
+            "lon_min": lon - half,
+            "lon_max": lon + half,
+            "area_km2": (2 * half * 111.0) ** 2,
+        })
+    return rows
+
+
+async def _time_queries(conn, query: str, params: list[dict]) -> float:
+    start = time.perf_counter()
+    for p in params:
+        await conn.execute(text(query), p)
+    return (time.perf_counter() - start) / len(params) * 1000
+
+
+async def main(rows: int, queries: int, seed: int) -> None:
+    rng = random.Random(seed)
+    engine = create_async_engine(settings.DATABASE_URL)
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {_TABLE}"))
+        await conn.execute(text(
+            f"""
+            CREATE TABLE {_TABLE} (
+                id SERIAL PRIMARY KEY,
+                name VARCHAR(500) NOT NULL,
+                lat_min FLOAT NOT NULL, lat_max FLOAT NOT NULL,
+                lon_min FLOAT NOT NULL, lon_max FLOAT NOT NULL,
+                area_km2 FLOAT
+            )
+            """
+        ))
+        await conn.execute(
+            text(
+                f"INSERT INTO {_TABLE} (name, lat_min, lat_max, lon_min, lon_max, area_km2) "
+                "VALUES (:name, :lat_min, :lat_max, :lon_min, :lon_max, :area_km2)"
+            ),
+            _synthetic_rows(rows, rng),
+        )
+        await conn.execute(text(f"CREATE INDEX ON {_TABLE} (lat_min, lat_max)"))
+        await conn.execute(text(f"CREATE INDEX ON {_TABLE} (lon_min, lon_max)"))
+        await conn.execute(text(f"ANALYZE {_TABLE}"))
+
+    point_params = [
+        {"lat": rng.uniform(42.0, 70.0), "lon": rng.uniform(20.0, 180.0)}
+        for _ in range(queries)
+    ]
+    bbox_params = []
+    for p in point_params:
+        bbox_params.append({
+            "min_lat": p["lat"] - 0.25, "max_lat": p["lat"] + 0.25,
+            "min_lon": p["lon"] - 0.5, "max_lon": p["lon"] + 0.5,
+        })
+
+    try:
+        async with engine.connect() as conn:
+            btree_point = await _time_queries(conn, _POINT_QUERY, point_params)
+            btree_bbox = await _time_queries(conn, _BBOX_QUERY, bbox_params)
+
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                f"CREATE INDEX ON {_TABLE} "
+                "USING GIST (box(point(lon_min, lat_min), point(lon_max, lat_max)))"
+            ))
+            await conn.execute(text(f"ANALYZE {_TABLE}"))
+
+        async with engine.connect() as conn:
+            gist_point = await _time_queries(conn, _POINT_QUERY, point_params)
+            gist_bbox = await _time_queries(conn, _BBOX_QUERY, bbox_params)
+            plan = await conn.execute(text("EXPLAIN " + _POINT_QUERY), point_params[0])
+            plan_lines = [row[0] for row in plan]
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {_TABLE}"))
+        await engine.dispose()
+
+    print(f"rows={rows} queries={queries}")
+    print(f"point  btree-only: {btree_point:8.3f} ms/query   gist: {gist_point:8.3f} ms/query")
+    print(f"bbox   btree-only: {btree_bbox:8.3f} ms/query   gist: {gist_bbox:8.3f} ms/query")
+    print("point query plan with gist:")
+    for line in plan_lines:
+        print("  " + line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.queries, args.seed))
@@ -0,0 +1,90 @@
+"""Tiles/sec for the per-pixel and the LUT-based recolor paths.
+
+Run from the service root:
+
+    python -m benchmarks.bench_tile_recolor --tiles 20
+"""
+
+import argparse
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from app.services.depth_lut import _interpolate_depth, _scheme_rgb, is_land_pixel
+from app.services.tile_recolor import recolor_tile
+
+
+def recolor_tile_per_pixel(raw_png: bytes, scheme: str = "navionics") -> bytes:
+    img = Image.open(BytesIO(raw_png)).convert("RGBA")
+    pixels = img.load()
+    w, h = img.size
+
+    for y in range(h):
+        for x in range(w):
+            r, g, b, a = pixels[x, y]
+            if a == 0:
+                continue
+
+            if is_land_pixel(r, g, b):
+                pixels[x, y] = (0, 0, 0, 0)
+            else:
+                nr, ng, nb = _scheme_rgb(_interpolate_depth(r + g + b), scheme)
+                pixels[x, y] = (nr, ng, nb, 180)
+
+    output = BytesIO()
+    img.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def make_sample_tile(seed: int = 0, size: int = 256) -> bytes:
+    """Smooth GEBCO-like shading with a land patch and a transparent corner."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size]
+    angle = rng.uniform(0, 2 * np.pi)
+    shade = (np.cos(angle) * xx + np.sin(angle) * yy) / (size * 1.5) + 0.5
+
+    rgba = np.empty((size, size, 4), dtype=np.uint8)
+    rgba[..., 0] = np.clip(shade * 220, 0, 255)
+    rgba[..., 1] = np.clip(shade * 240 + 10, 0, 255)
+    rgba[..., 2] = np.clip(shade * 200 + 55, 0, 255)
+    rgba[..., 3] = 255
+
+    cx, cy = rng.integers(0, size, 2)
+    land = (xx - cx) ** 2 + (yy - cy) ** 2 < (size // 5) ** 2
+    rgba[land] = (110, 160, 90, 255)
+    rgba[: size // 8, : size // 8, 3] = 0
+
+    buf = BytesIO()
+    Image.fromarray(rgba).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _tiles_per_sec(fn, tiles: list[bytes], scheme: str) -> float:
+    start = time.perf_counter()
+    for tile in tiles:
+        fn(tile, scheme)
+    return len(tiles) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tiles", type=int, default=10)
+    parser.add_argument("--scheme", default="navionics")
+    args = parser.parse_args()
+
+    tiles = [make_sample_tile(seed) for seed in range(args.tiles)]
+
+    for tile in tiles:
+        if recolor_tile_per_pixel(tile, args.scheme) != recolor_tile(tile, args.scheme):
+            raise SystemExit("outputs differ between per-pixel and LUT paths")
+
+    old = _tiles_per_sec(recolor_tile_per_pixel, tiles, args.scheme)
+    new = _tiles_per_sec(recolor_tile, tiles, args.scheme)
+    print(f"per-pixel: {old:8.1f} tiles/sec")
+    print(f"lut:       {new:8.1f} tiles/sec  ({new / old:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
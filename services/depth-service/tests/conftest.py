@@ -0,0 +1,11 @@
+import pytest
+
+from app.core.circuit_breaker import reset_upstream_guards
+
+
+@pytest.fixture(autouse=True)
+def _fresh_upstream_guards():
+    # Breaker and rate-limit state is process-global; keep tests independent.
+    reset_upstream_guards()
+    yield
+    reset_upstream_guards()
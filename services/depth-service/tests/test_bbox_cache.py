@@ -0,0 +1,171 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services.bbox_cache import (
+    _MAX_GRID_SPAN,
+    cached_bbox_response,
+    grid_bounds,
+    grid_pixels,
+    grid_tiles,
+    invalidate_bbox_cache,
+    snap_bbox,
+)
+from app.services.depth_colors import ramp_version
+
+client = TestClient(app)
+
+_LADOGA = (60.70, 31.40, 60.90, 31.80)
+
+
+class TestSnapBbox:
+    @pytest.mark.parametrize(
+        "bbox",
+        [_LADOGA, (55.70, 37.60, 55.72, 37.63), (41.0, 20.0, 70.0, 180.0), (-90, -180, 90, 180)],
+    )
+    def test_snapped_bounds_cover_bbox(self, bbox):
+        z, x0, y0, x1, y1 = snap_bbox(*bbox)
+        min_lat, min_lon, max_lat, max_lon = grid_bounds(z, x0, y0, x1, y1)
+
+        assert x1 - x0 < _MAX_GRID_SPAN and y1 - y0 < _MAX_GRID_SPAN
+        assert min_lat <= bbox[0] and min_lon <= bbox[1]
+        assert max_lat >= bbox[2] and max_lon >= bbox[3]
+
+    def test_nearby_viewports_share_grid(self):
+        shifted = (60.705, 31.41, 60.905, 31.81)
+        assert snap_bbox(*_LADOGA) == snap_bbox(*shifted)
+
+    def test_zoom_tracks_bbox_size(self):
+        assert snap_bbox(55.70, 37.60, 55.72, 37.63)[0] > snap_bbox(*_LADOGA)[0]
+
+    def test_pixels_follow_widest_axis_of_range(self):
+        assert grid_pixels(4, 7, 4, 7) > 0
+        assert grid_pixels(4, 7, 6, 8) == 3 * grid_pixels(4, 7, 4, 7)
+
+    def test_tiles_count_whole_range(self):
+        assert grid_tiles(4, 7, 4, 7) == 1
+        assert grid_tiles(4, 7, 6, 8) == 6
+
+
+class TestCachedBboxResponse:
+    @pytest.mark.asyncio
+    async def test_hit_skips_build(self):
+        build = AsyncMock()
+        with patch("app.services.bbox_cache.cache_get_raw", new_callable=AsyncMock) as mock_get:
+            mock_get.side_effect = ["3", '{"cached":true}']
+            body = await cached_bbox_response("areas", "navionics", *_LADOGA, build)
+
+        assert body == '{"cached":true}'
+        build.assert_not_awaited()
+        assert mock_get.await_args_list[1].args[0].startswith("depth:areas:g3:navionics:")
+
+    @pytest.mark.asyncio
+    async def test_miss_builds_snapped_bounds_and_stores(self):
+        build = AsyncMock(return_value=('{"features":[1]}', False))
+        with patch("app.services.bbox_cache.cache_get_raw", new_callable=AsyncMock, return_value=None), \
+                patch("app.services.bbox_cache.cache_set_raw", new_callable=AsyncMock) as mock_set:
+            body = await cached_bbox_response("areas", "navionics", *_LADOGA, build)
+
+        assert body == '{"features":[1]}'
+        z, x0, y0, x1, y1 = snap_bbox(*_LADOGA)
+        assert build.await_args.args == (
+            *grid_bounds(z, x0, y0, x1, y1), grid_pixels(x0, y0, x1, y1), grid_tiles(x0, y0, x1, y1)
+        )
+        assert mock_set.await_args.kwargs["ttl"] == settings.BBOX_CACHE_TTL
+        assert ":g0:" in mock_set.await_args.args[0]
+
+    @pytest.mark.asyncio
+    async def test_empty_result_gets_short_ttl(self):
+        build = AsyncMock(return_value=('{"features":[]}', True))
+        with patch("app.services.bbox_cache.cache_get_raw", new_callable=AsyncMock, return_value=None), \
+                patch("app.services.bbox_cache.cache_set_raw", new_callable=AsyncMock) as mock_set:
+            await cached_bbox_response("labels", "z10", *_LADOGA, build)
+
+        assert mock_set.await_args.kwargs["ttl"] == settings.BBOX_CACHE_EMPTY_TTL
+
+    @pytest.mark.asyncio
+    async def test_failed_build_is_not_stored(self):
+        build = AsyncMock(side_effect=RuntimeError("connection lost"))
+        with patch("app.services.bbox_cache.cache_get_raw", new_callable=AsyncMock, return_value=None), \
+                patch("app.services.bbox_cache.cache_set_raw", new_callable=AsyncMock) as mock_set:
+            with pytest.raises(RuntimeError):
+                await cached_bbox_response("areas", "navionics", *_LADOGA, build)
+
+        mock_set.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_disabled_bypasses_redis(self):
+        build = AsyncMock(return_value=("{}", False))
+        with patch.object(settings, "BBOX_CACHE_ENABLED", False), \
+                patch("app.services.bbox_cache.cache_get_raw", new_callable=AsyncMock) as mock_get:
+            await cached_bbox_response("areas", "navionics", *_LADOGA, build)
+
+        mock_get.assert_not_awaited()
+        build.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_invalidate_bumps_generation(self):
+        with patch("app.services.bbox_cache.cache_incr", new_callable=AsyncMock, return_value=4) as mock_incr:
+            await invalidate_bbox_cache()
+        mock_incr.assert_awaited_once_with("depth:bbox:gen")
+
+
+class TestEndpointsUseCache:
+    @patch("app.api.v1.endpoints.areas.cached_bbox_response", new_callable=AsyncMock)
+    def test_areas_key_includes_ramp_version(self, mock_cached):
+        mock_cached.return_value = '{"type":"FeatureCollection","features":[]}'
+
+        response = client.get(
+            "/api/v1/depth/areas",
+            params={"minLat": 60.7, "minLon": 31.4, "maxLat": 60.9, "maxLon": 31.8, "scheme": "sport"},
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"type": "FeatureCollection", "features": []}
+        assert mock_cached.await_args.args[:2] == ("areas", f"sport.{ramp_version('sport')}")
+
+    @patch("app.api.v1.endpoints.labels.cached_bbox_response", new_callable=AsyncMock)
+    def test_labels_served_from_cache(self, mock_cached):
+        mock_cached.return_value = '{"type":"FeatureCollection","features":[]}'
+
+        response = client.get(
+            "/api/v1/depth/labels",
+            params={"minLat": 60.7, "minLon": 31.4, "maxLat": 60.9, "maxLon": 31.8, "zoom": 9},
+        )
+
+        assert response.status_code == 200
+        assert mock_cached.await_args.args[:2] == ("labels", "z9")
+
+    @patch("app.api.v1.endpoints.areas.get_depth_areas", new_callable=AsyncMock)
+    def test_areas_build_simplifies_for_snapped_range(self, mock_areas):
+        mock_areas.return_value = {"type": "FeatureCollection", "features": []}
+        with patch.object(settings, "BBOX_CACHE_ENABLED", False):
+            response = client.get(
+                "/api/v1/depth/areas",
+                params={"minLat": 60.7, "minLon": 31.4, "maxLat": 60.9, "maxLon": 31.8},
+            )
+
+        assert response.status_code == 200
+        z, x0, y0, x1, y1 = snap_bbox(*_LADOGA)
+        assert mock_areas.await_args.args[:4] == grid_bounds(z, x0, y0, x1, y1)
+        assert mock_areas.await_args.kwargs == {
+            "limit": settings.DEPTH_AREAS_MAX_FEATURES * grid_tiles(x0, y0, x1, y1),
+            "pixels": grid_pixels(x0, y0, x1, y1),
+        }
+
+    @patch("app.api.v1.endpoints.areas.get_depth_areas", new_callable=AsyncMock)
+    def test_areas_db_error_answers_empty_uncached(self, mock_areas):
+        mock_areas.side_effect = RuntimeError("connection lost")
+        with patch("app.services.bbox_cache.cache_get_raw", new_callable=AsyncMock, return_value=None), \
+                patch("app.services.bbox_cache.cache_set_raw", new_callable=AsyncMock) as mock_set:
+            response = client.get(
+                "/api/v1/depth/areas",
+                params={"minLat": 60.7, "minLon": 31.4, "maxLat": 60.9, "maxLon": 31.8},
+            )
+
+        assert response.status_code == 200
+        assert response.json() == {"type": "FeatureCollection", "features": []}
+        mock_set.assert_not_awaited()
@@ -0,0 +1,344 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    UpstreamGuard,
+    get_upstream_guard,
+    parse_retry_after,
+)
+from app.core.upstream_errors import track_upstream_errors
+from app.main import app
+from app.services import depth_reader, osm_overpass_client
+
+
+class _Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+def _guard(clock, **kwargs):
+    return UpstreamGuard("test", rate_per_sec=kwargs.pop("rate", 100.0), burst=kwargs.pop("burst", 10),
+                         failure_threshold=3, open_sec=30.0, clock=clock, **kwargs)
+
+
+@pytest.fixture
+def no_redis():
+    with patch("app.core.circuit_breaker.get_redis", new_callable=AsyncMock, return_value=None):
+        yield
+
+
+@pytest.mark.usefixtures("no_redis")
+class TestBreakerStates:
+    @pytest.mark.asyncio
+    async def test_opens_after_consecutive_failures(self):
+        guard = _guard(_Clock())
+        for _ in range(3):
+            assert await guard.allow()
+            await guard.record_failure()
+
+        assert guard.state == OPEN
+        assert not await guard.allow()
+
+    @pytest.mark.asyncio
+    async def test_success_resets_failure_count(self):
+        guard = _guard(_Clock())
+        await guard.record_failure()
+        await guard.record_failure()
+        await guard.record_success()
+        await guard.record_failure()
+
+        assert guard.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_half_open_allows_single_probe(self):
+        clock = _Clock()
+        guard = _guard(clock)
+        for _ in range(3):
+            await guard.record_failure()
+
+        clock.now += 31
+        assert await guard.allow()
+        assert guard.state == HALF_OPEN
+        assert not await guard.allow()
+
+        await guard.record_success()
+        assert guard.state == CLOSED
+        assert await guard.allow()
+
+    @pytest.mark.asyncio
+    async def test_failed_probe_reopens(self):
+        clock = _Clock()
+        guard = _guard(clock)
+        for _ in range(3):
+            await guard.record_failure()
+
+        clock.now += 31
+        assert await guard.allow()
+        await guard.record_failure()
+
+        assert guard.state == OPEN
+        assert not await guard.allow()
+
+    @pytest.mark.asyncio
+    async def test_abandoned_probe_expires(self):
+        clock = _Clock()
+        guard = _guard(clock)
+        for _ in range(3):
+            await guard.record_failure()
+
+        clock.now += 31
+        assert await guard.allow()
+        clock.now += 31
+        assert await guard.allow()
+
+
+@pytest.mark.usefixtures("no_redis")
+class TestAdaptiveRate:
+    @pytest.mark.asyncio
+    async def test_bucket_limits_burst_then_refills(self):
+        clock = _Clock()
+        guard = _guard(clock, rate=2.0, burst=2)
+
+        assert await guard.allow()
+        assert await guard.allow()
+        assert not await guard.allow()
+
+        clock.now += 0.5
+        assert await guard.allow()
+
+    @pytest.mark.asyncio
+    async def test_token_wait_reports_time_to_next_token(self):
+        clock = _Clock()
+        guard = _guard(clock, rate=2.0, burst=1)
+
+        assert guard.token_wait() == 0.0
+        assert await guard.allow()
+        assert not await guard.allow()
+        assert guard.token_wait() == pytest.approx(0.5)
+
+        clock.now += 0.2
+        assert guard.token_wait() == pytest.approx(0.3)
+
+    @pytest.mark.asyncio
+    async def test_token_wait_is_none_when_open(self):
+        guard = _guard(_Clock())
+        for _ in range(3):
+            await guard.record_failure()
+
+        assert guard.token_wait() is None
+
+    @pytest.mark.asyncio
+    async def test_429_halves_rate_and_empties_bucket(self):
+        guard = _guard(_Clock(), rate=4.0, burst=4)
+        await guard.record_failure(rate_limited=True)
+
+        assert guard.rate == 2.0
+        assert not await guard.allow()
+        assert guard.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_retry_after_holds_bucket_without_opening(self):
+        clock = _Clock()
+        guard = _guard(clock)
+        await guard.record_failure(rate_limited=True, retry_after=1)
+
+        assert guard.state == CLOSED
+        assert guard.token_wait() == pytest.approx(1.0, abs=0.05)
+        assert not await guard.allow()
+        clock.now += 1.1
+        assert await guard.allow()
+
+    @pytest.mark.asyncio
+    async def test_threshold_open_lasts_at_least_retry_after(self):
+        clock = _Clock()
+        guard = _guard(clock)
+        for _ in range(3):
+            await guard.record_failure(rate_limited=True, retry_after=120)
+
+        assert guard.state == OPEN
+        clock.now += 60
+        assert not await guard.allow()
+
+    @pytest.mark.asyncio
+    async def test_success_recovers_rate(self):
+        guard = _guard(_Clock(), rate=4.0, burst=4)
+        await guard.record_failure(rate_limited=True)
+        for _ in range(100):
+            await guard.record_success()
+
+        assert guard.rate == 4.0
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after("30") == 30.0
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
+        assert parse_retry_after(None) is None
+
+
+class TestSharedState:
+    @pytest.mark.asyncio
+    async def test_open_breaker_propagates_to_other_worker(self):
+        redis = _FakeRedis()
+        clock = _Clock()
+        with patch("app.core.circuit_breaker.get_redis", new_callable=AsyncMock, return_value=redis):
+            tripped = _guard(clock)
+            other = _guard(clock)
+            for _ in range(3):
+                await tripped.record_failure()
+
+            clock.now += 2
+            assert not await other.allow()
+            assert other.state == OPEN
+
+    @pytest.mark.asyncio
+    async def test_retry_after_hold_propagates_to_other_worker(self):
+        redis = _FakeRedis()
+        clock = _Clock()
+        with patch("app.core.circuit_breaker.get_redis", new_callable=AsyncMock, return_value=redis):
+            limited = _guard(clock)
+            other = _guard(clock)
+            await limited.record_failure(rate_limited=True, retry_after=10)
+
+            clock.now += 2
+            assert not await other.allow()
+            assert other.state == CLOSED
+            clock.now += 9
+            assert await other.allow()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("raw", ["not json", '{"state": "open"}', "[1, 2]", '{"version": "x", "state": "open"}'])
+    async def test_corrupt_shared_state_keeps_local_state(self, raw):
+        redis = _FakeRedis()
+        redis.data["upstream:test:state"] = raw
+        with patch("app.core.circuit_breaker.get_redis", new_callable=AsyncMock, return_value=redis):
+            guard = _guard(_Clock())
+            assert await guard.allow()
+
+        assert guard.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_only_one_worker_probes(self):
+        redis = _FakeRedis()
+        clock = _Clock()
+        with patch("app.core.circuit_breaker.get_redis", new_callable=AsyncMock, return_value=redis):
+            first = _guard(clock)
+            second = _guard(clock)
+            for guard in (first, second):
+                for _ in range(3):
+                    await guard.record_failure()
+
+            clock.now += 31
+            assert await first.allow()
+            assert not await second.allow()
+
+            await first.record_success()
+            assert json.loads(redis.data["upstream:test:state"])["state"] == CLOSED
+
+
+@pytest.mark.usefixtures("no_redis")
+class TestOverpassFailFast:
+    @pytest.mark.asyncio
+    async def test_open_breaker_skips_http(self):
+        guard = get_upstream_guard("overpass")
+        for _ in range(guard.failure_threshold):
+            await guard.record_failure()
+
+        mock_client = AsyncMock()
+        with patch("app.services.osm_overpass_client.get_http_client", return_value=mock_client), \
+                track_upstream_errors() as failures:
+            result = await osm_overpass_client.query_water_body(60.0, 30.0)
+
+        assert result is None
+        assert failures == {"overpass"}
+        mock_client.post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_429_feeds_breaker(self):
+        mock_response = MagicMock(status_code=429, headers={"retry-after": "90"})
+        mock_client = AsyncMock()
+        mock_client.post = AsyncMock(return_value=mock_response)
+
+        with patch("app.services.osm_overpass_client.get_http_client", return_value=mock_client):
+            await osm_overpass_client.query_water_body(60.0, 30.0)
+
+        guard = get_upstream_guard("overpass")
+        assert guard.state == CLOSED
+        assert guard.token_wait() > 60
+        assert not await guard.allow()
+
+
+@pytest.mark.usefixtures("no_redis")
+class TestGebcoTileProxy:
+    @pytest.mark.asyncio
+    async def test_empty_bucket_waits_for_next_token(self):
+        guard = get_upstream_guard("gebco")
+        guard.rate = 50.0
+        guard._tokens = 0.0
+        mock_response = MagicMock(status_code=200, headers={"content-type": "image/png"}, content=b"png")
+        mock_client = AsyncMock()
+        mock_client.get = AsyncMock(return_value=mock_response)
+
+        with patch("app.services.depth_reader.get_http_client", return_value=mock_client):
+            result = await depth_reader._proxy_gebco_wms(5, 10, 10)
+
+        assert result == b"png"
+        mock_client.get.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_returns_none_without_waiting(self):
+        guard = get_upstream_guard("gebco")
+        for _ in range(guard.failure_threshold):
+            await guard.record_failure()
+        mock_client = AsyncMock()
+
+        with patch("app.services.depth_reader.get_http_client", return_value=mock_client), \
+                patch("app.services.depth_reader.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            assert await depth_reader._proxy_gebco_wms(5, 10, 10) is None
+
+        mock_sleep.assert_not_awaited()
+        mock_client.get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_gives_up_when_token_is_past_the_deadline(self):
+        guard = get_upstream_guard("gebco")
+        guard.rate = 0.1
+        guard._tokens = 0.0
+        mock_client = AsyncMock()
+
+        with patch("app.services.depth_reader.get_http_client", return_value=mock_client):
+            assert await depth_reader._proxy_gebco_wms(5, 10, 10) is None
+
+        mock_client.get.assert_not_called()
+
+
+def test_health_reports_breakers():
+    response = TestClient(app).get("/health")
+
+    breakers = response.json()["upstream_breakers"]
+    assert set(breakers) == {"gebco", "overpass"}
+    assert breakers["overpass"]["state"] == CLOSED
@@ -0,0 +1,124 @@
+import json
+import math
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.coord_codec import PackedRings, decode_rings, encode_rings, rings_from_row
+from app.services.geojson_writer import encode_feature_collection
+
+client = TestClient(app)
+
+
+def _rings():
+    outer = [[31.5 + 0.5 * math.cos(t / 50), 60.8 + 0.3 * math.sin(t / 50)] for t in range(315)]
+    outer.append(outer[0])
+    hole = [[31.4, 60.7], [31.45, 60.7], [31.45, 60.75], [31.4, 60.7]]
+    return [outer, hole]
+
+
+class _Row:
+    def __init__(self, coordinates=None, coordinates_bin=None):
+        self.coordinates = coordinates
+        self.coordinates_bin = coordinates_bin
+
+
+class TestCodec:
+    def test_round_trip_within_fixed_point_precision(self):
+        rings = _rings()
+        decoded = decode_rings(encode_rings(rings))
+
+        assert len(decoded) == 2
+        for original, ring in zip(rings, decoded.rings()):
+            np.testing.assert_allclose(ring, original, atol=0.5e-7, rtol=0)
+
+    def test_packed_is_smaller_than_json(self):
+        rings = _rings()
+        assert len(encode_rings(rings)) * 3 < len(json.dumps(rings))
+
+    def test_accepts_memoryview_and_negative_coordinates(self):
+        rings = [[[-70.5, -33.4], [-70.4, -33.4], [-70.4, -33.3], [-70.5, -33.4]]]
+        decoded = decode_rings(memoryview(encode_rings(rings)))
+        np.testing.assert_allclose(decoded.rings()[0], rings[0], atol=1e-7)
+
+    def test_empty(self):
+        decoded = decode_rings(encode_rings([]))
+        assert len(decoded) == 0
+        assert decoded.to_lists() == []
+
+    def test_delta_overflow_rejected(self):
+        with pytest.raises(ValueError):
+            encode_rings([[[-179.9, 0.0], [179.9, 0.0], [0.0, 1.0]]])
+
+    def test_rings_from_row_prefers_packed(self):
+        rings = _rings()
+        row = _Row(coordinates=json.dumps([[[0, 0], [1, 0], [0, 1], [0, 0]]]),
+                   coordinates_bin=encode_rings(rings))
+        assert len(rings_from_row(row)) == 2
+
+    def test_rings_from_row_legacy_json_text_and_list(self):
+        rings = _rings()
+        assert rings_from_row(_Row(coordinates=json.dumps(rings))).point_count == 320
+        assert rings_from_row(_Row(coordinates=rings)).point_count == 320
+        assert len(rings_from_row(_Row())) == 0
+
+
+class TestGeoJSONWriter:
+    def test_output_matches_plain_json(self):
+        rings = _rings()
+        collection = {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Polygon", "coordinates": decode_rings(encode_rings(rings))},
+                    "properties": {"name": "Ладожское озеро", "depth": 230.0, "region": None},
+                },
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [0, 1], [0, 0]]]},
+                    "properties": {"fallback_bbox": True},
+                },
+            ],
+        }
+
+        parsed = json.loads(encode_feature_collection(collection))
+
+        assert parsed["type"] == "FeatureCollection"
+        assert len(parsed["features"]) == 2
+        first = parsed["features"][0]
+        assert first["properties"] == {"name": "Ладожское озеро", "depth": 230.0, "region": None}
+        np.testing.assert_allclose(first["geometry"]["coordinates"][1], rings[1], atol=1e-7)
+        assert parsed["features"][1]["geometry"]["coordinates"] == [[[0, 0], [1, 0], [0, 1], [0, 0]]]
+
+    def test_empty_collection(self):
+        body = encode_feature_collection({"type": "FeatureCollection", "features": []})
+        assert json.loads(body) == {"type": "FeatureCollection", "features": []}
+
+
+class TestAreasEndpoint:
+    @patch("app.api.v1.endpoints.areas.get_depth_areas", new_callable=AsyncMock)
+    def test_areas_serializes_packed_rings(self, mock_areas):
+        rings = _rings()
+        mock_areas.return_value = {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": PackedRings.from_lists(rings)},
+                "properties": {"name": "Ладожское озеро"},
+            }],
+        }
+
+        response = client.get(
+            "/api/v1/depth/areas",
+            params={"minLat": 60, "minLon": 30, "maxLat": 61, "maxLon": 33},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        feature = response.json()["features"][0]
+        assert feature["properties"]["name"] == "Ладожское озеро"
+        assert len(feature["geometry"]["coordinates"][0]) == 316
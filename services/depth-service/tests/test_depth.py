@@ -1,8 +1,10 @@
 from unittest.mock import AsyncMock, patch
 
+import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.services.tile_store import FileTileStore, tile_etag
 
 client = TestClient(app)
 
@@ -19,43 +21,43 @@ class TestHealth:
 
 class TestDepthEstimation:
     def test_deep_water_pixel(self):
-        from app.services.depth_reader import _estimate_depth_from_pixel
-        depth = _estimate_depth_from_pixel(0, 10, 59)
+        from app.services.depth_lut import estimate_depth
+        depth = estimate_depth(0, 10, 59)
         assert depth is not None
         assert depth > 4000
 
     def test_medium_water_pixel(self):
-        from app.services.depth_reader import _estimate_depth_from_pixel
-        depth = _estimate_depth_from_pixel(32, 178, 219)
+        from app.services.depth_lut import estimate_depth
+        depth = estimate_depth(32, 178, 219)
         assert depth is not None
         assert 1000 < depth < 3000
 
     def test_shallow_water_pixel(self):
-        from app.services.depth_reader import _estimate_depth_from_pixel
-        depth = _estimate_depth_from_pixel(211, 255, 237)
+        from app.services.depth_lut import estimate_depth
+        depth = estimate_depth(211, 255, 237)
         assert depth is not None
         assert depth < 30
 
     def test_land_pixel_returns_none(self):
-        from app.services.depth_reader import _estimate_depth_from_pixel
-        depth = _estimate_depth_from_pixel(70, 207, 108)
+        from app.services.depth_lut import estimate_depth
+        depth = estimate_depth(70, 207, 108)
         assert depth is None
 
     def test_white_pixel_returns_none(self):
-        from app.services.depth_reader import _estimate_depth_from_pixel
-        depth = _estimate_depth_from_pixel(255, 255, 255)
+        from app.services.depth_lut import estimate_depth
+        depth = estimate_depth(255, 255, 255)
         assert depth is None
 
     def test_very_shallow_water(self):
-        from app.services.depth_reader import _estimate_depth_from_pixel
-        depth = _estimate_depth_from_pixel(162, 248, 236)
+        from app.services.depth_lut import estimate_depth
+        depth = estimate_depth(162, 248, 236)
         assert depth is not None
         assert depth < 100
 
     def test_deeper_shallower_monotonic(self):
-        from app.services.depth_reader import _estimate_depth_from_pixel
-        deep = _estimate_depth_from_pixel(23, 124, 191)
-        shallow = _estimate_depth_from_pixel(211, 255, 237)
+        from app.services.depth_lut import estimate_depth
+        deep = estimate_depth(23, 124, 191)
+        shallow = estimate_depth(211, 255, 237)
         assert deep > shallow
 
     def test_image_parsing_center_pixel(self):
@@ -215,6 +217,47 @@ class TestDepthPoint:
         assert response.status_code == 422
 
 
+
+class TestDepthPoints:
+    @patch("app.api.v1.endpoints.depth.resolve_depth_batch", new_callable=AsyncMock)
+    def test_depth_points_preserves_order(self, mock_batch):
+        mock_batch.return_value = [
+            {"depth": 3.0, "depth_display": "3.0 м", "source": "GVR", "accuracy_m": 200,
+             "has_data": True, "water_body_name": "Ладожское озеро",
+             "water_body_type": "lake", "depth_type": "avg"},
+            {"depth": None, "depth_display": None, "source": None, "accuracy_m": None,
+             "has_data": False, "water_body_name": None,
+             "water_body_type": None, "depth_type": None},
+        ]
+        response = client.post(
+            "/api/v1/depth/points",
+            json={"points": [{"lat": 60.0, "lon": 31.0}, {"lat": 57.22, "lon": 37.84}]},
+        )
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert len(results) == 2
+        assert results[0]["lat"] == 60.0
+        assert results[0]["depth"] == 3.0
+        assert results[0]["category"] is not None
+        assert results[1]["lat"] == 57.22
+        assert results[1]["has_data"] is False
+        assert results[1]["fish_match"] == []
+        mock_batch.assert_awaited_once_with([(60.0, 31.0), (57.22, 37.84)])
+
+    def test_depth_points_invalid_lat(self):
+        response = client.post("/api/v1/depth/points", json={"points": [{"lat": 91, "lon": 37}]})
+        assert response.status_code == 422
+
+    def test_depth_points_empty(self):
+        response = client.post("/api/v1/depth/points", json={"points": []})
+        assert response.status_code == 422
+
+    def test_depth_points_too_many(self):
+        from app.core.config import settings
+        points = [{"lat": 55.0, "lon": 37.0}] * (settings.DEPTH_BATCH_MAX_POINTS + 1)
+        response = client.post("/api/v1/depth/points", json={"points": points})
+        assert response.status_code == 422
+
 class TestDepthTiles:
     def test_tile_endpoint_returns_png(self):
         response = client.get("/api/v1/depth/tiles/5/20/10.png")
@@ -229,6 +272,190 @@ class TestDepthTiles:
         response = client.get("/api/v1/depth/tiles/0/0/0.png")
         assert response.status_code == 200
 
+    @patch("app.api.v1.endpoints.tiles.fetch_tile", new_callable=AsyncMock)
+    def test_tile_has_cache_validators(self, mock_fetch):
+        mock_fetch.return_value = (b"\x89PNGtile", '"stored"')
+        response = client.get("/api/v1/depth/tiles/5/20/10.png")
+        assert response.headers["etag"] == '"stored"'
+        assert "max-age=86400" in response.headers["cache-control"]
+
+    @patch("app.api.v1.endpoints.tiles.fetch_tile", new_callable=AsyncMock)
+    @patch("app.api.v1.endpoints.tiles.lookup_tile_etag", new_callable=AsyncMock)
+    def test_tile_if_none_match_returns_304(self, mock_etag, mock_fetch):
+        mock_etag.return_value = '"abc"'
+        response = client.get(
+            "/api/v1/depth/tiles/5/20/10.png",
+            headers={"If-None-Match": 'W/"zzz", "abc"'},
+        )
+        assert response.status_code == 304
+        assert response.headers["etag"] == '"abc"'
+        assert response.content == b""
+        mock_fetch.assert_not_awaited()
+
+    @patch("app.api.v1.endpoints.tiles.fetch_tile", new_callable=AsyncMock)
+    @patch("app.api.v1.endpoints.tiles.lookup_tile_etag", new_callable=AsyncMock)
+    def test_tile_stale_etag_returns_body(self, mock_etag, mock_fetch):
+        mock_etag.return_value = '"new"'
+        mock_fetch.return_value = (b"\x89PNGtile", '"new"')
+        response = client.get(
+            "/api/v1/depth/tiles/5/20/10.png",
+            headers={"If-None-Match": '"old"'},
+        )
+        assert response.status_code == 200
+        assert response.content == b"\x89PNGtile"
+
+    @patch("app.api.v1.endpoints.tiles.fetch_tile", new_callable=AsyncMock)
+    def test_placeholder_tile_short_max_age(self, mock_fetch):
+        mock_fetch.return_value = None
+        response = client.get("/api/v1/depth/tiles/5/20/10.png")
+        assert response.headers["cache-control"] == "public, max-age=60"
+
+
+def _water_png() -> bytes:
+    import io
+    from PIL import Image
+
+    img = Image.new("RGBA", (4, 4), (32, 178, 219, 255))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class TestFetchTileCache:
+    @pytest.fixture(autouse=True)
+    def _empty_memory_cache(self):
+        from app.services.tile_memory_cache import tile_memory_cache
+
+        tile_memory_cache.clear()
+        yield
+        tile_memory_cache.clear()
+
+    async def test_second_scheme_derived_from_raw_cache(self, tmp_path):
+        from app.services import depth_reader
+
+        raw = _water_png()
+        with patch.object(depth_reader, "get_tile_store", return_value=FileTileStore(tmp_path)), patch(
+            "app.services.depth_reader._proxy_gebco_wms", new_callable=AsyncMock
+        ) as mock_proxy:
+            mock_proxy.return_value = raw
+            navionics, _ = await depth_reader.fetch_tile(5, 20, 10, scheme="navionics")
+            contrast, _ = await depth_reader.fetch_tile(5, 20, 10, scheme="contrast")
+
+        assert mock_proxy.await_count == 1
+        assert navionics != contrast
+        assert (tmp_path / "raw" / "5" / "20" / "10.png").read_bytes() == raw
+        assert (tmp_path / "contrast" / "5" / "20" / "10.png").read_bytes() == contrast
+
+    async def test_scheme_cache_hit_skips_upstream(self, tmp_path):
+        from app.services import depth_reader
+
+        cached = tmp_path / "sport" / "3" / "1" / "2.png"
+        cached.parent.mkdir(parents=True)
+        cached.write_bytes(b"cached")
+        with patch.object(depth_reader, "get_tile_store", return_value=FileTileStore(tmp_path)), patch(
+            "app.services.depth_reader._proxy_gebco_wms", new_callable=AsyncMock
+        ) as mock_proxy:
+            result = await depth_reader.fetch_tile(3, 1, 2, scheme="sport")
+
+        assert result == (b"cached", tile_etag(b"cached"))
+        mock_proxy.assert_not_awaited()
+
+    async def test_upstream_failure_returns_none(self, tmp_path):
+        from app.services import depth_reader
+
+        with patch.object(depth_reader, "get_tile_store", return_value=FileTileStore(tmp_path)), patch(
+            "app.services.depth_reader._proxy_gebco_wms", new_callable=AsyncMock
+        ) as mock_proxy:
+            mock_proxy.return_value = None
+            result = await depth_reader.fetch_tile(3, 1, 2)
+
+        assert result is None
+        assert not (tmp_path / "raw").exists()
+
+    async def test_concurrent_requests_fetch_upstream_once(self, tmp_path):
+        import asyncio
+        from app.services import depth_reader
+
+        async def slow_proxy(z, x, y):
+            await asyncio.sleep(0.01)
+            return _water_png()
+
+        with patch.object(depth_reader, "get_tile_store", return_value=FileTileStore(tmp_path)), patch(
+            "app.services.depth_reader._proxy_gebco_wms", side_effect=slow_proxy
+        ) as mock_proxy:
+            results = await asyncio.gather(
+                *(depth_reader.fetch_tile(6, 40, 20, scheme=s) for s in ("navionics", "sport") * 5)
+            )
+
+        assert mock_proxy.call_count == 1
+        assert len(set(results)) == 2
+        assert all(etag == tile_etag(tile) for tile, etag in results)
+
+    async def test_memory_hit_skips_store(self, tmp_path):
+        from app.services import depth_reader
+
+        store = FileTileStore(tmp_path)
+        store.put("navionics", 3, 1, 2, b"disk")
+        with patch.object(depth_reader, "get_tile_store", return_value=store):
+            first = await depth_reader.fetch_tile(3, 1, 2)
+            store.delete_layer("navionics")
+            second = await depth_reader.fetch_tile(3, 1, 2)
+
+        assert first == second == (b"disk", tile_etag(b"disk"))
+
+    async def test_disk_hit_returns_stored_etag(self, tmp_path):
+        from app.services import depth_reader
+
+        store = FileTileStore(tmp_path)
+        store.put("navionics", 3, 1, 2, b"disk")
+        (tmp_path / "navionics" / "3" / "1" / "2.png.etag").write_text('"stored"')
+        with patch.object(depth_reader, "get_tile_store", return_value=store), patch.object(
+            depth_reader, "tile_etag"
+        ) as mock_hash:
+            assert await depth_reader.fetch_tile(3, 1, 2) == (b"disk", '"stored"')
+            assert await depth_reader.fetch_tile(3, 1, 2) == (b"disk", '"stored"')
+
+        mock_hash.assert_not_called()
+
+    def test_ramp_change_purges_derived_tiles_only(self, tmp_path):
+        from app.services import depth_colors, depth_reader
+
+        for layer in ("raw", "sport"):
+            path = tmp_path / layer / "1" / "0" / "0.png"
+            path.parent.mkdir(parents=True)
+            path.write_bytes(b"png")
+
+        original = depth_colors.COLOR_SCHEMES["sport"]
+        with patch.object(depth_reader, "get_tile_store", return_value=FileTileStore(tmp_path)):
+            try:
+                depth_colors.set_color_ramp("sport", [(0, 99999, "#102030")])
+                assert (tmp_path / "raw" / "1" / "0" / "0.png").exists()
+                assert not (tmp_path / "sport").exists()
+            finally:
+                depth_colors.set_color_ramp("sport", original)
+
+    async def test_ramp_change_on_event_loop_deletes_in_thread(self, tmp_path):
+        import asyncio
+        from app.services import depth_colors, depth_reader
+
+        path = tmp_path / "sport" / "1" / "0" / "0.png"
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b"png")
+
+        original = depth_colors.COLOR_SCHEMES["sport"]
+        with patch.object(depth_reader, "get_tile_store", return_value=FileTileStore(tmp_path)), patch(
+            "app.services.depth_reader.asyncio.to_thread", wraps=asyncio.to_thread
+        ) as mock_to_thread:
+            try:
+                depth_colors.set_color_ramp("sport", [(0, 99999, "#102030")])
+                await asyncio.gather(*depth_reader._purge_tasks)
+            finally:
+                depth_colors.set_color_ramp("sport", original)
+                await asyncio.gather(*depth_reader._purge_tasks)
+
+        assert not (tmp_path / "sport").exists()
+        mock_to_thread.assert_any_call(depth_reader._delete_scheme_layer, "sport")
+
 
 class TestFishMatcher:
     def test_match_fish_shallow_depth_summer(self):
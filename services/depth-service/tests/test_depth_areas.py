@@ -0,0 +1,147 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services.coord_codec import encode_rings
+from app.services.depth_areas import get_depth_areas, iter_depth_areas
+from app.services.geojson_writer import aiter_feature_collection
+
+client = TestClient(app)
+
+_COMMON = {"water_type": "lake", "max_depth": 12.0, "avg_depth": 5.0, "region": None}
+
+
+def _polygon_row(name, rings):
+    return SimpleNamespace(
+        name=name, coordinates_bin=encode_rings(rings), coordinates=None,
+        centroid_lat=None, centroid_lon=None, area_km2=None, **_COMMON,
+    )
+
+
+def _bbox_row(name):
+    return SimpleNamespace(
+        name=name, lat_min=60.0, lat_max=61.0, lon_min=30.0, lon_max=31.0,
+        centroid_lat=60.5, centroid_lon=30.5, area_km2=10.0, **_COMMON,
+    )
+
+
+class _Result:
+    """Stand-in for AsyncResult: async iteration over fixed rows."""
+
+    def __init__(self, rows):
+        self._rows = rows
+
+    async def __aiter__(self):
+        for row in self._rows:
+            yield row
+
+
+async def _alist(aiter):
+    return [item async for item in aiter]
+
+
+async def _features(features):
+    for feature in features:
+        yield feature
+
+
+def _session(*results):
+    session = AsyncMock()
+    session.stream.side_effect = list(results)
+    return session
+
+
+_RING = [[30.0, 60.0], [31.0, 60.0], [31.0, 61.0], [30.0, 60.0]]
+
+
+class TestIterDepthAreas:
+    @pytest.mark.asyncio
+    async def test_streams_polygons_then_unseen_fallbacks(self):
+        session = _session(
+            _Result([_polygon_row("Ладога", [_RING])]),
+            _Result([_bbox_row("Ладога"), _bbox_row("Онего")]),
+        )
+        with patch("app.services.depth_areas.async_session") as mock_session:
+            mock_session.return_value.__aenter__.return_value = session
+            features = await _alist(iter_depth_areas(60, 30, 61, 31, limit=10))
+
+        assert [f["properties"]["name"] for f in features] == ["Ладога", "Онего"]
+        assert features[1]["properties"]["fallback_bbox"] is True
+        assert session.stream.await_args_list[1].args[1]["limit"] == 9
+
+    @pytest.mark.asyncio
+    async def test_skips_fallback_when_limit_reached(self):
+        session = _session(_Result([_polygon_row("Ладога", [_RING])]))
+        with patch("app.services.depth_areas.async_session") as mock_session:
+            mock_session.return_value.__aenter__.return_value = session
+            features = await _alist(iter_depth_areas(60, 30, 61, 31, limit=1))
+
+        assert len(features) == 1
+        assert session.stream.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_db_error_ends_stream(self):
+        session = _session(
+            _Result([_polygon_row("Ладога", [_RING])]),
+            RuntimeError("connection lost"),
+        )
+        with patch("app.services.depth_areas.async_session") as mock_session:
+            mock_session.return_value.__aenter__.return_value = session
+            features = await _alist(iter_depth_areas(60, 30, 61, 31))
+
+        assert [f["properties"]["name"] for f in features] == ["Ладога"]
+
+    @pytest.mark.asyncio
+    async def test_collected_areas_raise_db_error(self):
+        session = _session(
+            _Result([_polygon_row("Ладога", [_RING])]),
+            RuntimeError("connection lost"),
+        )
+        with patch("app.services.depth_areas.async_session") as mock_session:
+            mock_session.return_value.__aenter__.return_value = session
+            with pytest.raises(RuntimeError):
+                await get_depth_areas(60, 30, 61, 31)
+
+
+class TestAsyncFeatureCollection:
+    @pytest.mark.asyncio
+    async def test_chunks_form_valid_collection(self):
+        features = [
+            {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [_RING]},
+             "properties": {"name": f"lake {i}"}}
+            for i in range(50)
+        ]
+        chunks = await _alist(aiter_feature_collection(_features(features), chunk_size=1024))
+
+        assert len(chunks) > 1
+        parsed = json.loads(b"".join(chunks))
+        assert [f["properties"]["name"] for f in parsed["features"]] == [f"lake {i}" for i in range(50)]
+
+    @pytest.mark.asyncio
+    async def test_empty_stream(self):
+        chunks = await _alist(aiter_feature_collection(_features([])))
+        assert json.loads(b"".join(chunks)) == {"type": "FeatureCollection", "features": []}
+
+
+class TestAreasStreaming:
+    @patch("app.api.v1.endpoints.areas.iter_depth_areas")
+    def test_stream_uses_streaming_cap(self, mock_iter):
+        mock_iter.return_value = _features([
+            {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [_RING]},
+             "properties": {"name": "Ладога"}},
+        ])
+
+        response = client.get(
+            "/api/v1/depth/areas",
+            params={"minLat": 60, "minLon": 30, "maxLat": 61, "maxLon": 31, "stream": "true"},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json()["features"][0]["properties"]["name"] == "Ладога"
+        assert mock_iter.call_args.kwargs["limit"] == settings.DEPTH_AREAS_STREAM_MAX_FEATURES
@@ -0,0 +1,62 @@
+import numpy as np
+
+from app.services import depth_colors, depth_lut
+
+
+class TestDepthByBrightness:
+    def test_table_covers_all_brightness_levels(self):
+        assert depth_lut.DEPTH_BY_BRIGHTNESS.shape == (768,)
+
+    def test_table_matches_ramp_interpolation(self):
+        for brightness in range(768):
+            assert depth_lut.DEPTH_BY_BRIGHTNESS[brightness] == depth_lut._interpolate_depth(brightness)
+
+    def test_darkest_is_deepest(self):
+        assert depth_lut.DEPTH_BY_BRIGHTNESS[0] == 6000.0
+        assert depth_lut.DEPTH_BY_BRIGHTNESS[700] == 30.0
+
+
+class TestEstimateDepth:
+    def test_water_pixel(self):
+        assert depth_lut.estimate_depth(32, 178, 219) == depth_lut._interpolate_depth(429)
+
+    def test_land_pixel(self):
+        assert depth_lut.estimate_depth(70, 207, 108) is None
+
+    def test_white_pixel(self):
+        assert depth_lut.estimate_depth(255, 255, 255) is None
+
+
+class TestRgbaLut:
+    def test_all_schemes_prebuilt(self):
+        for scheme in ("navionics", "contrast", "sport"):
+            lut = depth_lut.get_rgba_lut(scheme)
+            assert lut.shape == (1536, 4)
+            assert lut.dtype == np.uint8
+
+    def test_land_rows_transparent(self):
+        lut = depth_lut.get_rgba_lut("navionics")
+        assert not lut[768:].any()
+
+    def test_water_rows_use_scheme_color(self):
+        lut = depth_lut.get_rgba_lut("navionics")
+        assert tuple(lut[0]) == (0, 12, 46, 180)
+
+    def test_lut_index_offsets_land(self):
+        rgba = np.array([[[0, 10, 59, 255], [70, 207, 108, 255]]], dtype=np.uint8)
+        idx = depth_lut.lut_index(rgba)
+        assert idx[0, 0] == 69
+        assert idx[0, 1] == 768 + 385
+
+
+class TestRebuildHook:
+    def test_set_color_ramp_rebuilds_lut(self):
+        original = depth_colors.COLOR_SCHEMES["sport"]
+        try:
+            depth_colors.set_color_ramp("sport", [(0, 99999, "#102030")])
+            lut = depth_lut.get_rgba_lut("sport")
+            assert tuple(lut[100]) == (16, 32, 48, 180)
+        finally:
+            depth_colors.set_color_ramp("sport", original)
+
+        assert tuple(depth_lut.get_rgba_lut("sport")[0]) == (13, 56, 17, 180)
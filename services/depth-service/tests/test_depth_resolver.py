@@ -1,9 +1,15 @@
+import asyncio
+import time
 from unittest.mock import AsyncMock, patch
 
 import pytest
 
+from app.core.config import settings
+from app.core.upstream_errors import record_upstream_error
 from app.services import depth_resolver
 
+_GEBCO_LAND = {"depth": None, "source": "GEBCO_2024", "accuracy_m": 463, "has_data": False}
+
 
 class TestDepthResolver:
     @pytest.mark.asyncio
@@ -213,3 +219,250 @@ class TestDepthResolver:
         assert result["depth"] == 500.0
         assert result["depth_type"] == "point"
         assert result["water_body_name"] is None
+
+
+class TestDepthResolverBatch:
+    @pytest.mark.asyncio
+    @patch("app.services.depth_resolver.cache_get_many", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.cache_set_many", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.cache_set", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.gvr_cache.query_water_bodies_batch", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.osm_overpass_client.query_water_body", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.gvr_cache.query_water_body", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.query_gebco", new_callable=AsyncMock)
+    async def test_batch_mixes_cache_gvr_and_fallback(
+        self, mock_gebco, mock_gvr, mock_osm, mock_gvr_batch,
+        mock_cache_set, mock_cache_set_many, mock_cache_get_many,
+    ):
+        cached = {
+            "depth": 5.0, "depth_display": "5.0 м", "source": "OSM", "accuracy_m": 50,
+            "has_data": True, "lat": 56.16, "lon": 37.03,
+            "water_body_name": "Озеро Сенеж", "water_body_type": "lake", "depth_type": "avg",
+        }
+        mock_cache_get_many.return_value = [cached, None, None]
+        mock_gvr_batch.return_value = [
+            {"name": "Ладожское озеро", "water_type": "lake", "depth": 51.0,
+             "depth_type": "avg", "source": "GVR", "accuracy_m": 200, "has_data": True},
+            None,
+        ]
+        mock_osm.return_value = None
+        mock_gvr.return_value = None
+        mock_gebco.return_value = {
+            "depth": 500.0, "source": "GEBCO_2024", "accuracy_m": 463, "has_data": True,
+        }
+
+        results = await depth_resolver.resolve_depth_batch(
+            [(56.16, 37.03), (60.8, 31.5), (44.0, 38.0)]
+        )
+
+        assert [r["source"] for r in results] == ["OSM", "GVR", "GEBCO_2024"]
+        assert results[1]["water_body_name"] == "Ладожское озеро"
+        assert results[1]["lat"] == 60.8
+        mock_gvr_batch.assert_awaited_once_with([(60.8, 31.5), (44.0, 38.0)])
+        mock_osm.assert_awaited_once_with(44.0, 38.0)
+        cached_keys = [key for key, _ in mock_cache_set_many.call_args.args[0]]
+        assert cached_keys == [depth_resolver._cache_key(60.8, 31.5)]
+        # GVR shortcut answers skipped OSM, so they must not get the full TTL.
+        assert mock_cache_set_many.call_args.kwargs["ttl"] == settings.DEPTH_BATCH_GVR_TTL
+
+    @pytest.mark.asyncio
+    @patch("app.services.depth_resolver.cache_get_many", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.gvr_cache.query_water_bodies_batch", new_callable=AsyncMock)
+    async def test_batch_all_cached_skips_gvr(self, mock_gvr_batch, mock_cache_get_many):
+        mock_cache_get_many.return_value = [{"depth": 1.0, "has_data": True}]
+        mock_gvr_batch.return_value = []
+
+        results = await depth_resolver.resolve_depth_batch([(56.0, 37.0)])
+
+        assert results == [{"depth": 1.0, "has_data": True, "lat": 56.0, "lon": 37.0}]
+        mock_gvr_batch.assert_awaited_once_with([])
+
+
+    @pytest.mark.asyncio
+    @patch("app.services.depth_resolver.cache_get_many", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.cache_set_many", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.gvr_cache.query_water_bodies_batch", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver._resolve_uncached", new_callable=AsyncMock)
+    async def test_batch_resolves_each_cell_once(
+        self, mock_resolve, mock_gvr_batch, mock_cache_set_many, mock_cache_get_many,
+    ):
+        points = [(56.16001, 37.03001), (56.16021, 37.03021), (44.0, 38.0)]
+        mock_cache_get_many.return_value = [None, None, None]
+        mock_gvr_batch.return_value = [None, None, None]
+        mock_resolve.side_effect = lambda lat, lon: {"depth": 3.0, "has_data": True, "lat": lat, "lon": lon}
+
+        results = await depth_resolver.resolve_depth_batch(points)
+
+        assert mock_resolve.await_count == 2
+        assert [(r["lat"], r["lon"]) for r in results] == points
+        assert results[0] is not results[1]
+
+    @pytest.mark.asyncio
+    @patch("app.services.depth_resolver.cache_get_many", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.cache_set_many", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.gvr_cache.query_water_bodies_batch", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver._resolve_uncached", new_callable=AsyncMock)
+    async def test_batch_deadline_returns_no_data(
+        self, mock_resolve, mock_gvr_batch, mock_cache_set_many, mock_cache_get_many,
+    ):
+        async def resolve(lat, lon):
+            if lat > 50:
+                await asyncio.sleep(10)
+            return {"depth": 3.0, "has_data": True, "lat": lat, "lon": lon}
+
+        mock_cache_get_many.return_value = [None, None]
+        mock_gvr_batch.return_value = [None, None]
+        mock_resolve.side_effect = resolve
+
+        with patch.object(settings, "DEPTH_BATCH_DEADLINE_SEC", 0.05):
+            started = time.monotonic()
+            results = await depth_resolver.resolve_depth_batch([(56.0, 37.0), (44.0, 38.0)])
+
+        assert time.monotonic() - started < 1.0
+        assert results[0]["has_data"] is False and results[0]["lat"] == 56.0
+        assert results[1]["has_data"] is True
+
+
+class TestDepthCachePolicy:
+    def test_nearby_points_share_keys(self):
+        assert depth_resolver._cache_key(56.16001, 37.03001) == depth_resolver._cache_key(56.16021, 37.03021)
+        assert depth_resolver._cache_key(56.16, 37.03) != depth_resolver._cache_key(56.161, 37.03)
+
+    @pytest.mark.asyncio
+    @patch("app.services.depth_resolver.cache_get", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.cache_set", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.osm_overpass_client.query_water_body", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.gvr_cache.query_water_body", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.query_gebco", new_callable=AsyncMock)
+    async def test_clean_miss_uses_no_data_ttl(self, mock_gebco, mock_gvr, mock_osm, mock_cache_set, mock_cache_get):
+        mock_cache_get.return_value = None
+        mock_osm.return_value = None
+        mock_gvr.return_value = None
+        mock_gebco.return_value = dict(_GEBCO_LAND)
+
+        await depth_resolver.resolve_depth(55.75, 37.62)
+
+        key, _ = mock_cache_set.await_args.args
+        assert key == depth_resolver._cache_key(55.75, 37.62)
+        assert mock_cache_set.await_args.kwargs["ttl"] == settings.DEPTH_CACHE_NO_DATA_TTL
+
+    @pytest.mark.asyncio
+    @patch("app.services.depth_resolver.cache_get", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.cache_set", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.osm_overpass_client.query_water_body", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.gvr_cache.query_water_body", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.query_gebco", new_callable=AsyncMock)
+    async def test_upstream_error_gets_short_backoff(self, mock_gebco, mock_gvr, mock_osm, mock_cache_set, mock_cache_get):
+        async def overpass_down(lat, lon):
+            record_upstream_error("overpass")
+            return None
+
+        mock_cache_get.return_value = None
+        mock_osm.side_effect = overpass_down
+        mock_gvr.return_value = None
+        mock_gebco.return_value = dict(_GEBCO_LAND)
+
+        result = await depth_resolver.resolve_depth(55.75, 37.62)
+
+        assert mock_cache_set.await_args.kwargs["ttl"] == settings.DEPTH_CACHE_ERROR_TTL
+        assert result["has_data"] is False
+
+    @pytest.mark.asyncio
+    @patch("app.services.depth_resolver.cache_get", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.cache_set", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.osm_overpass_client.query_water_body", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.gvr_cache.query_water_body", new_callable=AsyncMock)
+    @patch("app.services.depth_resolver.query_gebco", new_callable=AsyncMock)
+    async def test_gebco_answer_cached_per_point(self, mock_gebco, mock_gvr, mock_osm, mock_cache_set, mock_cache_get):
+        mock_cache_get.return_value = None
+        mock_osm.return_value = None
+        mock_gvr.return_value = None
+        mock_gebco.return_value = {"depth": 500.0, "source": "GEBCO_2024", "accuracy_m": 463, "has_data": True}
+
+        await depth_resolver.resolve_depth(44.0, 38.0)
+
+        key, _ = mock_cache_set.await_args.args
+        assert key == depth_resolver._cache_key(44.0, 38.0)
+        assert mock_cache_set.await_args.kwargs["ttl"] == settings.DEPTH_CACHE_TTL
+
+
+_OSM_HIT = {
+    "name": "Озеро Сенеж", "water_type": "lake", "depth": 6.0, "depth_type": "avg",
+    "source": "OSM", "accuracy_m": 50, "has_data": True,
+}
+_GVR_HIT = {
+    "name": "Озеро Сенеж", "water_type": "lake", "depth": 9.0, "depth_type": "max",
+    "source": "GVR", "accuracy_m": 100, "has_data": True,
+}
+
+
+def _after(delay, value):
+    async def source(*args):
+        await asyncio.sleep(delay)
+        return value
+    return source
+
+
+@pytest.mark.asyncio
+@patch.object(settings, "DEPTH_RESOLVE_DEADLINE_SEC", 0.5)
+@patch.object(settings, "DEPTH_RESOLVE_HEDGE_SEC", 0.1)
+@patch("app.services.depth_resolver.cache_get", new_callable=AsyncMock, return_value=None)
+@patch("app.services.depth_resolver.cache_set", new_callable=AsyncMock)
+@patch("app.services.depth_resolver.osm_overpass_client.query_water_body")
+@patch("app.services.depth_resolver.gvr_cache.query_water_body")
+@patch("app.services.depth_resolver.query_gebco")
+class TestHedgedResolution:
+    async def test_slow_overpass_hedged_by_gvr(self, mock_gebco, mock_gvr, mock_osm, mock_cache_set, _):
+        mock_osm.side_effect = _after(10, _OSM_HIT)
+        mock_gvr.side_effect = _after(0, _GVR_HIT)
+        mock_gebco.side_effect = _after(10, dict(_GEBCO_LAND))
+
+        started = time.monotonic()
+        result = await depth_resolver.resolve_depth(56.16, 37.03)
+
+        assert result["source"] == "GVR"
+        assert time.monotonic() - started < 0.4
+        # Degraded: Overpass never answered.
+        assert mock_cache_set.await_args.kwargs["ttl"] == settings.DEPTH_CACHE_NO_DATA_TTL
+
+    async def test_overpass_within_hedge_keeps_priority(self, mock_gebco, mock_gvr, mock_osm, mock_cache_set, _):
+        mock_osm.side_effect = _after(0.05, _OSM_HIT)
+        mock_gvr.side_effect = _after(0, _GVR_HIT)
+        mock_gebco.side_effect = _after(0, dict(_GEBCO_LAND))
+
+        result = await depth_resolver.resolve_depth(56.16, 37.03)
+
+        assert result["source"] == "OSM"
+        assert mock_cache_set.await_args.kwargs["ttl"] == settings.DEPTH_CACHE_TTL
+
+    async def test_nothing_found_waits_for_deadline(self, mock_gebco, mock_gvr, mock_osm, mock_cache_set, _):
+        mock_osm.side_effect = _after(10, _OSM_HIT)
+        mock_gvr.side_effect = _after(0, None)
+        mock_gebco.side_effect = _after(0, dict(_GEBCO_LAND))
+
+        started = time.monotonic()
+        result = await depth_resolver.resolve_depth(56.16, 37.03)
+
+        assert result["has_data"] is False
+        assert 0.4 < time.monotonic() - started < 1.0
+        assert mock_cache_set.await_args.kwargs["ttl"] == settings.DEPTH_CACHE_ERROR_TTL
+
+    async def test_losing_sources_cancelled(self, mock_gebco, mock_gvr, mock_osm, mock_cache_set, _):
+        cancelled = []
+
+        async def slow(*args):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        mock_osm.side_effect = _after(0, _OSM_HIT)
+        mock_gvr.side_effect = slow
+        mock_gebco.side_effect = slow
+
+        result = await depth_resolver.resolve_depth(56.16, 37.03)
+        await asyncio.sleep(0)
+
+        assert result["source"] == "OSM"
+        assert cancelled == [True, True]
@@ -0,0 +1,57 @@
+import httpx
+
+from app.core import http_clients
+from app.core.config import settings
+
+
+class TestHttpClients:
+    async def test_client_reused_per_upstream(self):
+        try:
+            first = http_clients.get_http_client(http_clients.GEBCO)
+            assert http_clients.get_http_client(http_clients.GEBCO) is first
+            assert http_clients.get_http_client(http_clients.OVERPASS) is not first
+        finally:
+            await http_clients.close_http_clients()
+
+    async def test_per_upstream_timeouts(self):
+        try:
+            gebco = http_clients.get_http_client(http_clients.GEBCO)
+            overpass = http_clients.get_http_client(http_clients.OVERPASS)
+            assert gebco.timeout.read == settings.GEBCO_HTTP_TIMEOUT
+            assert overpass.timeout.read == settings.OVERPASS_TIMEOUT + 5
+        finally:
+            await http_clients.close_http_clients()
+
+    async def test_closed_client_recreated(self):
+        client = http_clients.get_http_client(http_clients.GEBCO)
+        await http_clients.close_http_clients()
+        assert client.is_closed
+        assert http_clients.get_http_client(http_clients.GEBCO) is not client
+        await http_clients.close_http_clients()
+
+    async def test_pool_stats(self):
+        try:
+            await http_clients.init_http_clients()
+            stats = http_clients.pool_stats()
+            assert set(stats) == {"gebco", "overpass"}
+            assert stats["gebco"]["connections"] == 0
+            assert stats["gebco"]["in_flight"] == 0
+            assert stats["gebco"]["max_connections"] == settings.HTTP_MAX_CONNECTIONS
+        finally:
+            await http_clients.close_http_clients()
+
+    async def test_pool_stats_count_requests(self):
+        transport = http_clients._TimedTransport(
+            http_clients.GEBCO, httpx.MockTransport(lambda request: httpx.Response(200))
+        )
+        http_clients._transports[http_clients.GEBCO] = transport
+        try:
+            async with httpx.AsyncClient(transport=transport) as client:
+                await client.get("http://gebco.test/tile")
+            stats = http_clients.pool_stats()["gebco"]
+            assert stats["requests"] == 1
+            assert stats["in_flight"] == 0
+            # MockTransport has no connection pool to read.
+            assert stats["connections"] == "unknown"
+        finally:
+            await http_clients.close_http_clients()
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.depth_labels import get_depth_labels
+from app.services.label_placement import (
+    CollisionGrid,
+    label_box,
+    place_labels,
+    project,
+    rank_key,
+)
+
+
+def _feature(name, lat, lon, depth=10.0):
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        "properties": {"name": name, "depth": depth, "label": f"{depth:g}м", "water_type": "lake"},
+    }
+
+
+def _row(name, lat, lon, area_km2, max_depth=10.0):
+    return SimpleNamespace(
+        name=name, water_type="lake", centroid_lat=lat, centroid_lon=lon,
+        max_depth=max_depth, avg_depth=None, area_km2=area_km2,
+    )
+
+
+class TestProjection:
+    def test_origin_and_center(self):
+        assert project(0.0, 0.0, 0) == pytest.approx((128.0, 128.0))
+        assert project(0.0, -180.0, 1) == pytest.approx((0.0, 256.0))
+
+    def test_pixels_double_per_zoom(self):
+        x9, y9 = project(60.0, 30.0, 9)
+        x10, y10 = project(60.0, 30.0, 10)
+        assert (x10, y10) == pytest.approx((2 * x9, 2 * y9))
+
+
+class TestCollisionGrid:
+    def test_box_spanning_cells_collides(self):
+        grid = CollisionGrid(cell_px=10)
+        assert grid.try_place((5.0, 5.0, 25.0, 25.0))
+        assert grid.collides((24.0, 24.0, 30.0, 30.0))
+        assert not grid.collides((26.0, 0.0, 40.0, 4.0))
+
+    def test_label_box_grows_with_text(self):
+        short = label_box("Ильмень", "10м", 0, 0)
+        long = label_box("Рыбинское водохранилище", "30м", 0, 0)
+        assert long[2] - long[0] > short[2] - short[0]
+
+
+class TestPlaceLabels:
+    def test_overlapping_keeps_first(self):
+        features = [_feature("Большое", 60.0, 30.0), _feature("Малое", 60.001, 30.001)]
+        assert [f["properties"]["name"] for f in place_labels(features, 10)] == ["Большое"]
+
+    def test_distant_labels_all_kept(self):
+        features = [_feature("А", 60.0, 30.0), _feature("Б", 61.0, 32.0)]
+        assert len(place_labels(features, 10)) == 2
+
+    def test_zooming_in_reveals_more(self):
+        features = [_feature("А", 60.0, 30.0), _feature("Б", 60.02, 30.03)]
+        assert len(place_labels(features, 8)) == 1
+        assert len(place_labels(features, 14)) == 2
+
+    def test_rank_prefers_area_then_depth(self):
+        assert rank_key(100.0, 5.0) < rank_key(10.0, 50.0)
+        assert rank_key(10.0, 50.0) < rank_key(10.0, 5.0)
+        assert rank_key(None, 5.0) > rank_key(1.0, 5.0)
+
+
+class TestDepthLabels:
+    @pytest.mark.asyncio
+    async def test_larger_body_wins_collision(self):
+        rows = [
+            _row("Пруд", 60.0, 30.0, area_km2=0.5, max_depth=40.0),
+            _row("Озеро", 60.001, 30.001, area_km2=50.0),
+            _row("Дальнее", 61.0, 32.0, area_km2=1.0),
+        ]
+        session = AsyncMock()
+        session.execute.return_value = MagicMock(fetchall=MagicMock(return_value=rows))
+        with patch("app.services.depth_labels.async_session") as mock_session:
+            mock_session.return_value.__aenter__.return_value = session
+            result = await get_depth_labels(59.0, 29.0, 62.0, 33.0, zoom=10)
+
+        names = [f["properties"]["name"] for f in result["features"]]
+        assert names == ["Озеро", "Дальнее"]
+
+    @pytest.mark.asyncio
+    async def test_db_error_propagates(self):
+        session = AsyncMock()
+        session.execute.side_effect = RuntimeError("connection lost")
+        with patch("app.services.depth_labels.async_session") as mock_session:
+            mock_session.return_value.__aenter__.return_value = session
+            with pytest.raises(RuntimeError):
+                await get_depth_labels(59.0, 29.0, 62.0, 33.0, zoom=10)
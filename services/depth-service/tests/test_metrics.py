@@ -0,0 +1,102 @@
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.http_clients import _TimedTransport
+from app.core.metrics import cache_keyspace
+from app.core.redis_client import cache_get, cache_get_many
+from app.main import app
+from app.services import depth_reader, depth_resolver
+from app.services.tile_memory_cache import tile_memory_cache
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestCacheKeyspace:
+    def test_keyspaces(self):
+        assert cache_keyspace("depth:gebco:1:2") == "gebco"
+        assert cache_keyspace("depth:areas:g3:navionics.ab:9/1-2/3-4") == "areas"
+        assert cache_keyspace("depth:60.1234:30.5000") == "depth"
+        assert cache_keyspace("depth:-60.1234:30.5000") == "depth"
+
+
+class TestRedisCounters:
+    @pytest.mark.asyncio
+    async def test_cache_get_counts_hit_and_miss(self):
+        redis = AsyncMock()
+        redis.get.side_effect = ['{"a": 1}', None]
+        hits = _sample("depth_redis_cache_requests_total", keyspace="gebco", result="hit")
+        misses = _sample("depth_redis_cache_requests_total", keyspace="gebco", result="miss")
+
+        with patch("app.core.redis_client.get_redis", new_callable=AsyncMock, return_value=redis):
+            assert await cache_get("depth:gebco:1:2") == {"a": 1}
+            assert await cache_get("depth:gebco:1:3") is None
+
+        assert _sample("depth_redis_cache_requests_total", keyspace="gebco", result="hit") == hits + 1
+        assert _sample("depth_redis_cache_requests_total", keyspace="gebco", result="miss") == misses + 1
+
+    @pytest.mark.asyncio
+    async def test_cache_get_many_counts_each_key(self):
+        redis = AsyncMock()
+        redis.mget.return_value = [None, None, '{"a": 1}']
+        misses = _sample("depth_redis_cache_requests_total", keyspace="depth", result="miss")
+
+        with patch("app.core.redis_client.get_redis", new_callable=AsyncMock, return_value=redis):
+            await cache_get_many(["depth:1.0:2.0", "depth:1.0:2.5", "depth:1.5:2.0"])
+
+        assert _sample("depth_redis_cache_requests_total", keyspace="depth", result="miss") == misses + 2
+
+
+class TestHotPathHistograms:
+    @pytest.mark.asyncio
+    async def test_tile_memory_hit(self):
+        before = _sample("depth_tile_fetch_seconds_count", outcome="memory")
+        tile_memory_cache.put(("navionics", 3, 1, 1), b"png", '"e"')
+        try:
+            assert await depth_reader.fetch_tile(3, 1, 1) == (b"png", '"e"')
+        finally:
+            tile_memory_cache.clear()
+
+        assert _sample("depth_tile_fetch_seconds_count", outcome="memory") == before + 1
+
+    @pytest.mark.asyncio
+    async def test_resolve_by_source(self):
+        before = _sample("depth_resolve_seconds_count", source="gvr")
+        with patch.object(depth_resolver, "cache_get", new_callable=AsyncMock, return_value=None), \
+                patch.object(depth_resolver, "_resolve_uncached", new_callable=AsyncMock,
+                             return_value={"source": "GVR", "has_data": True}):
+            await depth_resolver.resolve_depth(60.0, 30.0)
+
+        assert _sample("depth_resolve_seconds_count", source="gvr") == before + 1
+
+    @pytest.mark.asyncio
+    async def test_upstream_status_and_timeout(self):
+        def handler(request):
+            if request.url.path == "/slow":
+                raise httpx.ReadTimeout("slow", request=request)
+            return httpx.Response(503)
+
+        status_before = _sample("depth_upstream_request_seconds_count", upstream="test", status="503")
+        timeout_before = _sample("depth_upstream_request_seconds_count", upstream="test", status="timeout")
+        transport = _TimedTransport("test", httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport, base_url="http://upstream") as client:
+            await client.get("/")
+            with pytest.raises(httpx.ReadTimeout):
+                await client.get("/slow")
+
+        assert _sample("depth_upstream_request_seconds_count", upstream="test", status="503") == status_before + 1
+        assert _sample("depth_upstream_request_seconds_count", upstream="test", status="timeout") == timeout_before + 1
+
+
+def test_metrics_endpoint():
+    response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "depth_tile_fetch_seconds" in response.text
+    assert "depth_redis_cache_requests_total" in response.text
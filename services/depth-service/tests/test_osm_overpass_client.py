@@ -3,6 +3,7 @@ from unittest.mock import AsyncMock, MagicMock, patch
 import httpx
 import pytest
 
+from app.core.upstream_errors import track_upstream_errors
 from app.services import osm_overpass_client
 
 
@@ -109,10 +110,8 @@ class TestQueryWaterBody:
 
         mock_client = AsyncMock()
         mock_client.post = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
 
-        with patch("httpx.AsyncClient", return_value=mock_client):
+        with patch("app.services.osm_overpass_client.get_http_client", return_value=mock_client):
             result = await osm_overpass_client.query_water_body(56.16, 37.03)
 
         assert result is not None
@@ -139,10 +138,8 @@ class TestQueryWaterBody:
 
         mock_client = AsyncMock()
         mock_client.post = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
 
-        with patch("httpx.AsyncClient", return_value=mock_client):
+        with patch("app.services.osm_overpass_client.get_http_client", return_value=mock_client):
             result = await osm_overpass_client.query_water_body(60.0, 30.0)
 
         assert result is not None
@@ -157,13 +154,13 @@ class TestQueryWaterBody:
 
         mock_client = AsyncMock()
         mock_client.post = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
 
-        with patch("httpx.AsyncClient", return_value=mock_client):
+        with patch("app.services.osm_overpass_client.get_http_client", return_value=mock_client), \
+                track_upstream_errors() as failures:
             result = await osm_overpass_client.query_water_body(60.0, 30.0)
 
         assert result is None
+        assert failures == {"overpass"}
 
     @pytest.mark.asyncio
     async def test_http_error(self):
@@ -172,10 +169,8 @@ class TestQueryWaterBody:
 
         mock_client = AsyncMock()
         mock_client.post = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
 
-        with patch("httpx.AsyncClient", return_value=mock_client):
+        with patch("app.services.osm_overpass_client.get_http_client", return_value=mock_client):
             result = await osm_overpass_client.query_water_body(60.0, 30.0)
 
         assert result is None
@@ -184,10 +179,8 @@ class TestQueryWaterBody:
     async def test_timeout(self):
         mock_client = AsyncMock()
         mock_client.post = AsyncMock(side_effect=httpx.TimeoutException("timeout"))
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
 
-        with patch("httpx.AsyncClient", return_value=mock_client):
+        with patch("app.services.osm_overpass_client.get_http_client", return_value=mock_client):
             result = await osm_overpass_client.query_water_body(60.0, 30.0)
 
         assert result is None
@@ -200,13 +193,13 @@ class TestQueryWaterBody:
 
         mock_client = AsyncMock()
         mock_client.post = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
 
-        with patch("httpx.AsyncClient", return_value=mock_client):
+        with patch("app.services.osm_overpass_client.get_http_client", return_value=mock_client), \
+                track_upstream_errors() as failures:
             result = await osm_overpass_client.query_water_body(0.0, 0.0)
 
         assert result is None
+        assert failures == set()
 
     @pytest.mark.asyncio
     async def test_river_waterbody(self):
@@ -226,13 +219,34 @@ class TestQueryWaterBody:
 
         mock_client = AsyncMock()
         mock_client.post = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
 
-        with patch("httpx.AsyncClient", return_value=mock_client):
+        with patch("app.services.osm_overpass_client.get_http_client", return_value=mock_client):
             result = await osm_overpass_client.query_water_body(55.75, 37.62)
 
         assert result is not None
         assert result["water_type"] == "river"
         assert result["depth"] == 15.0
         assert result["depth_type"] == "max"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_queries_coalesced(self):
+        import asyncio
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"elements": [{"tags": {"name": "Озеро", "depth": "3"}}]}
+
+        async def slow_post(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return mock_response
+
+        mock_client = AsyncMock()
+        mock_client.post = AsyncMock(side_effect=slow_post)
+
+        with patch("app.services.osm_overpass_client.get_http_client", return_value=mock_client):
+            results = await asyncio.gather(
+                *(osm_overpass_client.query_water_body(56.0, 37.0) for _ in range(5))
+            )
+
+        assert all(r["depth"] == 3.0 for r in results)
+        assert mock_client.post.await_count == 1
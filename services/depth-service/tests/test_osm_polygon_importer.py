@@ -1,8 +1,20 @@
+import re
+from unittest.mock import AsyncMock, MagicMock, patch
+from urllib.parse import parse_qs
 
+import httpx
+import pytest
+
+from app.core.circuit_breaker import OPEN
+from app.core.http_clients import OVERPASS
+from app.services import osm_polygon_importer
 from app.services.osm_polygon_importer import (
     _parse_polygon_from_overpass,
     _compute_bbox_and_centroid,
-    _build_overpass_query,
+    _build_union_query,
+    _split_by_body,
+    import_water_bodies,
+    seed_missing_polygons,
 )
 
 
@@ -115,13 +127,231 @@ class TestComputeBboxAndCentroid:
         assert 30.3 < c_lon < 30.5
 
 
-class TestBuildOverpassQuery:
-    def test_query_contains_name(self):
-        q = _build_overpass_query("Тест", 59.0, 29.0, 61.0, 33.0)
-        assert "Тест" in q
-        assert "natural" in q
-        assert "out geom" in q
+def _body(name: str, lat: float, lon: float) -> dict:
+    return {"name": name, "lat_min": lat, "lon_min": lon, "lat_max": lat + 1, "lon_max": lon + 1}
+
+
+_BODIES = [_body(f"Озеро {i}", 55.0 + i, 30.0 + i) for i in range(5)]
+
+
+def _way(name: str, lat: float, lon: float, way_id: int = 1) -> dict:
+    return {
+        "type": "way",
+        "id": way_id,
+        "tags": {"name": name, "natural": "water"},
+        "bounds": {"minlat": lat, "minlon": lon, "maxlat": lat + 0.2, "maxlon": lon + 0.2},
+        "geometry": [
+            {"lat": lat, "lon": lon},
+            {"lat": lat + 0.2, "lon": lon},
+            {"lat": lat + 0.2, "lon": lon + 0.2},
+            {"lat": lat, "lon": lon + 0.2},
+            {"lat": lat, "lon": lon},
+        ],
+    }
+
+
+class _StubOverpass:
+    """Answers every body named in a union query with one square way."""
+
+    def __init__(self, max_bodies: int | None = None, fail_first: int = 0):
+        self.queries: list[list[str]] = []
+        self.max_bodies = max_bodies
+        self.fail_first = fail_first
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        query = parse_qs(request.content.decode())["data"][0]
+        names = list(dict.fromkeys(re.findall(r'\["name"="([^"]+)"\]', query)))
+        self.queries.append(names)
+        if self.fail_first:
+            self.fail_first -= 1
+            return httpx.Response(429)
+        if self.max_bodies is not None and len(names) > self.max_bodies:
+            return httpx.Response(400)
+        by_name = {wb["name"]: wb for wb in _BODIES}
+        elements = [_way(n, by_name[n]["lat_min"] + 0.1, by_name[n]["lon_min"] + 0.1) for n in names]
+        return httpx.Response(200, json={"elements": elements})
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self))
+
+
+class _FakeDb:
+    def __init__(self, names=()):
+        self.ids = {name: i + 1 for i, name in enumerate(names)}
+        self.statements: list[str] = []
+        self.commits = 0
+
+    def session(self):
+        return _FakeSession(self)
+
+
+class _FakeSession:
+    def __init__(self, db: _FakeDb):
+        self.db = db
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        self.db.statements.append(sql)
+        rows = []
+        if sql.startswith("SELECT name"):
+            rows = [(name,) for name in self.db.ids]
+        elif "RETURNING id, name" in sql:
+            for key, name in params.items():
+                if not key.startswith("name_"):
+                    continue
+                if name in self.db.ids and "DO NOTHING" in sql:
+                    continue
+                self.db.ids.setdefault(name, len(self.db.ids) + 1)
+                rows.append((self.db.ids[name], name))
+        return MagicMock(all=MagicMock(return_value=rows))
+
+    async def commit(self):
+        self.db.commits += 1
+
+
+@pytest.fixture
+def pipeline():
+    db = _FakeDb()
+    with patch("app.core.circuit_breaker.get_redis", new_callable=AsyncMock, return_value=None), \
+            patch.object(osm_polygon_importer, "async_session", lambda: db.session()), \
+            patch.object(osm_polygon_importer, "_LIMITER_POLL_SEC", 0.01), \
+            patch.object(osm_polygon_importer.settings, "POLYGON_IMPORT_GROUP_SIZE", 2), \
+            patch.object(osm_polygon_importer.settings, "POLYGON_IMPORT_WRITE_BATCH", 3):
+        yield db
+
+
+def _inserts(db: _FakeDb, table: str) -> list[str]:
+    return [s for s in db.statements if s.startswith(f"INSERT INTO {table} ")]
+
+
+class TestUnionQuery:
+    def test_all_bodies_in_one_query(self):
+        q = _build_union_query(_BODIES[:2])
+        assert q.count("out geom;") == 1
+        assert '"name"="Озеро 0"' in q and '"name"="Озеро 1"' in q
+
+    def test_quotes_in_name_are_escaped(self):
+        q = _build_union_query([_body('Озеро "Белое"', 59.0, 29.0)])
+        assert '["name"="Озеро \\"Белое\\""]' in q
+        assert "59.0,29.0,60.0,30.0" in q
+
+    def test_split_by_name_and_bbox(self):
+        stray = _way("Озеро 1", 10.0, 10.0, way_id=9)
+        data = {"elements": [_way("Озеро 0", 55.1, 30.1), _way("Озеро 1", 56.1, 31.1), stray, _way("Другое", 55.1, 30.1)]}
+        groups = _split_by_body(data, _BODIES[:2])
+        assert [e["id"] for e in groups["Озеро 0"]] == [1]
+        assert [e["id"] for e in groups["Озеро 1"]] == [1]
+
+
+class TestImportPipeline:
+    @pytest.mark.asyncio
+    async def test_groups_queries_and_batches_writes(self, pipeline):
+        overpass = _StubOverpass()
+        with patch.object(osm_polygon_importer, "get_http_client", return_value=overpass.client()):
+            imported = await import_water_bodies(_BODIES)
+
+        assert imported == 5
+        assert sorted(len(q) for q in overpass.queries) == [1, 2, 2]
+        assert set(pipeline.ids) == {wb["name"] for wb in _BODIES}
+        # Five polygons written in two multi-row statements, one commit each.
+        polygon_inserts = _inserts(pipeline, "water_body_polygons")
+        assert len(polygon_inserts) == 2
+        assert pipeline.commits == 2
+        assert all("ON CONFLICT (polygon_id, level)" in s for s in _inserts(pipeline, "water_body_polygon_levels"))
+
+    @pytest.mark.asyncio
+    async def test_failed_union_is_split(self, pipeline):
+        overpass = _StubOverpass(max_bodies=1)
+        with patch.object(osm_polygon_importer, "get_http_client", return_value=overpass.client()):
+            imported = await import_water_bodies(_BODIES[:2])
+
+        assert imported == 2
+        assert [len(q) for q in overpass.queries] == [2, 1, 1]
+
+    @pytest.mark.asyncio
+    async def test_split_halves_share_one_deadline(self, pipeline):
+        with patch.object(osm_polygon_importer, "_fetch_overpass", new_callable=AsyncMock) as mock_fetch:
+            mock_fetch.return_value = None
+            assert await osm_polygon_importer._fetch_group(_BODIES[:4]) == []
+
+        # 4 -> 2 + 2 -> 1 + 1 + 1 + 1, all against the group's deadline.
+        assert mock_fetch.await_count == 7
+        assert len({call.args[1] for call in mock_fetch.await_args_list}) == 1
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_stops_splitting(self, pipeline):
+        osm_polygon_importer.get_upstream_guard(OVERPASS).state = OPEN
+        with patch.object(osm_polygon_importer, "_fetch_overpass", new_callable=AsyncMock) as mock_fetch:
+            mock_fetch.return_value = None
+            assert await osm_polygon_importer._fetch_group(_BODIES[:4]) == []
+
+        assert mock_fetch.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_deadline_stops_splitting(self, pipeline):
+        overpass = _StubOverpass(max_bodies=1)
+        with patch.object(osm_polygon_importer, "get_http_client", return_value=overpass.client()), \
+                patch.object(osm_polygon_importer, "_FETCH_DEADLINE_SEC", 0.0):
+            assert await osm_polygon_importer._fetch_group(_BODIES[:4]) == []
+
+        assert overpass.queries == []
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_query_is_retried(self, pipeline):
+        overpass = _StubOverpass(fail_first=1)
+        with patch.object(osm_polygon_importer, "get_http_client", return_value=overpass.client()):
+            imported = await import_water_bodies(_BODIES[:1])
+
+        assert imported == 1
+        assert len(overpass.queries) == 2
+
+    @pytest.mark.asyncio
+    async def test_replace_upserts_existing(self, pipeline):
+        pipeline.ids = {"Озеро 0": 1}
+        overpass = _StubOverpass()
+        with patch.object(osm_polygon_importer, "get_http_client", return_value=overpass.client()):
+            assert await import_water_bodies(_BODIES[:1]) == 0
+            assert await import_water_bodies(_BODIES[:1], replace=True) == 1
+
+        assert "ON CONFLICT (name) DO UPDATE" in _inserts(pipeline, "water_body_polygons")[-1]
+
+    @pytest.mark.asyncio
+    async def test_store_polygon_levels_uses_shared_upsert(self):
+        db = _FakeDb()
+        square = [[[30.0, 60.0], [31.0, 60.0], [31.0, 61.0], [30.0, 61.0], [30.0, 60.0]]]
+
+        await osm_polygon_importer.store_polygon_levels(db.session(), 7, square)
+
+        (sql,) = _inserts(db, "water_body_polygon_levels")
+        assert sql.rstrip().endswith(osm_polygon_importer._LEVEL_CONFLICT_CLAUSE)
+
+
+class TestSeedResume:
+    @pytest.mark.asyncio
+    async def test_only_missing_bodies_are_fetched(self, pipeline):
+        pipeline.ids = {"Озеро 0": 1, "Озеро 1": 2}
+        overpass = _StubOverpass()
+        with patch.object(osm_polygon_importer, "WATER_BODIES", _BODIES), \
+                patch.object(osm_polygon_importer, "get_http_client", return_value=overpass.client()), \
+                patch.object(osm_polygon_importer, "after_polygons_changed", new_callable=AsyncMock) as changed:
+            await seed_missing_polygons()
+
+        fetched = {name for q in overpass.queries for name in q}
+        assert fetched == {"Озеро 2", "Озеро 3", "Озеро 4"}
+        changed.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_nothing_missing_skips_overpass(self, pipeline):
+        pipeline.ids = {wb["name"]: i for i, wb in enumerate(_BODIES)}
+        overpass = _StubOverpass()
+        with patch.object(osm_polygon_importer, "WATER_BODIES", _BODIES), \
+                patch.object(osm_polygon_importer, "get_http_client", return_value=overpass.client()):
+            await seed_missing_polygons()
 
-    def test_query_contains_bbox(self):
-        q = _build_overpass_query("Test", 59.0, 29.0, 61.0, 33.0)
-        assert "59.0,29.0,61.0,33.0" in q
+        assert overpass.queries == []
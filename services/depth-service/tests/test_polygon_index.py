@@ -0,0 +1,194 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services import gvr_cache, polygon_index
+from app.services.polygon_index import PolygonIndex, WaterPolygon, build_index, set_polygon_index
+
+
+def _square(lon0, lat0, size):
+    return [
+        [lon0, lat0], [lon0 + size, lat0], [lon0 + size, lat0 + size],
+        [lon0, lat0 + size], [lon0, lat0],
+    ]
+
+
+def _l_shape():
+    # Concave lake: the bbox covers (0..2, 0..2) but the top-right quadrant is land.
+    return [[0, 0], [2, 0], [2, 1], [1, 1], [1, 2], [0, 2], [0, 0]]
+
+
+class _Row:
+    def __init__(self, name, coordinates, max_depth=None, avg_depth=None, area_km2=None):
+        self.name = name
+        self.water_type = "lake"
+        self.coordinates = coordinates
+        self.max_depth = max_depth
+        self.avg_depth = avg_depth
+        self.area_km2 = area_km2
+        self.region = None
+
+
+class TestWaterPolygon:
+    def test_concave_polygon_excludes_bbox_corner(self):
+        poly = WaterPolygon("L", "lake", [_l_shape()])
+        assert poly.contains(0.5, 0.5)
+        assert poly.contains(0.5, 1.5)
+        assert not poly.contains(1.5, 1.5)
+
+    def test_inner_ring_is_hole(self):
+        poly = WaterPolygon("Ring", "lake", [_square(0, 0, 4), _square(1, 1, 2)])
+        assert poly.contains(0.5, 0.5)
+        assert not poly.contains(2.0, 2.0)
+
+    def test_open_ring_is_closed_implicitly(self):
+        poly = WaterPolygon("Open", "lake", [_square(0, 0, 1)[:-1]])
+        assert poly.contains(0.5, 0.5)
+        assert not poly.contains(1.5, 0.5)
+
+
+class TestPolygonIndex:
+    def test_candidates_match_brute_force(self):
+        polygons = [
+            WaterPolygon(f"p{i}-{j}", "lake", [_square(i * 0.5, j * 0.5, 0.7)])
+            for i in range(30) for j in range(30)
+        ]
+        index = PolygonIndex(polygons, node_capacity=4)
+        assert len(index) == 900
+
+        for lon, lat in [(0.1, 0.1), (3.6, 7.25), (14.9, 14.9), (20.0, 20.0), (-1.0, 5.0)]:
+            expected = {
+                p.name for p in polygons
+                if p.bbox[0] <= lon <= p.bbox[2] and p.bbox[1] <= lat <= p.bbox[3]
+            }
+            assert {p.name for p in index.candidates(lon, lat)} == expected
+
+    def test_find_prefers_polygon_containing_point(self):
+        index = PolygonIndex([
+            WaterPolygon("Concave", "lake", [_l_shape()], area_km2=10.0),
+            WaterPolygon("Corner", "lake", [_square(1.2, 1.2, 1.5)], area_km2=50.0),
+        ])
+        assert index.find(1.5, 1.5).name == "Corner"
+        assert index.find(0.5, 0.5).name == "Concave"
+        assert index.find(5.0, 5.0) is None
+
+    def test_find_nested_returns_smallest(self):
+        index = PolygonIndex([
+            WaterPolygon("Lake", "lake", [_square(0, 0, 10)], area_km2=1000.0),
+            WaterPolygon("Bay", "lake", [_square(1, 1, 1)], area_km2=5.0),
+        ])
+        assert index.find(1.5, 1.5).name == "Bay"
+        assert index.find(5.0, 5.0).name == "Lake"
+
+    def test_empty_index(self):
+        index = PolygonIndex([])
+        assert index.find(0.0, 0.0) is None
+
+    def test_build_index_parses_json_and_skips_degenerate(self):
+        import json
+
+        index = build_index([
+            _Row("A", json.dumps([_square(0, 0, 1)]), max_depth=5.0),
+            _Row("B", [[[0, 0], [1, 1]]]),
+        ])
+        assert len(index) == 1
+        assert index.find(0.5, 0.5).max_depth == 5.0
+
+
+class TestGvrPolygonIndex:
+    @pytest.fixture(autouse=True)
+    def _index(self):
+        set_polygon_index(PolygonIndex([
+            WaterPolygon("Озеро Неро", "lake", [_l_shape()], max_depth=4.0, area_km2=54.0),
+            WaterPolygon("Безглубинное", "lake", [_square(10, 10, 1)]),
+        ]), "0")
+        with patch.object(polygon_index, "cache_get_raw", new_callable=AsyncMock, return_value="0"):
+            yield
+        set_polygon_index(None)
+
+    @pytest.mark.asyncio
+    @patch("app.services.gvr_cache.async_session")
+    async def test_point_in_polygon_skips_database(self, mock_session):
+        result = await gvr_cache.query_water_body(0.5, 0.5)
+        assert result["name"] == "Озеро Неро"
+        assert result["depth"] == 4.0
+        assert result["depth_type"] == "max"
+        assert result["gvr_id"] is None
+        mock_session.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch("app.services.gvr_cache.async_session")
+    async def test_polygon_without_depth_answers_without_database(self, mock_session):
+        result = await gvr_cache.query_water_body(10.5, 10.5)
+        assert result["name"] == "Безглубинное"
+        assert result["has_data"] is False
+        assert result["depth"] is None
+        mock_session.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch("app.services.gvr_cache.async_session")
+    async def test_batch_only_queries_database_for_misses(self, mock_session):
+        session = AsyncMock()
+        session.execute.return_value.fetchall = lambda: []
+        mock_session.return_value.__aenter__.return_value = session
+
+        results = await gvr_cache.query_water_bodies_batch([(0.5, 0.5), (1.5, 1.5), (10.5, 10.5)])
+
+        assert results[0]["name"] == "Озеро Неро"
+        assert results[1] is None
+        assert results[2]["name"] == "Безглубинное" and results[2]["has_data"] is False
+        params = session.execute.call_args.args[1]
+        assert params == {"lats": [1.5], "lons": [1.5]}
+
+
+class TestCrossProcessRefresh:
+    @pytest.fixture(autouse=True)
+    def _index(self):
+        set_polygon_index(PolygonIndex([WaterPolygon("A", "lake", [_square(0, 0, 1)])]), "3")
+        polygon_index._checked_at = 0.0
+        yield
+        set_polygon_index(None)
+        polygon_index._checked_at = 0.0
+
+    @pytest.mark.asyncio
+    async def test_reloads_when_generation_moved(self):
+        with patch.object(polygon_index, "cache_get_raw", new_callable=AsyncMock, return_value="4"), \
+                patch.object(polygon_index, "refresh_polygon_index", new_callable=AsyncMock) as refresh:
+            await polygon_index.ensure_fresh_polygon_index()
+
+        refresh.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_same_generation_keeps_index(self):
+        with patch.object(polygon_index, "cache_get_raw", new_callable=AsyncMock, return_value="3"), \
+                patch.object(polygon_index, "refresh_polygon_index", new_callable=AsyncMock) as refresh:
+            await polygon_index.ensure_fresh_polygon_index()
+
+        refresh.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_checks_at_most_once_per_interval(self):
+        with patch.object(polygon_index, "cache_get_raw", new_callable=AsyncMock, return_value="3") as get:
+            await polygon_index.ensure_fresh_polygon_index()
+            await polygon_index.ensure_fresh_polygon_index()
+
+        get.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_startup_load_is_retried(self):
+        set_polygon_index(None)
+        with patch.object(polygon_index, "refresh_polygon_index", new_callable=AsyncMock) as refresh:
+            await polygon_index.ensure_fresh_polygon_index()
+            await polygon_index.ensure_fresh_polygon_index()
+            polygon_index._checked_at = 0.0
+            await polygon_index.ensure_fresh_polygon_index()
+
+        # Rate-limited like the generation check.
+        assert refresh.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate_bumps_generation(self):
+        with patch.object(polygon_index, "cache_incr", new_callable=AsyncMock, return_value=4) as incr:
+            await polygon_index.invalidate_polygon_index()
+
+        incr.assert_awaited_once_with("depth:polygons:gen")
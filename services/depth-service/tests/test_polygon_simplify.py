@@ -0,0 +1,131 @@
+import json
+import math
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.coord_codec import decode_rings
+from app.services.depth_areas import get_depth_areas
+from app.services.osm_polygon_importer import _level_rows
+from app.services.polygon_simplify import (
+    SIMPLIFY_LEVELS,
+    build_pyramid,
+    level_for_bbox,
+    simplify_ring,
+    simplify_rings,
+)
+
+
+def _lake(points=5000, lon=31.5, lat=60.8, r=0.5):
+    ring = []
+    for i in range(points):
+        t = 2 * math.pi * i / points
+        wobble = 1 + 0.05 * math.sin(40 * t) + 0.002 * math.sin(900 * t)
+        ring.append([lon + r * wobble * math.cos(t), lat + r * 0.6 * wobble * math.sin(t)])
+    ring.append(ring[0])
+    return [ring]
+
+
+class TestSimplifyRing:
+    def test_drops_points_within_tolerance(self):
+        ring = np.array([[0, 0], [50, 0.5], [100, 0], [100, 100], [50, 100], [0, 100]], dtype=float)
+        assert simplify_ring(ring, 2.0).tolist() == [[0, 0], [100, 0], [100, 100], [0, 100]]
+
+    def test_keeps_points_beyond_tolerance(self):
+        ring = np.array([[0, 0], [50, 5], [100, 0], [100, 100], [0, 100]], dtype=float)
+        assert len(simplify_ring(ring, 2.0)) == 5
+
+    def test_simplify_rings_keeps_rings_closed_and_drops_collapsed(self):
+        tiny = [[30.0, 60.0], [30.00001, 60.0], [30.0, 60.00001], [30.0, 60.0]]
+        result = simplify_rings(_lake(400) + [tiny], 0.01)
+        assert len(result) == 1
+        assert result[0][0] == result[0][-1]
+
+
+class TestPyramid:
+    def test_levels_get_monotonically_coarser(self):
+        rings = _lake()
+        pyramid = build_pyramid(rings)
+
+        assert [level for level, _, _ in pyramid] == list(range(1, len(SIMPLIFY_LEVELS) + 1))
+        counts = [sum(len(r) for r in simplified) for _, _, simplified in pyramid]
+        assert counts == sorted(counts, reverse=True)
+        assert counts[0] < len(rings[0])
+        assert counts[-1] * 50 < len(rings[0])
+
+    def test_coarse_level_payload_shrinks_by_order_of_magnitude(self):
+        rings = _lake()
+        coarse = build_pyramid(rings)[-2][2]
+        assert len(json.dumps(coarse)) * 10 < len(json.dumps(rings))
+
+    def test_deviation_bounded_by_cumulative_tolerance(self):
+        rings = _lake(2000)
+        original = np.asarray(rings[0][:-1])
+        budget = 0.0
+        for _, tolerance, simplified in build_pyramid(rings):
+            budget += tolerance
+            ring = np.asarray(simplified[0])
+            a, b = ring[:-1], ring[1:]
+            ab = b - a
+            t = np.einsum("psk,sk->ps", original[:, None, :] - a[None], ab) / np.einsum("sk,sk->s", ab, ab)
+            closest = a[None] + np.clip(t, 0, 1)[..., None] * ab[None]
+            distance = np.hypot(*(original[:, None, :] - closest).transpose(2, 0, 1)).min(axis=1)
+            # Allow for the coordinate rounding applied to each level.
+            assert distance.max() <= budget * 1.1
+
+
+class TestLevelForBbox:
+    def test_small_bbox_uses_original(self):
+        assert level_for_bbox(55.70, 37.60, 55.72, 37.63) == 0
+
+    def test_country_bbox_uses_coarsest(self):
+        assert level_for_bbox(41.0, 20.0, 70.0, 180.0) == len(SIMPLIFY_LEVELS)
+
+    def test_levels_increase_with_bbox_size(self):
+        levels = [level_for_bbox(55.0, 37.0, 55.0 + d, 37.0 + d) for d in (0.1, 0.5, 2, 8, 30)]
+        assert levels == sorted(levels)
+        assert len(set(levels)) > 2
+
+
+class TestLevelRows:
+    def test_one_row_per_level(self):
+        rows = _level_rows(7, _lake(1000))
+        assert [r["level"] for r in rows] == list(range(1, len(SIMPLIFY_LEVELS) + 1))
+        assert all(r["polygon_id"] == 7 for r in rows)
+        assert rows[0]["point_count"] == decode_rings(rows[0]["coordinates_bin"]).point_count
+
+
+class TestDepthAreasLevel:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "bbox,expected",
+        [((55.70, 37.60, 55.72, 37.63), 0), ((41.0, 20.0, 70.0, 180.0), len(SIMPLIFY_LEVELS))],
+    )
+    async def test_query_uses_level_for_bbox(self, bbox, expected):
+        session = AsyncMock()
+        session.stream.return_value = MagicMock()
+        session.stream.return_value.__aiter__.return_value = []
+        with patch("app.services.depth_areas.async_session") as mock_session:
+            mock_session.return_value.__aenter__.return_value = session
+            await get_depth_areas(*bbox)
+
+        params = session.stream.await_args_list[0].args[1]
+        assert params["level"] == expected
+
+    @pytest.mark.asyncio
+    async def test_drawn_width_changes_level(self):
+        session = AsyncMock()
+        session.stream.return_value = MagicMock()
+        session.stream.return_value.__aiter__.return_value = []
+        bbox = (55.0, 37.0, 57.0, 39.0)
+        with patch("app.services.depth_areas.async_session") as mock_session:
+            mock_session.return_value.__aenter__.return_value = session
+            await get_depth_areas(*bbox, pixels=256)
+            await get_depth_areas(*bbox, pixels=4096)
+
+        # Each call runs the polygon query, then the bbox fallback.
+        coarse, _, fine, _ = (call.args[1] for call in session.stream.await_args_list)
+        assert coarse["level"] > fine["level"]
+        assert coarse["limit"] == settings.DEPTH_AREAS_MAX_FEATURES
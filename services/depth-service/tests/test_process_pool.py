@@ -0,0 +1,94 @@
+import asyncio
+import time
+from io import BytesIO
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.core import process_pool
+from app.core.process_pool import (
+    ProcessPoolBusy,
+    close_process_pool,
+    init_process_pool,
+    process_pool_stats,
+    run_cpu,
+)
+from app.main import app
+from app.services.depth_colors import get_color_ramp
+from app.services.tile_recolor import recolor_tile
+
+
+def _make_png(r: int, g: int, b: int) -> bytes:
+    buf = BytesIO()
+    Image.new("RGBA", (4, 4), (r, g, b, 255)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+async def pool():
+    with patch.object(process_pool.settings, "PROCESS_POOL_WORKERS", 1), \
+            patch.object(process_pool.settings, "PROCESS_POOL_QUEUE_PER_WORKER", 1), \
+            patch.object(process_pool.settings, "PROCESS_POOL_WAIT_SEC", 0.05):
+        await init_process_pool()
+        try:
+            yield
+        finally:
+            await close_process_pool()
+
+
+class TestRunCpu:
+    @pytest.mark.asyncio
+    async def test_falls_back_to_thread_without_pool(self):
+        assert process_pool_stats()["workers"] == 0
+        assert await run_cpu(sum, [1, 2, 3]) == 6
+
+    @pytest.mark.asyncio
+    async def test_recolors_in_worker(self, pool):
+        raw = _make_png(32, 178, 219)
+        assert await run_cpu(recolor_tile, raw, "sport", get_color_ramp("sport")) == recolor_tile(raw, "sport")
+
+    @pytest.mark.asyncio
+    async def test_worker_adopts_callers_ramp(self, pool):
+        raw = _make_png(32, 178, 219)
+        tile = await run_cpu(recolor_tile, raw, "sport", [(0, 99999, "#102030")])
+
+        pixel = np.asarray(Image.open(BytesIO(tile)).convert("RGBA"))[0, 0]
+        assert tuple(pixel[:3]) == (0x10, 0x20, 0x30)
+        assert get_color_ramp("sport")[0][2] != "#102030"
+
+    @pytest.mark.asyncio
+    async def test_saturated_pool_rejects(self, pool):
+        await run_cpu(sum, [1])  # wait for the worker to start
+        slow_task = asyncio.ensure_future(run_cpu(time.sleep, 0.5))
+        await asyncio.sleep(0)
+        with pytest.raises(ProcessPoolBusy):
+            await run_cpu(sum, [1])
+        assert process_pool_stats()["pending"] == 1
+        await slow_task
+        assert process_pool_stats()["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_stats_count_waiting_callers(self, pool):
+        await run_cpu(sum, [1])
+        slow_task = asyncio.ensure_future(run_cpu(time.sleep, 0.2))
+        while process_pool_stats()["pending"] == 0:
+            await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(run_cpu(sum, [1]))
+        await asyncio.sleep(0)
+
+        assert process_pool_stats() == {"workers": 1, "pending": 1, "waiting": 1, "max_pending": 1}
+        with pytest.raises(ProcessPoolBusy):
+            await waiter
+        assert process_pool_stats()["waiting"] == 0
+        await slow_task
+
+
+def test_busy_pool_answers_503():
+    with patch("app.api.v1.endpoints.tiles.fetch_tile", new_callable=AsyncMock, side_effect=ProcessPoolBusy()):
+        response = TestClient(app).get("/api/v1/depth/tiles/5/10/10.png")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
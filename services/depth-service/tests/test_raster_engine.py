@@ -0,0 +1,256 @@
+import json
+import struct
+import zlib
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+from PIL import Image, TiffImagePlugin
+
+from app.services import depth_reader
+from app.services.raster_engine import GeoRaster, RasterFormatError, load_raster
+
+# 0.01 degree pixels, north-west corner at (lat 60.0, lon 30.0).
+_TRANSFORM = (30.0, 0.01, 0.0, 60.0, 0.0, -0.01)
+
+
+def _grid(height: int = 40, width: int = 50) -> np.ndarray:
+    rows, cols = np.mgrid[0:height, 0:width]
+    return (-(rows * 100 + cols)).astype(np.float32)
+
+
+def _geo_tags(ifd) -> None:
+    ifd[33550] = (0.01, 0.01, 0.0)
+    ifd.tagtype[33550] = 12
+    ifd[33922] = (0.0, 0.0, 0.0, 30.0, 60.0, 0.0)
+    ifd.tagtype[33922] = 12
+    ifd[42113] = "-32768"
+
+
+def _write_strip_tiff(path, grid: np.ndarray) -> None:
+    ifd = TiffImagePlugin.ImageFileDirectory_v2()
+    _geo_tags(ifd)
+    Image.fromarray(grid).save(path, tiffinfo=ifd)
+
+
+def _write_tiled_tiff(path, grid: np.ndarray, tile: int = 16, deflate: bool = False) -> None:
+    height, width = grid.shape
+    down, across = -(-height // tile), -(-width // tile)
+    padded = np.zeros((down * tile, across * tile), dtype="<f4")
+    padded[:height, :width] = grid
+
+    blocks = [
+        padded[r * tile:(r + 1) * tile, c * tile:(c + 1) * tile].tobytes()
+        for r in range(down)
+        for c in range(across)
+    ]
+    if deflate:
+        blocks = [zlib.compress(b) for b in blocks]
+    offsets = [8 + sum(len(b) for b in blocks[:i]) for i in range(len(blocks))]
+    ifd_offset = 8 + sum(len(b) for b in blocks)
+
+    ifd = TiffImagePlugin.ImageFileDirectory_v2(prefix=b"II")
+    compression = 8 if deflate else 1
+    for tag, value in [(256, width), (257, height), (259, compression), (262, 1), (277, 1), (322, tile), (323, tile)]:
+        ifd[tag] = value
+        ifd.tagtype[tag] = 4
+    ifd[258] = (32,)
+    ifd[339] = (3,)
+    ifd[324] = tuple(offsets)
+    ifd.tagtype[324] = 4
+    ifd[325] = tuple(len(b) for b in blocks)
+    ifd.tagtype[325] = 4
+    _geo_tags(ifd)
+
+    with open(path, "wb") as f:
+        f.write(b"II*\x00" + struct.pack("<I", ifd_offset))
+        f.write(b"".join(blocks))
+        f.write(ifd.tobytes(ifd_offset))
+
+
+@pytest.fixture(params=["npy", "strip_tiff", "tiled_tiff"])
+def raster_path(request, tmp_path):
+    grid = _grid()
+    if request.param == "npy":
+        path = tmp_path / "gebco.npy"
+        np.save(path, grid)
+        path.with_suffix(".json").write_text(json.dumps({"transform": _TRANSFORM, "nodata": -32768}))
+    elif request.param == "strip_tiff":
+        path = tmp_path / "gebco.tif"
+        _write_strip_tiff(path, grid)
+    else:
+        path = tmp_path / "gebco.tif"
+        _write_tiled_tiff(path, grid)
+    return path
+
+
+class TestLoadRaster:
+    def test_shape_and_transform(self, raster_path):
+        raster = load_raster(raster_path)
+        assert raster.shape == (40, 50)
+        assert raster.transform == pytest.approx(_TRANSFORM)
+        assert raster.nodata == -32768
+
+    def test_nearest_sample(self, raster_path):
+        raster = load_raster(raster_path)
+        # Row 12, column 34 covers lat (59.87, 59.88], lon [30.34, 30.35).
+        assert raster.sample(59.875, 30.345) == -1234.0
+
+    def test_outside_coverage(self, raster_path):
+        raster = load_raster(raster_path)
+        assert raster.sample(61.0, 30.1) is None
+        assert raster.sample_bilinear(59.9, 29.0) is None
+
+    def test_unsupported_suffix(self, tmp_path):
+        with pytest.raises(RasterFormatError):
+            load_raster(tmp_path / "gebco.nc")
+
+
+class TestGeoRasterSampling:
+    def test_get_coord_is_exact_affine(self):
+        raster = GeoRaster(_grid(), _TRANSFORM)
+        row, col = raster.get_coord(59.5, 30.25)
+        assert row == pytest.approx(50.0)
+        assert col == pytest.approx(25.0)
+
+    def test_bilinear_at_pixel_centre_equals_value(self):
+        raster = GeoRaster(_grid(), _TRANSFORM)
+        assert raster.sample_bilinear(59.875, 30.345) == pytest.approx(-1234.0)
+
+    def test_bilinear_between_centres(self):
+        raster = GeoRaster(_grid(), _TRANSFORM)
+        # Halfway between columns 34 and 35 and rows 12 and 13.
+        assert raster.sample_bilinear(59.87, 30.35) == pytest.approx(-1284.5)
+
+    def test_nodata_ignored(self):
+        grid = _grid()
+        grid[12, 34] = -32768
+        raster = GeoRaster(grid, _TRANSFORM, nodata=-32768)
+        assert raster.sample(59.875, 30.345) is None
+        assert raster.sample_bilinear(59.87, 30.35) != pytest.approx(-32768, abs=1000)
+
+    def test_rotated_transform_rejected(self):
+        with pytest.raises(RasterFormatError):
+            GeoRaster(_grid(), (30.0, 0.01, 0.001, 60.0, 0.0, -0.01))
+
+
+class TestQueryDepthLocalRaster:
+    async def test_water_point_uses_local_raster(self):
+        raster = GeoRaster(_grid(), _TRANSFORM)
+        with patch.object(depth_reader, "_RASTER", raster), patch.object(
+            depth_reader.settings, "GEBCO_RASTER_BILINEAR", False
+        ), patch.object(depth_reader, "_query_gebco_api") as mock_api:
+            result = await depth_reader.query_depth(59.875, 30.345)
+
+        assert result["has_data"] is True
+        assert result["depth"] == 1234.0
+        mock_api.assert_not_called()
+
+    async def test_land_point_has_no_depth(self):
+        grid = np.full((40, 50), 15.0, dtype=np.float32)
+        with patch.object(depth_reader, "_RASTER", GeoRaster(grid, _TRANSFORM)):
+            result = await depth_reader.query_depth(59.875, 30.345)
+
+        assert result["has_data"] is False
+        assert result["depth"] is None
+
+    async def test_uncovered_point_falls_back_to_wms(self):
+        fallback = {"depth": 5.0, "source": "GEBCO_2024", "accuracy_m": 463, "has_data": True}
+        with patch.object(depth_reader, "_RASTER", GeoRaster(_grid(), _TRANSFORM)), patch.object(
+            depth_reader, "_query_gebco_api", return_value=fallback
+        ) as mock_api, patch.object(
+            depth_reader, "cache_get", new_callable=AsyncMock, return_value=None
+        ), patch.object(depth_reader, "cache_set", new_callable=AsyncMock):
+            result = await depth_reader.query_depth(10.0, 10.0)
+
+        assert result == fallback
+        mock_api.assert_called_once_with(10.0, 10.0)
+
+
+class TestGebcoCellCache:
+    def test_points_in_one_cell_share_key(self):
+        assert depth_reader._gebco_cache_key(44.0001, 38.0001) == depth_reader._gebco_cache_key(44.003, 38.003)
+        assert depth_reader._gebco_cache_key(44.0, 38.0) != depth_reader._gebco_cache_key(44.0, 38.005)
+
+    async def test_cell_hit_skips_wms(self):
+        cached = {"depth": 7.0, "source": "GEBCO_2024", "accuracy_m": 463, "has_data": True}
+        with patch.object(depth_reader, "_RASTER", None), patch.object(
+            depth_reader, "cache_get", new_callable=AsyncMock, return_value=cached
+        ) as mock_get, patch.object(depth_reader, "_query_gebco_api") as mock_api:
+            result = await depth_reader.query_depth(44.0, 38.0)
+
+        assert result == cached
+        mock_get.assert_awaited_once_with(depth_reader._gebco_cache_key(44.0, 38.0))
+        mock_api.assert_not_called()
+
+    async def test_miss_caches_wms_answer(self):
+        answer = {"depth": 7.0, "source": "GEBCO_2024", "accuracy_m": 463, "has_data": True}
+        with patch.object(depth_reader, "_RASTER", None), patch.object(
+            depth_reader, "cache_get", new_callable=AsyncMock, return_value=None
+        ), patch.object(depth_reader, "cache_set", new_callable=AsyncMock) as mock_set, patch.object(
+            depth_reader, "_query_gebco_api", new_callable=AsyncMock, return_value=answer
+        ):
+            result = await depth_reader.query_depth(44.0, 38.0)
+
+        assert result == answer
+        key, entry = mock_set.await_args.args
+        assert key == depth_reader._gebco_cache_key(44.0, 38.0)
+        assert entry == answer
+        assert mock_set.await_args.kwargs["ttl"] == depth_reader.settings.DEPTH_CACHE_TTL
+
+    async def test_upstream_failure_not_cached(self):
+        async def failing(lat, lon):
+            depth_reader.record_upstream_error("gebco")
+            return {"depth": None, "source": None, "accuracy_m": None, "has_data": False}
+
+        with patch.object(depth_reader, "_RASTER", None), patch.object(
+            depth_reader, "cache_get", new_callable=AsyncMock, return_value=None
+        ), patch.object(depth_reader, "cache_set", new_callable=AsyncMock) as mock_set, patch.object(
+            depth_reader, "_query_gebco_api", side_effect=failing
+        ), depth_reader.track_upstream_errors() as failures:
+            await depth_reader.query_depth(44.0, 38.0)
+
+        mock_set.assert_not_awaited()
+        assert failures == {"gebco"}
+
+
+class TestConvertGeotiff:
+    def test_compressed_tiff_converted_to_npy(self, tmp_path):
+        from app.seed.convert_gebco_raster import convert_geotiff
+
+        source = tmp_path / "gebco.tif"
+        ifd = TiffImagePlugin.ImageFileDirectory_v2()
+        _geo_tags(ifd)
+        Image.fromarray(_grid()).save(source, tiffinfo=ifd, compression="tiff_deflate")
+        with pytest.raises(RasterFormatError):
+            load_raster(source)
+
+        target = convert_geotiff(source, tmp_path / "gebco")
+        raster = load_raster(target)
+        assert raster.sample(59.875, 30.345) == -1234.0
+        assert raster.transform == pytest.approx(_TRANSFORM)
+
+    @pytest.mark.parametrize("compression", ["tiff_deflate", "tiff_lzw"])
+    def test_multi_strip_integer_tiff(self, tmp_path, compression):
+        from app.seed.convert_gebco_raster import convert_geotiff
+
+        grid = (_grid() / 10).astype(np.int32)
+        source = tmp_path / "gebco.tif"
+        ifd = TiffImagePlugin.ImageFileDirectory_v2()
+        _geo_tags(ifd)
+        # 600-byte strips: three rows each, the last one short.
+        Image.fromarray(grid).save(source, tiffinfo=ifd, compression=compression, strip_size=600)
+
+        target = convert_geotiff(source, tmp_path / "gebco")
+        converted = np.load(target, mmap_mode="r")
+        assert converted.dtype == np.int32
+        np.testing.assert_array_equal(converted, grid)
+
+    def test_compressed_tiled_tiff(self, tmp_path):
+        from app.seed.convert_gebco_raster import convert_geotiff
+
+        source = tmp_path / "gebco.tif"
+        _write_tiled_tiff(source, _grid(), deflate=True)
+
+        target = convert_geotiff(source, tmp_path / "gebco")
+        np.testing.assert_array_equal(np.load(target), _grid())
@@ -0,0 +1,99 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.seed import seed_tiles as seed
+from app.seed.seed_tiles import Checkpoint, iter_body_tiles, seed_tiles
+from app.services.tile_store import FileTileStore
+
+_BODY = {"name": "Тестовое озеро", "lat_min": 60.0, "lon_min": 30.0, "lat_max": 60.5, "lon_max": 31.0}
+_SCHEMES = ["navionics", "sport"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = FileTileStore(tmp_path)
+    with patch("app.seed.seed_tiles.get_tile_store", return_value=s), \
+            patch("app.seed.seed_tiles.settings.TILE_RECOLOR", False), \
+            patch("app.seed.seed_tiles._RETRY_DELAY_SEC", 0):
+        yield s
+    s.close()
+
+
+def _tile_count(z):
+    return len(list(iter_body_tiles(_BODY, z)))
+
+
+class TestIterBodyTiles:
+    def test_covers_bbox(self):
+        tiles = list(iter_body_tiles(_BODY, 8))
+        assert tiles == [(149, 73), (149, 74), (150, 73), (150, 74)]
+
+    def test_low_zoom_is_single_tile(self):
+        assert list(iter_body_tiles(_BODY, 2)) == [(2, 1)]
+
+
+class TestSeedTiles:
+    @pytest.mark.asyncio
+    async def test_writes_every_scheme(self, store):
+        fetch = AsyncMock(return_value=b"raw")
+        with patch("app.seed.seed_tiles.fetch_raw_tile", fetch):
+            stats = await seed_tiles([_BODY], min_zoom=7, max_zoom=8, schemes=_SCHEMES)
+
+        total = _tile_count(7) + _tile_count(8)
+        assert stats == {"seeded": total, "skipped": 0, "failed": 0}
+        assert fetch.await_count == total
+        for scheme in _SCHEMES:
+            assert store.get(scheme, 8, 149, 73) == b"raw"
+
+    @pytest.mark.asyncio
+    async def test_existing_tiles_are_skipped(self, store):
+        for scheme in _SCHEMES:
+            store.put(scheme, 2, 2, 1, b"old")
+        fetch = AsyncMock(return_value=b"raw")
+        with patch("app.seed.seed_tiles.fetch_raw_tile", fetch):
+            stats = await seed_tiles([_BODY], min_zoom=2, max_zoom=2, schemes=_SCHEMES)
+
+        assert stats["skipped"] == 1
+        fetch.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_overlapping_bodies_seed_tile_once(self, store):
+        inner = {**_BODY, "name": "Залив", "lat_max": 60.2, "lon_max": 30.2}
+        fetch = AsyncMock(return_value=b"raw")
+        with patch("app.seed.seed_tiles.fetch_raw_tile", fetch):
+            await seed_tiles([_BODY, inner], min_zoom=2, max_zoom=2, schemes=_SCHEMES)
+
+        assert fetch.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_checkpoint_resumes(self, store, tmp_path):
+        path = tmp_path / "checkpoint.json"
+        fetch = AsyncMock(return_value=b"raw")
+        with patch("app.seed.seed_tiles.fetch_raw_tile", fetch):
+            await seed_tiles([_BODY], min_zoom=2, max_zoom=3, schemes=_SCHEMES, checkpoint=Checkpoint(path))
+            fetch.reset_mock()
+            stats = await seed_tiles([_BODY], min_zoom=2, max_zoom=3, schemes=_SCHEMES, checkpoint=Checkpoint(path))
+
+        assert stats == {"seeded": 0, "skipped": 0, "failed": 0}
+        fetch.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_failed_level_is_not_checkpointed(self, store, tmp_path):
+        checkpoint = Checkpoint(tmp_path / "checkpoint.json")
+        fetch = AsyncMock(return_value=None)
+        with patch("app.seed.seed_tiles.fetch_raw_tile", fetch):
+            stats = await seed_tiles([_BODY], min_zoom=2, max_zoom=2, schemes=_SCHEMES, checkpoint=checkpoint)
+
+        assert stats["failed"] == 1
+        assert fetch.await_count == seed._FETCH_ATTEMPTS
+        assert Checkpoint.key(_BODY, 2, _SCHEMES) not in Checkpoint(tmp_path / "checkpoint.json").done
+
+    @pytest.mark.asyncio
+    async def test_retry_recovers_transient_failure(self, store):
+        fetch = AsyncMock(side_effect=[None, b"raw"])
+        with patch("app.seed.seed_tiles.fetch_raw_tile", fetch):
+            stats = await seed_tiles([_BODY], min_zoom=2, max_zoom=2, schemes=_SCHEMES)
+
+        assert stats["seeded"] == 1
+        assert store.get("sport", 2, 2, 1) == b"raw"
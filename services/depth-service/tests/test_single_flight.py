@@ -0,0 +1,175 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.core import single_flight
+from app.core.single_flight import SingleFlight
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def eval(self, script, numkeys, key, token):
+        if self.data.get(key) != token:
+            return 0
+        del self.data[key]
+        return 1
+
+
+class TestSingleFlightInProcess:
+    async def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def work(value):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return value * 2
+
+        results = await asyncio.gather(*(flight.do("k", work, 21) for _ in range(10)))
+
+        assert results == [42] * 10
+        assert calls == 1
+        assert "k" not in flight
+
+    async def test_distinct_keys_run_separately(self):
+        flight = SingleFlight("test")
+        work = AsyncMock(side_effect=lambda v: v)
+
+        results = await asyncio.gather(flight.do("a", work, 1), flight.do("b", work, 2))
+
+        assert results == [1, 2]
+        assert work.await_count == 2
+
+    async def test_exception_propagates_to_all_waiters(self):
+        flight = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(
+            flight.do("k", fail), flight.do("k", fail), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert "k" not in flight
+
+    async def test_cancelled_waiter_does_not_cancel_leader(self):
+        flight = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "done"
+
+
+class TestSingleFlightDistributed:
+    async def test_follower_uses_recheck_after_lock_release(self):
+        redis = FakeRedis()
+        redis.data["singleflight:test:k"] = "1"
+        recheck = AsyncMock(return_value=b"cached")
+        work = AsyncMock(return_value=b"fresh")
+        flight = SingleFlight("test", recheck=recheck)
+
+        async def release_lock():
+            await asyncio.sleep(0.06)
+            await redis.delete("singleflight:test:k")
+
+        with patch.object(single_flight.settings, "SINGLE_FLIGHT_REDIS", True), patch(
+            "app.core.single_flight.get_redis", new_callable=AsyncMock, return_value=redis
+        ):
+            result, _ = await asyncio.gather(flight.do("k", work, 1), release_lock())
+
+        assert result == b"cached"
+        recheck.assert_awaited_once_with(1)
+        work.assert_not_awaited()
+
+    async def test_leader_publishes_result_without_recheck(self):
+        redis = FakeRedis()
+        flight = SingleFlight("test")
+        work = AsyncMock(return_value={"depth": 5.0})
+
+        with patch.object(single_flight.settings, "SINGLE_FLIGHT_REDIS", True), patch(
+            "app.core.single_flight.get_redis", new_callable=AsyncMock, return_value=redis
+        ):
+            result = await flight.do("k", work)
+
+        assert result == {"depth": 5.0}
+        assert json.loads(redis.data["singleflight:test:k:result"]) == {"depth": 5.0}
+        assert "singleflight:test:k" not in redis.data
+
+    async def test_falls_back_to_local_when_redis_unavailable(self):
+        flight = SingleFlight("test")
+        work = AsyncMock(return_value="local")
+
+        with patch.object(single_flight.settings, "SINGLE_FLIGHT_REDIS", True), patch(
+            "app.core.single_flight.get_redis", new_callable=AsyncMock, return_value=None
+        ):
+            assert await flight.do("k", work) == "local"
+
+    async def test_leader_does_not_release_lock_taken_over_by_another_worker(self):
+        redis = FakeRedis()
+        flight = SingleFlight("test")
+
+        async def work():
+            # Our lock expired mid-call and another worker took it.
+            redis.data["singleflight:test:k"] = "other-token"
+            return {"depth": 5.0}
+
+        with patch.object(single_flight.settings, "SINGLE_FLIGHT_REDIS", True), patch(
+            "app.core.single_flight.get_redis", new_callable=AsyncMock, return_value=redis
+        ):
+            await flight.do("k", work)
+
+        assert redis.data["singleflight:test:k"] == "other-token"
+
+    async def test_follower_runs_locally_when_redis_fails_while_waiting(self):
+        redis = FakeRedis()
+        redis.data["singleflight:test:k"] = "leader-token"
+        redis.exists = AsyncMock(side_effect=RedisConnectionError("connection lost"))
+        work = AsyncMock(return_value="local")
+        flight = SingleFlight("test")
+
+        with patch.object(single_flight.settings, "SINGLE_FLIGHT_REDIS", True), patch(
+            "app.core.single_flight.get_redis", new_callable=AsyncMock, return_value=redis
+        ):
+            assert await flight.do("k", work) == "local"
+
+        work.assert_awaited_once()
+
+    async def test_leader_returns_result_when_release_fails(self):
+        redis = FakeRedis()
+        redis.eval = AsyncMock(side_effect=RedisConnectionError("connection lost"))
+        flight = SingleFlight("test")
+
+        with patch.object(single_flight.settings, "SINGLE_FLIGHT_REDIS", True), patch(
+            "app.core.single_flight.get_redis", new_callable=AsyncMock, return_value=redis
+        ):
+            assert await flight.do("k", AsyncMock(return_value={"depth": 5.0})) == {"depth": 5.0}
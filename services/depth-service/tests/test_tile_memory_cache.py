@@ -0,0 +1,51 @@
+from app.services.tile_memory_cache import TileLRUCache
+from app.services.tile_store import tile_etag
+
+
+class TestTileLRUCache:
+    def test_miss_then_hit(self):
+        cache = TileLRUCache(max_bytes=100)
+        assert cache.get(("navionics", 1, 0, 0)) is None
+        cache.put(("navionics", 1, 0, 0), b"abc")
+        assert cache.get(("navionics", 1, 0, 0)) == b"abc"
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = TileLRUCache(max_bytes=10)
+        cache.put(("raw", 1, 0, 0), b"aaaa")
+        cache.put(("raw", 1, 0, 1), b"bbbb")
+        cache.get(("raw", 1, 0, 0))
+        cache.put(("raw", 1, 1, 0), b"cccc")
+
+        assert cache.get(("raw", 1, 0, 1)) is None
+        assert cache.get(("raw", 1, 0, 0)) == b"aaaa"
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["bytes"] == 8
+
+    def test_replacing_entry_updates_size(self):
+        cache = TileLRUCache(max_bytes=100)
+        cache.put(("raw", 1, 0, 0), b"aaaa")
+        cache.put(("raw", 1, 0, 0), b"aa")
+        assert cache.stats()["bytes"] == 2
+        assert len(cache) == 1
+
+    def test_oversized_tile_not_cached(self):
+        cache = TileLRUCache(max_bytes=3)
+        cache.put(("raw", 1, 0, 0), b"aaaa")
+        assert len(cache) == 0
+
+    def test_invalidate_scheme(self):
+        cache = TileLRUCache(max_bytes=100)
+        cache.put(("sport", 1, 0, 0), b"a")
+        cache.put(("navionics", 1, 0, 0), b"b")
+        cache.invalidate_scheme("sport")
+        assert cache.get(("sport", 1, 0, 0)) is None
+        assert cache.get(("navionics", 1, 0, 0)) == b"b"
+        assert cache.stats()["bytes"] == 1
+
+    def test_etag_kept_with_entry(self):
+        cache = TileLRUCache(max_bytes=100)
+        assert cache.get_etag(("raw", 1, 0, 0)) is None
+        cache.put(("raw", 1, 0, 0), b"abc")
+        assert cache.get_etag(("raw", 1, 0, 0)) == tile_etag(b"abc")
@@ -1,5 +1,8 @@
 
-from app.services.tile_recolor import recolor_tile, _estimate_depth_from_pixel, _depth_to_scheme_rgb
+import numpy as np
+
+from app.services.depth_lut import _scheme_rgb, estimate_depth
+from app.services.tile_recolor import recolor_tile, _recolor_array
 
 
 def _make_png(r: int, g: int, b: int) -> bytes:
@@ -12,33 +15,33 @@ def _make_png(r: int, g: int, b: int) -> bytes:
     return buf.getvalue()
 
 
-class TestEstimateDepthFromPixel:
+class TestEstimateDepth:
     def test_deep_water(self):
-        depth = _estimate_depth_from_pixel(0, 10, 59)
+        depth = estimate_depth(0, 10, 59)
         assert depth is not None
         assert depth > 4000
 
     def test_shallow_water(self):
-        depth = _estimate_depth_from_pixel(200, 220, 240)
+        depth = estimate_depth(200, 220, 240)
         assert depth is not None
         assert depth < 100
 
     def test_land_returns_none(self):
-        depth = _estimate_depth_from_pixel(100, 150, 100)
+        depth = estimate_depth(100, 150, 100)
         assert depth is None
 
     def test_white_returns_none(self):
-        depth = _estimate_depth_from_pixel(255, 255, 255)
+        depth = estimate_depth(255, 255, 255)
         assert depth is None
 
 
-class TestDepthToSchemeRGB:
+class TestSchemeRGB:
     def test_shallow_navionics(self):
-        rgb = _depth_to_scheme_rgb(1.0, "navionics")
+        rgb = _scheme_rgb(1.0, "navionics")
         assert rgb == (179, 229, 252)
 
     def test_deep_navionics(self):
-        rgb = _depth_to_scheme_rgb(30.0, "navionics")
+        rgb = _scheme_rgb(30.0, "navionics")
         assert rgb == (26, 35, 126)
 
 
@@ -60,3 +63,29 @@ class TestRecolorTile:
         raw = b"not_a_png"
         result = recolor_tile(raw, "navionics")
         assert result == raw
+
+
+class TestVectorizedRecolor:
+    def test_recolor_array_matches_per_pixel(self):
+        rng = np.random.default_rng(42)
+        rgba = rng.integers(0, 256, size=(32, 32, 4), dtype=np.uint8)
+        rgba[..., 3] = np.where(rng.random((32, 32)) < 0.2, 0, 255)
+
+        for scheme in ("navionics", "contrast", "sport"):
+            out = _recolor_array(rgba, scheme)
+            for y in range(32):
+                for x in range(32):
+                    r, g, b, a = (int(v) for v in rgba[y, x])
+                    if a == 0:
+                        expected = (r, g, b, a)
+                    else:
+                        depth = estimate_depth(r, g, b)
+                        if depth is None:
+                            expected = (0, 0, 0, 0)
+                        else:
+                            expected = (*_scheme_rgb(depth, scheme), 180)
+                    assert tuple(out[y, x]) == expected
+
+    def test_recolor_tile_is_deterministic(self):
+        raw = _make_png(32, 178, 219)
+        assert recolor_tile(raw, "sport") == recolor_tile(raw, "sport")
@@ -0,0 +1,104 @@
+import sqlite3
+
+import pytest
+
+from app.seed.import_tile_cache import import_tile_tree
+from app.services.tile_store import FileTileStore, MBTilesTileStore, tile_etag
+
+
+@pytest.fixture(params=["files", "mbtiles"])
+def store(request, tmp_path):
+    if request.param == "files":
+        s = FileTileStore(tmp_path)
+    else:
+        s = MBTilesTileStore(tmp_path)
+    yield s
+    s.close()
+
+
+class TestTileStoreRoundTrip:
+    def test_missing_tile_returns_none(self, store):
+        assert store.get("raw", 3, 1, 2) is None
+
+    def test_put_then_get(self, store):
+        store.put("navionics", 3, 1, 2, b"tile")
+        assert store.get("navionics", 3, 1, 2) == b"tile"
+        assert store.get("contrast", 3, 1, 2) is None
+
+    def test_put_replaces_existing(self, store):
+        store.put("raw", 3, 1, 2, b"old")
+        store.put("raw", 3, 1, 2, b"new")
+        assert store.get("raw", 3, 1, 2) == b"new"
+
+    def test_put_many(self, store):
+        count = store.put_many("raw", [(4, x, 5, bytes([x])) for x in range(10)])
+        assert count == 10
+        assert store.get("raw", 4, 7, 5) == b"\x07"
+
+    def test_etag_stored_with_tile(self, store):
+        assert store.get_etag("raw", 3, 1, 2) is None
+        store.put("raw", 3, 1, 2, b"tile")
+        assert store.get_etag("raw", 3, 1, 2) == tile_etag(b"tile")
+
+    def test_delete_layer(self, store):
+        store.put("sport", 1, 0, 0, b"a")
+        store.put("raw", 1, 0, 0, b"b")
+        store.delete_layer("sport")
+        assert store.get("sport", 1, 0, 0) is None
+        assert store.get("raw", 1, 0, 0) == b"b"
+
+
+class TestMBTilesLayout:
+    def test_rows_are_tms_flipped(self, tmp_path):
+        store = MBTilesTileStore(tmp_path)
+        store.put("raw", 2, 1, 0, b"tile")
+        store.close()
+
+        conn = sqlite3.connect(tmp_path / "raw.mbtiles")
+        row = conn.execute("SELECT zoom_level, tile_column, tile_row FROM tiles").fetchone()
+        conn.close()
+        assert row == (2, 1, 3)
+
+    def test_wal_mode_enabled(self, tmp_path):
+        store = MBTilesTileStore(tmp_path)
+        store.put("raw", 0, 0, 0, b"tile")
+        store.close()
+
+        conn = sqlite3.connect(tmp_path / "raw.mbtiles")
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        metadata = dict(conn.execute("SELECT name, value FROM metadata").fetchall())
+        conn.close()
+        assert mode == "wal"
+        assert metadata["format"] == "png"
+
+    def test_adds_etag_column_to_existing_file(self, tmp_path):
+        conn = sqlite3.connect(tmp_path / "raw.mbtiles")
+        conn.execute(
+            "CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER,"
+            " tile_row INTEGER, tile_data BLOB)"
+        )
+        conn.commit()
+        conn.close()
+
+        store = MBTilesTileStore(tmp_path)
+        store.put("raw", 0, 0, 0, b"tile")
+        assert store.get_etag("raw", 0, 0, 0) == tile_etag(b"tile")
+        store.close()
+
+
+class TestImportTileTree:
+    def test_imports_every_layer(self, tmp_path):
+        source = tmp_path / "tiles"
+        for layer, z, x, y in [("raw", 5, 20, 10), ("raw", 5, 20, 11), ("navionics", 5, 20, 10)]:
+            path = source / layer / str(z) / str(x) / f"{y}.png"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(f"{layer}-{y}".encode())
+        (source / "raw" / "5" / "20" / "notes.png").write_bytes(b"skip")
+
+        store = MBTilesTileStore(tmp_path / "mbtiles")
+        imported = import_tile_tree(source, store, batch_size=1)
+
+        assert imported == {"navionics": 1, "raw": 2}
+        assert store.get("raw", 5, 20, 11) == b"raw-11"
+        assert store.get("navionics", 5, 20, 10) == b"navionics-10"
+        store.close()
@@ -0,0 +1,395 @@
+import asyncio
+import json
+import math
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import vector_tiles
+from app.services.mvt_encoder import LayerBuilder, encode_tile, ring_area
+from app.services.polygon_simplify import simplify_ring
+from app.services.tile_memory_cache import tile_memory_cache
+from app.services.tile_store import FileTileStore, tile_etag
+
+client = TestClient(app)
+
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        shift += 7
+        if not b & 0x80:
+            return result, pos
+
+
+def _fields(buf):
+    pos = 0
+    while pos < len(buf):
+        key, pos = _read_varint(buf, pos)
+        field, wire = key >> 3, key & 7
+        if wire == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire == 1:
+            value, pos = buf[pos:pos + 8], pos + 8
+        else:
+            length, pos = _read_varint(buf, pos)
+            value, pos = buf[pos:pos + length], pos + length
+        yield field, value
+
+
+def _packed(buf):
+    pos, out = 0, []
+    while pos < len(buf):
+        v, pos = _read_varint(buf, pos)
+        out.append(v)
+    return out
+
+
+def _unzigzag(v):
+    return (v >> 1) ^ -(v & 1)
+
+
+def _decode_geometry(cmds):
+    rings, ring, i, cx, cy = [], [], 0, 0, 0
+    while i < len(cmds):
+        cmd, count = cmds[i] & 7, cmds[i] >> 3
+        i += 1
+        if cmd == 7:
+            rings.append(ring)
+            ring = []
+            continue
+        for _ in range(count):
+            cx += _unzigzag(cmds[i])
+            cy += _unzigzag(cmds[i + 1])
+            i += 2
+            if cmd == 1 and ring:
+                rings.append(ring)
+                ring = []
+            ring.append((cx, cy))
+    if ring:
+        rings.append(ring)
+    return rings
+
+
+def decode_tile(data):
+    import struct
+
+    layers = {}
+    for field, layer_buf in _fields(data):
+        assert field == 3
+        name, keys, values, raw_features, extent, version = None, [], [], [], None, None
+        for f, v in _fields(layer_buf):
+            if f == 1:
+                name = v.decode()
+            elif f == 2:
+                raw_features.append(v)
+            elif f == 3:
+                keys.append(v.decode())
+            elif f == 4:
+                (vf, vv), = list(_fields(v))
+                values.append({1: lambda: vv.decode(), 3: lambda: struct.unpack("<d", vv)[0],
+                               6: lambda: _unzigzag(vv), 7: lambda: bool(vv)}[vf]())
+            elif f == 5:
+                extent = v
+            elif f == 15:
+                version = v
+        features = []
+        for raw in raw_features:
+            feat = {"id": None, "props": {}}
+            for f, v in _fields(raw):
+                if f == 1:
+                    feat["id"] = v
+                elif f == 2:
+                    tags = _packed(v)
+                    feat["props"] = {keys[k]: values[t] for k, t in zip(tags[::2], tags[1::2])}
+                elif f == 3:
+                    feat["type"] = v
+                elif f == 4:
+                    feat["geometry"] = _decode_geometry(_packed(v))
+            features.append(feat)
+        layers[name] = {"extent": extent, "version": version, "features": features}
+    return layers
+
+
+class _PolygonRow:
+    def __init__(self, name, coordinates, max_depth=None, avg_depth=None, area_km2=None,
+                 centroid=None):
+        self.name = name
+        self.water_type = "lake"
+        self.coordinates = coordinates
+        self.max_depth = max_depth
+        self.avg_depth = avg_depth
+        self.area_km2 = area_km2
+        self.region = "Тест"
+        ring = coordinates[0]
+        self.centroid_lon = centroid[0] if centroid else sum(p[0] for p in ring) / len(ring)
+        self.centroid_lat = centroid[1] if centroid else sum(p[1] for p in ring) / len(ring)
+
+
+class _BBoxRow:
+    def __init__(self, name, lon_min, lat_min, lon_max, lat_max, max_depth=None):
+        self.name = name
+        self.water_type = "lake"
+        self.lon_min, self.lat_min, self.lon_max, self.lat_max = lon_min, lat_min, lon_max, lat_max
+        self.centroid_lon = (lon_min + lon_max) / 2
+        self.centroid_lat = (lat_min + lat_max) / 2
+        self.max_depth = max_depth
+        self.avg_depth = None
+        self.area_km2 = None
+        self.region = None
+
+
+def _tile_for(lon, lat, z):
+    n = 2 ** z
+    x = int((lon + 180) / 360 * n)
+    lat_r = math.radians(lat)
+    y = int((1 - math.log(math.tan(lat_r) + 1 / math.cos(lat_r)) / math.pi) / 2 * n)
+    return x, y
+
+
+def _circle(lon, lat, r, points=400):
+    return [
+        [lon + r * math.cos(2 * math.pi * i / points), lat + r * 0.6 * math.sin(2 * math.pi * i / points)]
+        for i in range(points)
+    ] + [[lon + r, lat]]
+
+
+class TestMvtEncoder:
+    def test_round_trip_points_and_properties(self):
+        layer = LayerBuilder("labels")
+        layer.add_point((10, 20), {"name": "Сенеж", "depth": 6.5, "rank": 3, "hidden": False, "skip": None}, 1)
+        layer.add_point((30, 5), {"name": "Сенеж", "depth": 2.0}, 2)
+
+        decoded = decode_tile(encode_tile([layer]))["labels"]
+
+        assert decoded["version"] == 2
+        assert decoded["extent"] == 4096
+        f1, f2 = decoded["features"]
+        assert f1["geometry"] == [[(10, 20)]]
+        assert f1["props"] == {"name": "Сенеж", "depth": 6.5, "rank": 3, "hidden": False}
+        assert f2["geometry"] == [[(30, 5)]]
+        assert f2["props"]["name"] == "Сенеж"
+
+    def test_polygon_winding_follows_spec(self):
+        outer = [(0, 0), (0, 100), (100, 100), (100, 0)]  # counter-clockwise on screen
+        hole = [(20, 20), (40, 20), (40, 40), (20, 40)]  # clockwise on screen
+        layer = LayerBuilder("areas")
+        layer.add_polygon([[outer, hole]], {})
+
+        rings = decode_tile(encode_tile([layer]))["areas"]["features"][0]["geometry"]
+
+        assert ring_area(rings[0]) > 0
+        assert ring_area(rings[1]) < 0
+        assert sorted(rings[0]) == sorted(outer)
+
+    def test_empty_layers_are_omitted(self):
+        assert encode_tile([LayerBuilder("a"), LayerBuilder("b")]) == b""
+
+
+class TestGeometry:
+    def test_projection_matches_tile_grid(self):
+        z = 10
+        x, y = _tile_for(37.6, 55.7, z)
+        west, south, east, north = vector_tiles._tile_bounds(z, x, y)
+        corners = vector_tiles._project(np.array([[west, north], [east, south]]), z, x, y)
+        np.testing.assert_allclose(corners, [[0, 0], [4096, 4096]], atol=1e-6)
+
+    def test_clip_ring_to_square(self):
+        ring = [(-100.0, -100.0), (200.0, -100.0), (200.0, 200.0), (-100.0, 200.0)]
+        clipped = vector_tiles._clip_ring(ring, 0, 100)
+        assert sorted(clipped) == sorted([(0, 0), (100, 0), (100, 100), (0, 100)])
+
+    def test_simplify_drops_collinear_points(self):
+        ring = np.array([[0, 0], [50, 0.5], [100, 0], [100, 100], [50, 100], [0, 100]], dtype=float)
+        simplified = simplify_ring(ring, 2.0)
+        assert [tuple(p) for p in simplified.tolist()] == [(0, 0), (100, 0), (100, 100), (0, 100)]
+
+    def test_group_rings_detects_holes_and_parts(self):
+        outer = [(0, 0), (100, 0), (100, 100), (0, 100)]
+        hole = [(10, 10), (20, 10), (20, 20), (10, 20)]
+        other = [(200, 200), (300, 200), (300, 300), (200, 300)]
+        parts = vector_tiles._group_rings([outer, hole, other])
+        assert parts == [[outer, hole], [other]]
+
+
+class TestBuildTile:
+    def test_polygon_clipped_quantized_and_labelled(self):
+        z = 9
+        x, y = _tile_for(31.5, 60.8, z)
+        row = _PolygonRow("Ладожское озеро", [_circle(31.5, 60.8, 0.5)], max_depth=230.0)
+
+        decoded = decode_tile(vector_tiles._build_tile(z, x, y, "navionics", [row], []))
+
+        area = decoded["depth_areas"]["features"][0]
+        assert area["type"] == 3
+        assert area["props"]["name"] == "Ладожское озеро"
+        assert area["props"]["color"].startswith("#")
+        assert "fallback_bbox" not in area["props"]
+        for ring in area["geometry"]:
+            for px, py in ring:
+                assert -64 <= px <= 4096 + 64
+                assert -64 <= py <= 4096 + 64
+        label = decoded["depth_labels"]["features"][0]
+        assert label["props"]["label"] == "230м"
+
+    def test_low_zoom_simplifies_and_skips_labels(self):
+        z = 4
+        x, y = _tile_for(31.5, 60.8, z)
+        row = _PolygonRow("Ладожское озеро", [_circle(31.5, 60.8, 0.5)], max_depth=230.0)
+
+        decoded = decode_tile(vector_tiles._build_tile(z, x, y, "navionics", [row], []))
+
+        ring = decoded["depth_areas"]["features"][0]["geometry"][0]
+        assert len(ring) < 100
+        assert "depth_labels" not in decoded
+
+    def test_bbox_fallback_skips_names_with_polygons(self):
+        z = 9
+        x, y = _tile_for(31.5, 60.8, z)
+        rows = [_PolygonRow("Ладожское озеро", [_circle(31.5, 60.8, 0.5)], max_depth=230.0)]
+        bbox_rows = [
+            _BBoxRow("Ладожское озеро", 31.0, 60.5, 32.0, 61.0, 230.0),
+            _BBoxRow("Безымянное", 31.3, 60.7, 31.4, 60.75, 3.0),
+        ]
+
+        features = decode_tile(vector_tiles._build_tile(z, x, y, "navionics", rows, bbox_rows))[
+            "depth_areas"
+        ]["features"]
+
+        assert [f["props"]["name"] for f in features] == ["Ладожское озеро", "Безымянное"]
+        assert features[1]["props"]["fallback_bbox"] is True
+
+    def test_payload_much_smaller_than_geojson(self):
+        z = 10
+        x, y = _tile_for(31.5, 60.8, z)
+        coords = [_circle(31.5, 60.8, 0.02, points=2000)]
+        row = _PolygonRow("Озеро", coords, max_depth=10.0)
+        geojson = json.dumps({"type": "Feature", "geometry": {"type": "Polygon", "coordinates": coords}})
+
+        tile = vector_tiles._build_tile(z, x, y, "navionics", [row], [])
+
+        assert len(tile) * 10 < len(geojson)
+
+
+class TestQueryRows:
+    def test_min_area_shrinks_with_zoom(self):
+        assert vector_tiles._min_area_km2(0, 0.0) == pytest.approx(156.5 ** 2, rel=0.01)
+        assert vector_tiles._min_area_km2(10, 60.0) == pytest.approx(
+            vector_tiles._min_area_km2(0, 60.0) / 4 ** 10
+        )
+        assert vector_tiles._min_area_km2(5, 60.0) < vector_tiles._min_area_km2(5, 0.0)
+
+    @pytest.mark.asyncio
+    async def test_low_zoom_filters_small_bodies_and_caps_rows(self):
+        session = AsyncMock()
+        session.execute.return_value.fetchall = lambda: []
+        with patch("app.services.vector_tiles.async_session") as mock_session:
+            mock_session.return_value.__aenter__.return_value = session
+            await vector_tiles._query_rows(3, 4, 2)
+
+        for call in session.execute.await_args_list:
+            sql, params = str(call.args[0]), call.args[1]
+            assert "area_km2 >= :min_area" in sql and "LIMIT :limit" in sql
+            assert params["limit"] == vector_tiles.settings.VECTOR_TILE_MAX_FEATURES
+            # One pixel at z3 is tens of kilometres across.
+            assert params["min_area"] > 100.0
+        assert session.execute.await_count == 2
+
+
+class TestFetchVectorTile:
+    @pytest.fixture(autouse=True)
+    def _store(self, tmp_path):
+        tile_memory_cache.clear()
+        with patch("app.services.vector_tiles.get_tile_store", return_value=FileTileStore(tmp_path)):
+            yield tmp_path
+        tile_memory_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_renders_once_then_serves_cache(self, _store):
+        z = 9
+        x, y = _tile_for(31.5, 60.8, z)
+        row = _PolygonRow("Ладожское озеро", [_circle(31.5, 60.8, 0.5)], max_depth=230.0)
+        with patch.object(vector_tiles, "_query_rows", new_callable=AsyncMock) as mock_query:
+            mock_query.return_value = ([row], [])
+            first = await vector_tiles.fetch_vector_tile(z, x, y)
+            tile_memory_cache.clear()
+            second = await vector_tiles.fetch_vector_tile(z, x, y)
+
+        assert first == second
+        assert first[1] == tile_etag(first[0])
+        assert mock_query.await_count == 1
+        assert (_store / "vt-navionics" / str(z) / str(x) / f"{y}.pbf").exists()
+
+    @pytest.mark.asyncio
+    async def test_query_error_not_cached(self, _store):
+        with patch.object(vector_tiles, "_query_rows", new_callable=AsyncMock) as mock_query:
+            mock_query.side_effect = RuntimeError("db down")
+            assert await vector_tiles.fetch_vector_tile(5, 10, 10) is None
+            assert await vector_tiles.fetch_vector_tile(5, 10, 10) is None
+        assert mock_query.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_purge_drops_scheme_layer(self, _store):
+        with patch.object(vector_tiles, "_query_rows", new_callable=AsyncMock) as mock_query:
+            mock_query.return_value = ([], [])
+            await vector_tiles.fetch_vector_tile(5, 10, 10)
+            vector_tiles.purge_vector_tiles("navionics")
+            await asyncio.gather(*vector_tiles._purge_tasks)
+            await vector_tiles.fetch_vector_tile(5, 10, 10)
+        assert mock_query.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_purge_deletes_layer_off_loop(self, _store):
+        with patch.object(vector_tiles, "get_tile_store") as mock_store, \
+                patch.object(vector_tiles.asyncio, "to_thread", wraps=asyncio.to_thread) as mock_thread:
+            vector_tiles.purge_vector_tiles("sport")
+            await asyncio.gather(*vector_tiles._purge_tasks)
+
+        mock_thread.assert_called_once_with(vector_tiles._delete_vector_layers, ["vt-sport"])
+        mock_store.return_value.delete_layer.assert_called_once_with("vt-sport")
+
+    def test_purge_without_loop_deletes_inline(self, _store):
+        with patch.object(vector_tiles, "get_tile_store") as mock_store:
+            vector_tiles.purge_vector_tiles()
+        assert mock_store.return_value.delete_layer.call_count == len(vector_tiles.COLOR_SCHEMES)
+
+
+class TestVectorTileEndpoint:
+    @patch("app.api.v1.endpoints.vector_tiles.fetch_vector_tile", new_callable=AsyncMock)
+    def test_returns_mvt_with_cache_headers(self, mock_fetch):
+        layer = LayerBuilder("depth_labels")
+        layer.add_point((1, 1), {"name": "x"})
+        mock_fetch.return_value = encode_tile([layer]), '"stored"'
+
+        with patch("app.api.v1.endpoints.vector_tiles.tile_etag") as mock_hash:
+            response = client.get("/api/v1/depth/vt/9/300/150.mvt")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/vnd.mapbox-vector-tile"
+        assert response.headers["etag"] == '"stored"'
+        mock_hash.assert_not_called()
+        assert "max-age" in response.headers["cache-control"]
+        assert decode_tile(response.content)["depth_labels"]["features"][0]["props"] == {"name": "x"}
+
+    @patch("app.api.v1.endpoints.vector_tiles.lookup_tile_etag", new_callable=AsyncMock)
+    @patch("app.api.v1.endpoints.vector_tiles.fetch_vector_tile", new_callable=AsyncMock)
+    def test_if_none_match_returns_304(self, mock_fetch, mock_etag):
+        mock_etag.return_value = '"abc"'
+        response = client.get("/api/v1/depth/vt/9/300/150.mvt", headers={"If-None-Match": '"abc"'})
+        assert response.status_code == 304
+        mock_etag.assert_awaited_once_with(9, 300, 150, scheme="vt-navionics")
+        mock_fetch.assert_not_called()
+
+    def test_out_of_range_tile(self):
+        response = client.get("/api/v1/depth/vt/2/4/0.mvt")
+        assert response.status_code == 404
+
+    def test_invalid_scheme(self):
+        response = client.get("/api/v1/depth/vt/2/1/1.mvt", params={"scheme": "neon"})
+        assert response.status_code == 400